@@ -0,0 +1,233 @@
+import os
+import math
+import time
+import logging
+import ipaddress
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from crisis_detection import crisis_detector
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_DECISIONS = registry.counter(
+    'psychmaster_admission_decisions_total',
+    'Chat turns admitted, rejected or answered with the crisis response by admission control',
+    ('outcome',)
+)
+CHAT_IN_FLIGHT = registry.gauge(
+    'psychmaster_chat_in_flight',
+    'Admitted chat turns waiting for or running on the LLM'
+)
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, at most ``burst`` saved up"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token; returns 0 on success, otherwise seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1.0)
+
+
+class KeyedBuckets:
+    """Token buckets per key, forgetting the least recently used keys beyond ``max_keys``"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+
+    def take(self, key: str, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+    def refund(self, key: str):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.refund()
+
+
+class Admission:
+    """Outcome of an admission check"""
+
+    __slots__ = ('admitted', 'status', 'retry_after', 'reason', 'crisis')
+
+    def __init__(self, admitted: bool, status: int = 200, retry_after: float = 0.0,
+                 reason: str = 'admitted', crisis: bool = False):
+        self.admitted = admitted
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+        self.crisis = crisis
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def parse_trusted_proxies(value: Optional[str]) -> List:
+    """Networks from '10.0.0.0/8,127.0.0.1'; invalid entries are skipped"""
+    networks = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning(f"Ignoring invalid trusted proxy '{item}'")
+    return networks
+
+
+def _is_trusted(address: str, trusted_proxies: List) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_identity(peer: Optional[str], forwarded_for: Optional[str], trusted_proxies: List) -> Optional[str]:
+    """Address to rate limit a request by, or None if the request carries no client identity.
+
+    A peer that isn't a trusted proxy is the client. Behind trusted proxies,
+    the client is the right-most X-Forwarded-For hop that isn't one of them:
+    hops left of it were written by the client itself and can't be trusted.
+    A trusted peer without such a hop (a health check, a misconfigured
+    proxy) has no identity of its own, so it must not share one bucket.
+    """
+    if not peer:
+        return None
+    if not _is_trusted(peer, trusted_proxies):
+        return peer
+    for hop in reversed((forwarded_for or '').split(',')):
+        hop = hop.strip()
+        if not hop or _is_trusted(hop, trusted_proxies):
+            continue
+        try:
+            return str(ipaddress.ip_address(hop))
+        except ValueError:
+            return None
+    return None
+
+
+class AdmissionController:
+    """Per-session and per-client rate limits plus a global cap on in-flight LLM turns.
+
+    A turn is admitted if its session's and its client's token buckets both
+    have a token and fewer than ``max_in_flight`` admitted turns are still
+    running; a turn without a client identity skips the client bucket. An
+    admitted turn holds a slot until ``release()``. Rejected turns fail fast
+    with 429 (rate limited) or 503 (over capacity) and a Retry-After.
+
+    Before rejecting, the message goes through the keyword crisis tier only,
+    since admission runs on the event loop and a flood of rejected turns
+    must not mean model inference there. A crisis is always answered with
+    the precomputed crisis response, which needs neither the LLM nor a
+    slot. Admitted turns get the full cascade in the chat service.
+    """
+
+    def __init__(
+        self,
+        session_rate: float = 0.5,
+        session_burst: float = 5,
+        client_rate: float = 2.0,
+        client_burst: float = 20,
+        max_in_flight: int = 64,
+        overload_retry_after: float = 2.0,
+        detector=crisis_detector,
+        enabled: bool = True
+    ):
+        self.enabled = enabled
+        self.sessions = KeyedBuckets(session_rate, session_burst)
+        self.clients = KeyedBuckets(client_rate, client_burst)
+        self.max_in_flight = max_in_flight
+        self.overload_retry_after = overload_retry_after
+        self.detector = detector
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def admit(self, message: str, session_id: Optional[str], client: Optional[str]) -> Admission:
+        """Decide whether a chat turn may use the LLM; admitted turns must be released"""
+        with self._lock:
+            decision = self._check(session_id, client, time.monotonic()) if self.enabled else Admission(True)
+            if decision.admitted:
+                self.in_flight += 1
+
+        if not decision.admitted and self.detector.detect_keyword(message) is not None:
+            decision = Admission(admitted=False, reason='crisis_bypass', crisis=True)
+        ADMISSION_DECISIONS.inc(outcome=decision.reason)
+        return decision
+
+    def _check(self, session_id: Optional[str], client: Optional[str], now: float) -> Admission:
+        if session_id:
+            wait = self.sessions.take(session_id, now)
+            if wait:
+                return Admission(False, 429, wait, 'rate_limited_session')
+
+        wait = self.clients.take(client, now) if client else 0.0
+        if wait:
+            if session_id:
+                self.sessions.refund(session_id)
+            return Admission(False, 429, wait, 'rate_limited_client')
+
+        if self.in_flight >= self.max_in_flight:
+            if session_id:
+                self.sessions.refund(session_id)
+            if client:
+                self.clients.refund(client)
+            return Admission(False, 503, self.overload_retry_after, 'overloaded')
+
+        return Admission(True)
+
+    def allow_client(self, client: Optional[str]) -> Admission:
+        """Rate limit work that only costs memory, such as creating sessions"""
+        if not self.enabled or not client:
+            return Admission(True)
+        with self._lock:
+            wait = self.clients.take(client, time.monotonic())
+        decision = Admission(False, 429, wait, 'rate_limited_client') if wait else Admission(True)
+        ADMISSION_DECISIONS.inc(outcome=decision.reason)
+        return decision
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+# Global admission controller for the chat endpoints
+admission_controller = AdmissionController(
+    session_rate=float(os.environ.get('CHAT_SESSION_RATE', '0.5')),
+    session_burst=float(os.environ.get('CHAT_SESSION_BURST', '5')),
+    client_rate=float(os.environ.get('CHAT_CLIENT_RATE', '2')),
+    client_burst=float(os.environ.get('CHAT_CLIENT_BURST', '20')),
+    max_in_flight=int(os.environ.get('CHAT_MAX_IN_FLIGHT', '64')),
+    overload_retry_after=float(os.environ.get('CHAT_OVERLOAD_RETRY_AFTER', '2')),
+    enabled=os.environ.get('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+)
+CHAT_IN_FLIGHT.set_function(lambda: admission_controller.in_flight)
@@ -0,0 +1,111 @@
+"""
+Microbenchmarks of the analysis and recommendation hot paths.
+
+Generates reproducible synthetic conversations and times
+PsychologicalAnalyzer.preprocess_text, analyze_conversation and
+_analyze_conversation_patterns, and RecommendationSystem.get_recommendations.
+Each case is warmed up, timed over many calls and then run once more under
+tracemalloc to report the peak and retained memory per call. Run from the
+backend directory:
+
+    python -m benchmarks.analysis_benchmark
+    python -m benchmarks.analysis_benchmark --conversations 50 --turns 20 --output analysis.json
+"""
+
+import argparse
+import itertools
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.common import measure, print_table, write_report
+from benchmarks.synthetic import generate_conversations
+
+
+def measure_allocations(fn: Callable[[], object], calls: int = 50) -> Dict[str, float]:
+    """Peak and retained bytes per call, traced after the timing run"""
+    fn()
+    peaks = []
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - start)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'peak_kib_per_call': sum(peaks) / len(peaks) / 1024.0,
+        'retained_bytes_per_call': (current - baseline) / calls,
+    }
+
+
+def build_cases(conversations: List[List[Dict]]) -> Dict[str, Callable[[], object]]:
+    """One zero-argument callable per benchmarked function, cycling over inputs"""
+    from psychological_analysis import psychological_analyzer
+    from recommendation_system import recommendation_system
+
+    if not psychological_analyzer.model:
+        raise RuntimeError("Psychological model is not available")
+
+    user_texts = [
+        [message['content'] for message in conversation if message['role'] == 'user']
+        for conversation in conversations
+    ]
+    joined = [' '.join(texts) for texts in user_texts]
+    analyses = [psychological_analyzer.analyze_conversation(conversation) for conversation in conversations]
+
+    texts_cycle = itertools.cycle(joined)
+    messages_cycle = itertools.cycle(user_texts)
+    conversation_cycle = itertools.cycle(conversations)
+    analysis_cycle = itertools.cycle(analyses)
+
+    return {
+        'preprocess_text': lambda: psychological_analyzer.preprocess_text(next(texts_cycle)),
+        '_analyze_conversation_patterns': lambda: psychological_analyzer._analyze_conversation_patterns(
+            next(messages_cycle)
+        ),
+        'analyze_conversation': lambda: psychological_analyzer.analyze_conversation(next(conversation_cycle)),
+        'get_recommendations': lambda: recommendation_system.get_recommendations(next(analysis_cycle)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=25, help='Number of synthetic conversations')
+    parser.add_argument('--turns', type=int, default=10, help='User turns per conversation')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--allocation-calls', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    conversations = generate_conversations(args.conversations, args.turns, seed=args.seed)
+    cases = build_cases(conversations)
+
+    rows = []
+    for name, fn in cases.items():
+        row = {'case': name, **measure(fn, iterations=args.iterations, warmup=args.warmup)}
+        row.update(measure_allocations(fn, args.allocation_calls))
+        rows.append(row)
+
+    print(f"{args.conversations} conversations x {args.turns} turns")
+    print_table(rows, ['case', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'peak_kib_per_call', 'retained_bytes_per_call'])
+    write_report('analysis', {
+        'config': {
+            'conversations': args.conversations,
+            'turns': args.turns,
+            'iterations': args.iterations,
+            'seed': args.seed,
+        },
+        'cases': rows,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Concurrent query embedding with and without micro-batching.
+
+Threads embed a burst of chat queries at once, as concurrent /api/chat
+requests do, either calling the embedder directly or through
+BatchingEmbeddings. A fraction of the queries in each burst are repeats,
+which batching embeds once. By default a simulated embedder with a fixed
+cost per forward pass plus a cost per text is used; --model runs the real
+MiniLM model (requires sentence-transformers) and first checks that batched
+vectors match embed_query. Run from the backend directory:
+
+    python -m benchmarks.coalescing_benchmark --concurrency 16
+    python -m benchmarks.coalescing_benchmark --model
+"""
+
+import argparse
+import random
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.common import print_table, summarize, write_report
+from benchmarks.synthetic import generate_user_message
+from request_coalescing import BatchingEmbeddings
+
+
+class SimulatedEmbeddings(Embeddings):
+    """Sleeps like a model forward pass and returns hashed vectors.
+
+    Forward passes are serialized, as they are on one CPU whose cores are
+    already used by the model's own thread pool.
+    """
+
+    def __init__(self, call_ms: float, item_ms: float, size: int = 384):
+        self.call_ms = call_ms
+        self.item_ms = item_ms
+        self.size = size
+        self._device = threading.Lock()
+
+    def _vector(self, text: str) -> List[float]:
+        return np.random.default_rng(abs(hash(text)) % (2 ** 32)).standard_normal(self.size).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._device:
+            time.sleep((self.call_ms + self.item_ms * len(texts)) / 1000.0)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_model():
+    from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+    return HuggingFaceBgeEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
+
+
+def check_equivalence(embeddings: Embeddings, queries: List[str], tolerance: float = 1e-5) -> int:
+    batched = BatchingEmbeddings(embeddings, max_wait=0.02)
+    with ThreadPoolExecutor(len(queries)) as pool:
+        results = list(pool.map(batched.embed_query, queries))
+    mismatches = 0
+    for query, vector in zip(queries, results):
+        if np.abs(np.asarray(vector) - np.asarray(embeddings.embed_query(query))).max() > tolerance:
+            mismatches += 1
+    return mismatches
+
+
+def run_bursts(embed, bursts: List[List[str]]):
+    latencies, total = [], 0.0
+
+    def timed(query):
+        start = time.perf_counter()
+        embed(query)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max(len(burst) for burst in bursts)) as pool:
+        for burst in bursts:
+            start = time.perf_counter()
+            latencies.extend(pool.map(timed, burst))
+            total += time.perf_counter() - start
+    return latencies, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent queries per burst')
+    parser.add_argument('--bursts', type=int, default=30)
+    parser.add_argument('--duplicate-fraction', type=float, default=0.25)
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--call-ms', type=float, default=8.0, help='Simulated cost per forward pass')
+    parser.add_argument('--item-ms', type=float, default=0.5, help='Simulated cost per text')
+    parser.add_argument('--model', action='store_true', help='Use the real MiniLM embedder')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bursts = []
+    for _ in range(args.bursts):
+        burst = [generate_user_message(rng) for _ in range(args.concurrency)]
+        for i in range(int(args.concurrency * args.duplicate_fraction)):
+            burst[-(i + 1)] = burst[i]
+        bursts.append(burst)
+
+    embeddings = create_model() if args.model else SimulatedEmbeddings(args.call_ms, args.item_ms)
+    if args.model:
+        mismatches = check_equivalence(embeddings, bursts[0])
+        if mismatches:
+            print(f"{mismatches} batched query vectors differ from embed_query, aborting")
+            sys.exit(1)
+        print("Batched query vectors match embed_query")
+
+    batching = BatchingEmbeddings(embeddings, max_batch_size=args.max_batch_size, max_wait=args.window_ms / 1000.0)
+    rows = []
+    for name, embed in (('direct', embeddings.embed_query), ('batched', batching.embed_query)):
+        run_bursts(embed, bursts[:2])
+        latencies, total = run_bursts(embed, bursts)
+        rows.append({'case': name, **summarize(latencies), 'queries_per_s': len(latencies) / total})
+
+    print_table(rows, ['case', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_s'])
+    write_report('coalescing', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import json
+import time
+import platform
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarize timing samples (seconds) as millisecond statistics"""
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    if len(values) == 0:
+        return {'count': 0}
+    return {
+        'count': int(len(values)),
+        'mean_ms': float(values.mean()),
+        'stdev_ms': float(values.std()),
+        'min_ms': float(values.min()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+    }
+
+
+def measure(fn: Callable[[], object], iterations: int = 200, warmup: int = 20) -> Dict[str, float]:
+    """Time repeated calls of fn after a warm-up phase"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    return summarize(samples)
+
+
+def print_table(rows: List[Dict], columns: List[str]):
+    """Print benchmark rows as an aligned text table"""
+    def fmt(value):
+        return f"{value:.4f}" if isinstance(value, float) else str(value)
+
+    widths = {col: max(len(col), *(len(fmt(row.get(col, ''))) for row in rows)) for col in columns}
+    print('  '.join(col.ljust(widths[col]) for col in columns))
+    for row in rows:
+        print('  '.join(fmt(row.get(col, '')).ljust(widths[col]) for col in columns))
+
+
+def write_report(name: str, results: Dict, output: Optional[str]):
+    """Write benchmark results with environment metadata as JSON"""
+    if not output:
+        return
+
+    report = {
+        'benchmark': name,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'numpy': np.__version__,
+        'results': results,
+    }
+    Path(output).write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
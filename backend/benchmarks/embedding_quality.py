@@ -0,0 +1,141 @@
+"""
+Retrieval quality, latency and memory of the int8 ONNX embedder against
+the float model.
+
+Embeds the knowledge base chunks (split exactly as langchain_service does)
+and a set of synthetic chat queries with both models and reports:
+
+  - cosine similarity between float and int8 vectors of the same text
+  - recall@k of the int8 top-k against the float top-k, both for a fresh
+    int8 index and for int8 queries against an existing float index
+  - per-query latency, model file size and resident memory added by loading
+
+The reference is the PyTorch model (HuggingFaceBgeEmbeddings) or, with
+--reference onnx-float, the unquantized ONNX export. Exits non-zero when
+recall falls below --min-recall. Run from the backend directory:
+
+    python -m benchmarks.embedding_quality --onnx-path ./models/minilm-onnx
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.common import print_table, summarize, write_report
+from benchmarks.synthetic import generate_user_message
+from onnx_embeddings import DEFAULT_MODEL_NAME, DEFAULT_ONNX_PATH, OnnxEmbeddings
+
+
+def rss_mib() -> float:
+    for line in Path('/proc/self/status').read_text().splitlines():
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def load_chunks(docs_path: str) -> List[str]:
+    """Knowledge base chunks, split with the same settings as the chat service"""
+    from langchain_community.document_loaders import DirectoryLoader, TextLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    documents = DirectoryLoader(docs_path, glob='*.txt', loader_cls=TextLoader).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    return [chunk.page_content for chunk in splitter.split_documents(documents)]
+
+
+def load_model(kind: str, onnx_path: str):
+    """Load an embedder and report the memory it added"""
+    before = rss_mib()
+    if kind == 'torch':
+        from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+        model = HuggingFaceBgeEmbeddings(model_name=DEFAULT_MODEL_NAME)
+        size = None
+    else:
+        model = OnnxEmbeddings(onnx_path, quantized=(kind == 'onnx-int8'))
+        size = model.model_path.stat().st_size / 2 ** 20
+    return model, {'model': kind, 'load_rss_mib': rss_mib() - before, 'file_mib': size}
+
+
+def top_k(queries: np.ndarray, documents: np.ndarray, k: int) -> List[set]:
+    scores = queries @ documents.T
+    return [set(row) for row in np.argsort(-scores, axis=1)[:, :k]]
+
+
+def recall(expected: List[set], actual: List[set]) -> float:
+    return float(np.mean([len(e & a) / len(e) for e, a in zip(expected, actual)]))
+
+
+def cosines(a: np.ndarray, b: np.ndarray) -> Dict[str, float]:
+    values = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {'mean': float(values.mean()), 'min': float(values.min())}
+
+
+def query_latency(model, queries: List[str]) -> Dict[str, float]:
+    for query in queries[:5]:
+        model.embed_query(query)
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        model.embed_query(query)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--onnx-path', default=DEFAULT_ONNX_PATH)
+    parser.add_argument('--reference', choices=['torch', 'onnx-float'], default='torch')
+    parser.add_argument('--docs', default='./docs')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--min-recall', type=float, default=0.9)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.docs)
+    rng = random.Random(args.seed)
+    queries = [generate_user_message(rng, fragments=rng.randint(1, 2)) for _ in range(args.queries)]
+    print(f"{len(chunks)} chunks, {len(queries)} queries")
+
+    reference, reference_info = load_model(args.reference, args.onnx_path)
+    candidate, candidate_info = load_model('onnx-int8', args.onnx_path)
+
+    ref_docs = np.asarray(reference.embed_documents(chunks), dtype=np.float32)
+    ref_queries = np.asarray([reference.embed_query(query) for query in queries], dtype=np.float32)
+    int8_docs = np.asarray(candidate.embed_documents(chunks), dtype=np.float32)
+    int8_queries = np.asarray([candidate.embed_query(query) for query in queries], dtype=np.float32)
+
+    k = min(args.k, len(chunks))
+    expected = top_k(ref_queries, ref_docs, k)
+    quality = {
+        'document_cosine': cosines(ref_docs, int8_docs),
+        'query_cosine': cosines(ref_queries, int8_queries),
+        f'recall@{k}_int8_index': recall(expected, top_k(int8_queries, int8_docs, k)),
+        f'recall@{k}_float_index': recall(expected, top_k(int8_queries, ref_docs, k)),
+    }
+
+    rows = []
+    for model, info in ((reference, reference_info), (candidate, candidate_info)):
+        latency = query_latency(model, queries)
+        rows.append({**info, 'p50_ms': latency['p50_ms'], 'p95_ms': latency['p95_ms'], 'mean_ms': latency['mean_ms']})
+
+    print_table(rows, ['model', 'file_mib', 'load_rss_mib', 'mean_ms', 'p50_ms', 'p95_ms'])
+    print(f"document cosine mean {quality['document_cosine']['mean']:.4f} min {quality['document_cosine']['min']:.4f}")
+    print(f"query cosine mean {quality['query_cosine']['mean']:.4f} min {quality['query_cosine']['min']:.4f}")
+    print(f"recall@{k}: int8 index {quality[f'recall@{k}_int8_index']:.3f}, "
+          f"float index {quality[f'recall@{k}_float_index']:.3f}")
+    write_report('embedding_quality', {'models': rows, 'quality': quality}, args.output)
+
+    if min(quality[f'recall@{k}_int8_index'], quality[f'recall@{k}_float_index']) < args.min_recall:
+        print(f"Recall below {args.min_recall}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
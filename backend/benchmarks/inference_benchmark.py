@@ -0,0 +1,117 @@
+"""
+Batched classifier inference versus one analysis per request.
+
+Checks that analyze_conversations returns the same predictions and
+probabilities as analyzing each conversation on its own, then fires bursts
+of concurrent analyses through the InferenceBatcher (thread and process
+executors) and compares them with inline per-request analysis on the event
+loop. Run from the backend directory:
+
+    python -m benchmarks.inference_benchmark --concurrency 32 --bursts 20
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.common import print_table, summarize, write_report
+from benchmarks.synthetic import generate_conversations
+from inference_executor import EXECUTOR_KINDS, InferenceBatcher
+from psychological_analysis import psychological_analyzer
+
+COMPARED_FIELDS = ('predicted_state', 'confidence', 'state_probabilities', 'risk_level', 'conversation_insights')
+
+
+def check_equivalence(conversations) -> int:
+    """Compare batched analyses with per-conversation ones; return mismatch count"""
+    batched = psychological_analyzer.analyze_conversations(conversations)
+    mismatches = 0
+    for conversation, result in zip(conversations, batched):
+        expected = psychological_analyzer.analyze_conversation(conversation)
+        if any(expected.get(field) != result.get(field) for field in COMPARED_FIELDS):
+            mismatches += 1
+    return mismatches
+
+
+async def run_bursts(analyze, conversations, concurrency: int, bursts: int):
+    """Time from burst start to each analysis result, and wall time of each burst.
+
+    Latencies are measured from the start of the burst because inline
+    analysis blocks the event loop, so later requests wait for earlier ones.
+    """
+    latencies, burst_times = [], []
+
+    async def timed(messages, start):
+        await analyze(messages)
+        latencies.append(time.perf_counter() - start)
+
+    for burst in range(bursts):
+        batch = [conversations[(burst * concurrency + i) % len(conversations)] for i in range(concurrency)]
+        start = time.perf_counter()
+        await asyncio.gather(*(timed(messages, start) for messages in batch))
+        burst_times.append(time.perf_counter() - start)
+    return latencies, burst_times
+
+
+async def inline_analyze(messages):
+    return psychological_analyzer.analyze_conversation(messages)
+
+
+async def benchmark(args, conversations):
+    cases = {'inline': (inline_analyze, None)}
+    for kind in EXECUTOR_KINDS:
+        batcher = InferenceBatcher(
+            psychological_analyzer,
+            max_batch_size=args.max_batch_size,
+            max_wait=args.window_ms / 1000.0,
+            executor=kind,
+            processes=args.processes
+        )
+        cases[f"batched_{kind}"] = (batcher.analyze, batcher)
+
+    rows = []
+    for name, (analyze, batcher) in cases.items():
+        if batcher:
+            batcher.start()
+        try:
+            await run_bursts(analyze, conversations, args.concurrency, 2)
+            latencies, burst_times = await run_bursts(analyze, conversations, args.concurrency, args.bursts)
+        finally:
+            if batcher:
+                await batcher.stop()
+        total = sum(burst_times)
+        rows.append({
+            'case': name,
+            **summarize(latencies),
+            'analyses_per_s': len(latencies) / total if total else 0.0,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent end-session requests per burst')
+    parser.add_argument('--bursts', type=int, default=20)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--window-ms', type=float, default=5.0)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    conversations = generate_conversations(args.conversations, args.turns)
+    mismatches = check_equivalence(conversations)
+    if mismatches:
+        print(f"{mismatches} batched analyses differ from per-conversation analyses, aborting")
+        sys.exit(1)
+    print("Batched analyses match per-conversation analyses")
+
+    rows = asyncio.run(benchmark(args, conversations))
+    print_table(rows, ['case', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'analyses_per_s'])
+    write_report('inference', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Concurrent load test of the chat API with a stub LLM.
+
+Starts the FastAPI app in-process with the real classifier, recommendation
+system and vector store, replacing only the Groq LLM with a stub that
+answers after --llm-latency-ms. Virtual users run full sessions
+(create, N chat turns, end-session) through an async HTTP client and the
+report lists throughput and p50/p95/p99 per endpoint. Each virtual user
+sends its own X-Forwarded-For address, so admission control limits them
+as separate clients; 429s and 503s are counted as errors.
+
+Run from the backend directory:
+
+    python -m benchmarks.load_test --sessions 200 --concurrency 20 --turns 5
+    python -m benchmarks.load_test --save-baseline baseline.json
+    python -m benchmarks.load_test --compare baseline.json
+
+Pass --base-url to drive an already running server instead; its
+TRUSTED_PROXIES must include this machine for the addresses to count.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import print_table, summarize
+from benchmarks.synthetic import generate_user_message
+
+ENDPOINTS = ('create_session', 'chat', 'end_session')
+# Virtual user numbers, unique across the warmup and measured runs
+_USERS = itertools.count(1)
+
+
+def create_app(llm_latency_ms: float):
+    """Import the app and swap the LLM for a stub before any request is served"""
+    from langchain_core.language_models.fake import FakeListLLM
+
+    import server
+    from admission_control import parse_trusted_proxies
+
+    service = server.mental_health_service
+    service.llm = FakeListLLM(
+        responses=["I hear you, and what you're feeling is valid. What has been the hardest part?"],
+        sleep=llm_latency_ms / 1000.0 if llm_latency_ms else None
+    )
+    if not service.setup_qa_chain():
+        raise RuntimeError("Could not set up the QA chain with the stub LLM")
+    # The in-process client connects from 127.0.0.1 and forwards each user's own address
+    server.TRUSTED_PROXIES = parse_trusted_proxies('127.0.0.1')
+    return server.app
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, turns: int, seed: int):
+        self.client = client
+        self.turns = turns
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def _request(self, endpoint: str, path: str, payload: dict, address: str):
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=payload, headers={'X-Forwarded-For': address})
+        except httpx.HTTPError as e:
+            self.errors[f"{endpoint}:{type(e).__name__}"] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            self.errors[f"{endpoint}:{response.status_code}"] += 1
+            return None
+        return response.json()
+
+    async def run_session(self):
+        user = next(_USERS)
+        address = f"10.{user >> 16 & 255}.{user >> 8 & 255}.{user & 255}"
+        created = await self._request('create_session', '/api/chat/session', {'action': 'create'}, address)
+        if not created:
+            return
+        session_id = created['session_id']
+        for _ in range(self.turns):
+            message = generate_user_message(self.rng, fragments=self.rng.randint(1, 3))
+            await self._request('chat', '/api/chat', {'message': message, 'session_id': session_id}, address)
+        await self._request('end_session', '/api/chat/end-session', {'session_id': session_id}, address)
+
+    async def run(self, sessions: int, concurrency: int) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded():
+            async with semaphore:
+                await self.run_session()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded() for _ in range(sessions)))
+        return time.perf_counter() - start
+
+
+def build_report(test: LoadTest, elapsed: float, args) -> dict:
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        stats = summarize(test.latencies[endpoint])
+        stats['throughput_rps'] = len(test.latencies[endpoint]) / elapsed if elapsed else 0.0
+        endpoints[endpoint] = stats
+    total_requests = sum(len(samples) for samples in test.latencies.values())
+    return {
+        'config': {
+            'sessions': args.sessions,
+            'concurrency': args.concurrency,
+            'turns': args.turns,
+            'llm_latency_ms': args.llm_latency_ms,
+            'base_url': args.base_url,
+        },
+        'elapsed_s': elapsed,
+        'sessions_per_s': args.sessions / elapsed if elapsed else 0.0,
+        'requests_per_s': total_requests / elapsed if elapsed else 0.0,
+        'errors': dict(test.errors),
+        'endpoints': endpoints,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> bool:
+    """Print the change against a baseline; return True if anything regressed"""
+    regressed = False
+    rows = []
+    for endpoint in ENDPOINTS:
+        current, previous = report['endpoints'].get(endpoint, {}), baseline['endpoints'].get(endpoint, {})
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if metric not in current or metric not in previous or not previous[metric]:
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric] * 100
+            flag = 'REGRESSION' if change > threshold else ''
+            regressed |= bool(flag)
+            rows.append({'endpoint': endpoint, 'metric': metric, 'baseline': previous[metric],
+                         'current': current[metric], 'change_%': change, 'flag': flag})
+
+    if baseline.get('requests_per_s'):
+        change = (report['requests_per_s'] - baseline['requests_per_s']) / baseline['requests_per_s'] * 100
+        flag = 'REGRESSION' if -change > threshold else ''
+        regressed |= bool(flag)
+        rows.append({'endpoint': 'all', 'metric': 'requests_per_s', 'baseline': baseline['requests_per_s'],
+                     'current': report['requests_per_s'], 'change_%': change, 'flag': flag})
+
+    print_table(rows, ['endpoint', 'metric', 'baseline', 'current', 'change_%', 'flag'])
+    return regressed
+
+
+async def main_async(args) -> dict:
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        app = None
+    else:
+        app = create_app(args.llm_latency_ms)
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://loadtest', timeout=args.timeout)
+
+    try:
+        if args.warmup_sessions:
+            await LoadTest(client, args.turns, args.seed + 1).run(args.warmup_sessions, args.concurrency)
+        test = LoadTest(client, args.turns, args.seed)
+        elapsed = await test.run(args.sessions, args.concurrency)
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+
+    return build_report(test, elapsed, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--turns', type=int, default=5, help='Chat turns per session')
+    parser.add_argument('--warmup-sessions', type=int, default=5)
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='Simulated LLM latency')
+    parser.add_argument('--base-url', help='Drive a running server instead of the in-process app')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--save-baseline', help='Save the report as a baseline file')
+    parser.add_argument('--compare', help='Compare against a saved baseline')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+
+    rows = [{'endpoint': name, **stats} for name, stats in report['endpoints'].items()]
+    print_table(rows, ['endpoint', 'count', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'])
+    print(f"{report['sessions_per_s']:.1f} sessions/s, {report['requests_per_s']:.1f} requests/s, errors: {report['errors'] or 'none'}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).write_text(json.dumps(report, indent=2))
+            print(f"Report written to {path}")
+
+    if args.compare:
+        if compare(report, json.loads(Path(args.compare).read_text()), args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Overhead of the metrics layer on the request path.
+
+Times an empty block with and without a histogram timer, a counter
+increment and rendering the /metrics payload. Run from the backend
+directory:
+
+    python -m benchmarks.metrics_benchmark
+"""
+
+import argparse
+
+from benchmarks.common import measure, print_table, write_report
+from metrics import MetricsRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    # A private registry so the benchmark does not touch the live metrics
+    registry = MetricsRegistry()
+    histogram = registry.histogram('bench_stage_seconds', 'Benchmark stages', ('pipeline', 'stage'))
+    counter = registry.counter('bench_events_total', 'Benchmark events', ('source',))
+
+    def baseline():
+        pass
+
+    def timed_block():
+        with histogram.time(pipeline='chat', stage='crisis_scan'):
+            pass
+
+    def observe():
+        histogram.observe(0.0042, pipeline='chat', stage='vector_search')
+
+    def increment():
+        counter.inc(source='keyword')
+
+    cases = {
+        'baseline_call': baseline,
+        'histogram_timer': timed_block,
+        'histogram_observe': observe,
+        'counter_inc': increment,
+    }
+    rows = [
+        {'case': name, **measure(fn, iterations=args.iterations, warmup=1000)}
+        for name, fn in cases.items()
+    ]
+
+    # Render with a realistic number of series: every stage of both pipelines
+    for stage in ('crisis_scan', 'query_embedding', 'vector_search', 'keyword_search',
+                  'llm_completion', 'session_write'):
+        histogram.observe(0.01, pipeline='chat', stage=stage)
+    for stage in ('vectorize', 'predict', 'patterns', 'recommend'):
+        histogram.observe(0.01, pipeline='end_session', stage=stage)
+    rows.append({'case': 'render_metrics', **measure(registry.render, iterations=1000, warmup=50)})
+
+    for row in rows:
+        row['mean_us'] = row['mean_ms'] * 1000
+        row['p99_us'] = row['p99_ms'] * 1000
+    print_table(rows, ['case', 'mean_us', 'p99_us'])
+    write_report('metrics_overhead', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Latency of probability-weighted recommendation ranking as the catalog grows.
+
+Builds synthetic catalogs of the requested sizes (items spread over the
+five states, types and a handful of tags) and times RecommendationRanker.rank.
+Run from the backend directory:
+
+    python -m benchmarks.ranking_benchmark --sizes 50 1000 5000 20000
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmarks.common import measure, print_table, write_report
+from recommendation_catalog import RESOURCE_TYPES, CatalogSnapshot
+from recommendation_ranking import RecommendationRanker
+
+STATES = ['Normal', 'Depression', 'Bipolar', 'Anxiety', 'Suicidal']
+TAGS = ['crisis', 'hotline', 'meditation', 'cbt', 'self-help', 'education']
+
+
+def synthetic_catalog(size: int, rng: np.random.Generator) -> CatalogSnapshot:
+    resources = []
+    for i in range(size):
+        states = list(rng.choice(STATES, size=rng.integers(1, 3), replace=False))
+        resources.append({
+            'id': f"item-{i}",
+            'type': RESOURCE_TYPES[i % len(RESOURCE_TYPES)],
+            'states': states,
+            'state_weights': {state: float(rng.uniform(0.2, 1.0)) for state in states},
+            'tags': list(rng.choice(TAGS, size=2, replace=False)),
+            'title': f"Resource {i}",
+            'url': f"https://example.org/{i}",
+            'description': 'Synthetic benchmark resource'
+        })
+    return CatalogSnapshot({'version': 0, 'resources': resources})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 1000, 5000, 20000])
+    parser.add_argument('--top-n', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    probabilities = {'Normal': 0.31, 'Depression': 0.38, 'Bipolar': 0.03, 'Anxiety': 0.06, 'Suicidal': 0.22}
+    rows = []
+
+    for size in args.sizes:
+        ranker = RecommendationRanker(STATES)
+        ranker.build(synthetic_catalog(size, rng))
+        for risk_level in ('low', 'high'):
+            stats = measure(
+                lambda: ranker.rank(probabilities, risk_level, top_n=args.top_n),
+                iterations=args.iterations,
+                warmup=100
+            )
+            rows.append({'catalog_size': size, 'risk_level': risk_level, **stats})
+
+    print_table(rows, ['catalog_size', 'risk_level', 'mean_ms', 'p50_ms', 'p99_ms'])
+    write_report('recommendation_ranking', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Precomputed recommendation payloads versus building them per call.
+
+tests/test_recommendation_payloads.py checks the payloads against the
+outputs of the original builder. Run from the backend directory:
+
+    python -m benchmarks.recommendation_benchmark
+"""
+
+import argparse
+import json
+
+from benchmarks.common import measure, print_table, write_report
+from recommendation_system import recommendation_system
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    analysis = {'predicted_state': 'Depression', 'risk_level': 'medium', 'confidence': 0.74}
+    cases = {
+        'build_per_call': lambda: recommendation_system._build_recommendations('Depression', 'medium', 0.74),
+        'build_per_call_json': lambda: json.dumps(
+            recommendation_system._build_recommendations('Depression', 'medium', 0.74)
+        ),
+        'precomputed': lambda: recommendation_system.get_recommendations(analysis),
+        'precomputed_json': lambda: json.dumps(recommendation_system.get_recommendations(analysis)),
+    }
+
+    rows = [
+        {'case': name, **measure(fn, iterations=args.iterations, warmup=1000)}
+        for name, fn in cases.items()
+    ]
+    print_table(rows, ['case', 'mean_ms', 'p50_ms', 'p99_ms'])
+    write_report('recommendations', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Queue wait per priority class of the LLM scheduler under saturation.
+
+Submits a burst of simulated chat turns with a mix of priority classes from
+many threads to a scheduler with few slots. Each turn holds its slot for a
+fixed simulated LLM latency. Runs the burst with the priority weights and
+once more with every turn in the same class (a plain FIFO line), and reports
+per-class wait percentiles. Run from the backend directory:
+
+    python -m benchmarks.scheduler_benchmark --turns 400 --slots 4 --llm-ms 20
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table, summarize, write_report
+from llm_scheduler import DEFAULT_WEIGHTS, PRIORITY_CLASSES, LLMScheduler
+
+
+def run_burst(scheduler: LLMScheduler, priorities: list, llm_seconds: float, fifo: bool) -> dict:
+    waits = defaultdict(list)
+    lock = threading.Lock()
+
+    def turn(priority):
+        start = time.perf_counter()
+        with scheduler.slot('standard' if fifo else priority):
+            waited = time.perf_counter() - start
+            time.sleep(llm_seconds)
+        with lock:
+            waits[priority].append(waited)
+
+    with ThreadPoolExecutor(max_workers=len(priorities)) as pool:
+        list(pool.map(turn, priorities))
+    return waits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=300)
+    parser.add_argument('--slots', type=int, default=4)
+    parser.add_argument('--llm-ms', type=float, default=20.0)
+    parser.add_argument('--mix', default='0.05,0.25,0.7', help='Share of crisis,elevated,standard turns')
+    parser.add_argument('--max-wait', type=float, default=10.0, help='Aging threshold in seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    shares = [float(share) for share in args.mix.split(',')]
+    priorities = rng.choices(PRIORITY_CLASSES, weights=shares, k=args.turns)
+
+    rows = []
+    for mode in ('fifo', 'priority'):
+        scheduler = LLMScheduler(max_concurrency=args.slots, weights=dict(DEFAULT_WEIGHTS), max_wait=args.max_wait)
+        waits = run_burst(scheduler, priorities, args.llm_ms / 1000.0, fifo=(mode == 'fifo'))
+        for priority in PRIORITY_CLASSES:
+            stats = summarize(waits[priority])
+            if not stats['count']:
+                continue
+            rows.append({
+                'mode': mode,
+                'priority': priority,
+                'turns': stats['count'],
+                'p50_wait_ms': stats['p50_ms'],
+                'p95_wait_ms': stats['p95_ms'],
+                'max_wait_ms': stats['max_ms'],
+            })
+
+    print(f"{args.turns} turns, {args.slots} slots, {args.llm_ms:.0f} ms per LLM call, weights {DEFAULT_WEIGHTS}")
+    print_table(rows, ['mode', 'priority', 'turns', 'p50_wait_ms', 'p95_wait_ms', 'max_wait_ms'])
+    write_report('llm_scheduler', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
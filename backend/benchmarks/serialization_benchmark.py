@@ -0,0 +1,110 @@
+"""
+Serialization cost of the end-session response.
+
+Builds real end-session payloads (analysis, recommendations and ranked
+resources for synthetic conversations) and times turning them into response
+bytes three ways:
+
+  - default: FastAPI's path for a returned dict, i.e. validation against
+    SessionEndResponse, jsonable_encoder and JSONResponse (json.dumps)
+  - pydantic: SessionEndResponse validation and model_dump_json
+  - fast: prevalidated_response (model_construct and orjson)
+
+Checks first that all paths produce the same JSON document. Run from the
+backend directory:
+
+    python -m benchmarks.serialization_benchmark --turns 20
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from itertools import cycle
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from benchmarks.common import measure, print_table, write_report
+from benchmarks.synthetic import generate_conversations
+from fast_json import prevalidated_response
+from psychological_analysis import psychological_analyzer
+from recommendation_system import recommendation_system
+from server import SessionEndResponse
+
+
+def build_payloads(count: int, turns: int) -> list:
+    """End-session results shaped like MentalHealthChatService.end_session"""
+    payloads = []
+    for n, conversation in enumerate(generate_conversations(count, turns)):
+        analysis = psychological_analyzer.analyze_conversation(conversation)
+        payloads.append({
+            'success': True,
+            'session_id': f"bench-{n}",
+            'analysis': analysis,
+            'recommendations': recommendation_system.get_recommendations(analysis),
+            'ranked_resources': recommendation_system.rank_resources(analysis),
+            'session_summary': {
+                'total_messages': len(conversation),
+                'user_messages': len([m for m in conversation if m['role'] == 'user']),
+                'conversation_duration': '2024-01-01T12:30:00',
+                'started_at': '2024-01-01T12:00:00'
+            }
+        })
+    return payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', type=int, default=20)
+    parser.add_argument('--turns', type=int, default=12)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.payloads, args.turns)
+    field = create_response_field(name='Response_end_chat_session', type_=SessionEndResponse)
+    loop = asyncio.new_event_loop()
+
+    def default(payload):
+        content = loop.run_until_complete(serialize_response(field=field, response_content=payload, is_coroutine=True))
+        return JSONResponse(content).body
+
+    def pydantic(payload):
+        return SessionEndResponse(**payload).model_dump_json().encode('utf-8')
+
+    def fast(payload):
+        return prevalidated_response(SessionEndResponse, payload).body
+
+    paths = {'default': default, 'pydantic': pydantic, 'fast': fast}
+
+    for payload in payloads:
+        documents = {name: json.loads(serialize(payload)) for name, serialize in paths.items()}
+        if documents['fast'] != documents['default'] or documents['pydantic'] != documents['default']:
+            print(f"Serialized payloads differ for {payload['session_id']}, aborting")
+            sys.exit(1)
+    print("All serialization paths produce the same JSON")
+
+    rows = []
+    for name, serialize in paths.items():
+        inputs = cycle(payloads)
+        stats = measure(lambda: serialize(next(inputs)), iterations=args.iterations, warmup=100)
+        rows.append({
+            'path': name,
+            'bytes': sum(len(serialize(payload)) for payload in payloads) // len(payloads),
+            'mean_ms': stats['mean_ms'],
+            'p50_ms': stats['p50_ms'],
+            'p95_ms': stats['p95_ms'],
+        })
+    baseline = rows[0]['mean_ms']
+    for row in rows:
+        row['speedup'] = baseline / row['mean_ms']
+
+    print(f"{args.payloads} end-session payloads, {args.turns} turns each")
+    print_table(rows, ['path', 'bytes', 'mean_ms', 'p50_ms', 'p95_ms', 'speedup'])
+    write_report('serialization', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
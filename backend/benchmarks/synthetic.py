@@ -0,0 +1,61 @@
+import random
+from typing import Dict, List, Optional
+
+# Message fragments per psychological theme, combined into synthetic user turns
+THEMES = {
+    'Normal': [
+        "work has been busy but I'm managing okay",
+        "I went for a run this morning and felt good",
+        "I want to build better habits for my mental health",
+        "my weekend was relaxing and I caught up with friends",
+    ],
+    'Depression': [
+        "I feel empty and tired all the time",
+        "nothing seems worth doing anymore and I feel hopeless",
+        "I've been isolating myself from everyone lately",
+        "I can't get out of bed most mornings",
+    ],
+    'Anxiety': [
+        "I'm constantly worried about things going wrong",
+        "my heart races and I feel panic before meetings",
+        "I feel overwhelmed and restless and can't relax",
+        "I get nervous about every little decision",
+    ],
+    'Bipolar': [
+        "some weeks I have endless energy and barely sleep",
+        "my moods swing from really high to really low",
+        "I started too many projects and then crashed",
+        "people say I talk too fast when I'm up",
+    ],
+    'Suicidal': [
+        "I don't see the point of going on anymore",
+        "everyone would be better off without me",
+        "I've been thinking about ending things",
+        "I feel like a burden to everyone around me",
+    ],
+}
+
+ASSISTANT_REPLY = "Thank you for sharing that with me. Can you tell me more about how this has been affecting you?"
+
+
+def generate_user_message(rng: random.Random, theme: Optional[str] = None, fragments: int = 2) -> str:
+    """One user turn built from fragments of a theme"""
+    theme = theme or rng.choice(list(THEMES))
+    return '. '.join(rng.choice(THEMES[theme]) for _ in range(fragments)).capitalize() + '.'
+
+
+def generate_conversation(rng: random.Random, turns: int, theme: Optional[str] = None) -> List[Dict]:
+    """Alternating user/assistant messages in the shape stored in sessions"""
+    theme = theme or rng.choice(list(THEMES))
+    messages = []
+    for _ in range(turns):
+        messages.append({'role': 'user', 'content': generate_user_message(rng, theme, rng.randint(1, 3))})
+        messages.append({'role': 'assistant', 'content': ASSISTANT_REPLY})
+    return messages
+
+
+def generate_conversations(count: int, turns: int, seed: int = 42) -> List[List[Dict]]:
+    """A reproducible set of conversations spread over all themes"""
+    rng = random.Random(seed)
+    themes = list(THEMES)
+    return [generate_conversation(rng, turns, themes[i % len(themes)]) for i in range(count)]
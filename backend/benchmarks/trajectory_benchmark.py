@@ -0,0 +1,91 @@
+"""
+Re-analysis cost of a growing session in conversation and trajectory mode.
+
+Replays sessions turn by turn and re-analyzes after every user message, as
+live risk tracking does: whole-conversation scoring, trajectory scoring
+from scratch, and trajectory scoring with the per-session cache. Checks
+first that cached trajectories equal trajectories scored from scratch. Run
+from the backend directory:
+
+    python -m benchmarks.trajectory_benchmark --turns 50 --window 3
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import print_table, write_report
+from benchmarks.synthetic import generate_conversations
+from psychological_analysis import psychological_analyzer as analyzer
+
+
+def replay(conversation, mode: str, session_id=None) -> list:
+    """Analyze every prefix of the conversation that ends with a user message"""
+    analyzer.analysis_mode = mode
+    results = []
+    for end in range(1, len(conversation) + 1, 2):
+        results.append(analyzer.analyze_conversation(conversation[:end], session_id))
+    return results
+
+
+def check_cache(conversations) -> int:
+    mismatches = 0
+    for n, conversation in enumerate(conversations):
+        cached = replay(conversation, 'trajectory', f"check-{n}")
+        fresh = replay(conversation, 'trajectory')
+        for a, b in zip(cached, fresh):
+            if a['predicted_state'] != b['predicted_state'] or not np.allclose(
+                [a['state_probabilities'][s] for s in sorted(a['state_probabilities'])],
+                [b['state_probabilities'][s] for s in sorted(b['state_probabilities'])]
+            ):
+                mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--turns', type=int, default=40)
+    parser.add_argument('--window', type=int, default=1, help='User messages per scored window')
+    parser.add_argument('--half-life', type=float, default=3.0)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    analyzer.trajectory_window = args.window
+    analyzer.trajectory_half_life = args.half_life
+    conversations = generate_conversations(args.sessions, args.turns)
+
+    mismatches = check_cache(conversations[:3])
+    if mismatches:
+        print(f"{mismatches} cached trajectories differ from fresh ones, aborting")
+        sys.exit(1)
+    print("Cached trajectories match trajectories scored from scratch")
+
+    cases = {
+        'conversation': lambda n, c: replay(c, 'conversation'),
+        'trajectory_uncached': lambda n, c: replay(c, 'trajectory'),
+        'trajectory_cached': lambda n, c: replay(c, 'trajectory', f"bench-{n}"),
+    }
+    rows = []
+    for name, run in cases.items():
+        analyzer.trajectory_cache = type(analyzer.trajectory_cache)()
+        start = time.perf_counter()
+        for n, conversation in enumerate(conversations):
+            run(n, conversation)
+        elapsed = time.perf_counter() - start
+        analyses = args.sessions * args.turns
+        rows.append({
+            'case': name,
+            'ms_per_reanalysis': elapsed / analyses * 1000.0,
+            'ms_per_session': elapsed / args.sessions * 1000.0,
+        })
+
+    print(f"{args.sessions} sessions x {args.turns} turns, window {args.window}, half-life {args.half_life}")
+    print_table(rows, ['case', 'ms_per_reanalysis', 'ms_per_session'])
+    write_report('trajectory', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Query latency of the NumPy vector store against Chroma.
+
+Uses random unit vectors with the MiniLM dimension so that only the store
+itself is measured, not the embedding model. Run from the backend directory:
+
+    python -m benchmarks.vector_store_benchmark --sizes 100 1000 10000
+"""
+
+import argparse
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import measure, print_table, write_report
+from vector_store import NumpyVectorStore, get_vector_index
+
+EMBEDDING_DIM = 384
+
+
+class _PrecomputedEmbeddings:
+    """Embedding function that looks texts up in a table of precomputed vectors"""
+
+    def __init__(self, texts, vectors: np.ndarray):
+        self.vectors = dict(zip(texts, vectors))
+
+    def embed_documents(self, texts):
+        return [self.vectors[text].tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text].tolist()
+
+
+def _random_unit_vectors(count: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_numpy(corpus: np.ndarray, queries: np.ndarray, k: int, index_name: str, workdir: str, iterations: int):
+    texts = [f"chunk {i}" for i in range(len(corpus))]
+    embeddings = _PrecomputedEmbeddings(texts, corpus)
+    store = NumpyVectorStore(embeddings, persist_directory=workdir, index=get_vector_index(index_name))
+    store.add_texts(texts)
+    store.persist()
+    store = NumpyVectorStore.load(workdir, embeddings, index=get_vector_index(index_name))
+
+    position = iter(range(10 ** 9))
+    return measure(
+        lambda: store.similarity_search_by_vector(queries[next(position) % len(queries)], k=k),
+        iterations=iterations
+    )
+
+
+def bench_chroma(corpus: np.ndarray, queries: np.ndarray, k: int, workdir: str, iterations: int):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=workdir)
+    collection = client.create_collection('benchmark', metadata={'hnsw:space': 'cosine'})
+    # Chroma caps the number of records per add call
+    batch = 5000
+    for start in range(0, len(corpus), batch):
+        end = min(start + batch, len(corpus))
+        collection.add(
+            ids=[str(i) for i in range(start, end)],
+            embeddings=corpus[start:end].tolist(),
+            documents=[f"chunk {i}" for i in range(start, end)]
+        )
+
+    position = iter(range(10 ** 9))
+    return measure(
+        lambda: collection.query(query_embeddings=[queries[next(position) % len(queries)].tolist()], n_results=k),
+        iterations=iterations
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--skip-chroma', action='store_true', help='Only benchmark the NumPy store')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    queries = _random_unit_vectors(256, rng)
+    rows = []
+
+    for size in args.sizes:
+        corpus = _random_unit_vectors(size, rng)
+        backends = [('numpy-exact', 'exact'), ('numpy-hnsw', 'hnsw')]
+        if not args.skip_chroma:
+            backends.append(('chroma', None))
+
+        for name, index_name in backends:
+            with tempfile.TemporaryDirectory() as workdir:
+                try:
+                    if index_name:
+                        stats = bench_numpy(corpus, queries, args.k, index_name, workdir, args.iterations)
+                    else:
+                        stats = bench_chroma(corpus, queries, args.k, workdir, args.iterations)
+                except ImportError as e:
+                    print(f"Skipping {name}: {e}")
+                    continue
+            rows.append({'backend': name, 'corpus_size': size, **stats})
+
+    print_table(rows, ['backend', 'corpus_size', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+    write_report('vector_store', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Resident memory per gunicorn worker with and without preloading.
+
+Starts `gunicorn -c gunicorn.conf.py server:app` once per mode, waits until
+every worker answers /api/health, sends a few warm-up requests and then
+reads /proc/<pid>/smaps_rollup of each worker. RSS counts shared pages in
+every process; PSS divides them between the processes sharing them, so
+the PSS total is the real memory cost of the deployment. Linux only. Run
+from the backend directory:
+
+    python -m benchmarks.worker_memory --workers 4
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.common import print_table, write_report
+
+MODES = {
+    'no_preload': {'GUNICORN_PRELOAD': 'false'},
+    'preload': {'GUNICORN_PRELOAD': 'true', 'GUNICORN_GC_FREEZE': 'false'},
+    'preload_gc_freeze': {'GUNICORN_PRELOAD': 'true', 'GUNICORN_GC_FREEZE': 'true'},
+}
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps_rollup(pid: int) -> Dict[str, float]:
+    """Memory totals of a process in MiB"""
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(':') in SMAPS_FIELDS:
+            values[parts[0].rstrip(':')] = int(parts[1]) / 1024.0
+    return values
+
+
+def child_pids(pid: int) -> List[int]:
+    children = Path(f"/proc/{pid}/task/{pid}/children")
+    return [int(child) for child in children.read_text().split()] if children.exists() else []
+
+
+def wait_until_healthy(port: int, workers: int, timeout: float):
+    """Poll the health endpoint until every worker has had a chance to serve it"""
+    deadline = time.time() + timeout
+    healthy = 0
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=5) as response:
+                if response.status == 200:
+                    healthy += 1
+                    if healthy >= workers * 4:
+                        return
+                    continue
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server did not become healthy within {timeout}s")
+
+
+def measure_mode(mode: str, args) -> Dict:
+    env = {**os.environ, **MODES[mode], 'WEB_CONCURRENCY': str(args.workers), 'PORT': str(args.port)}
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'server:app'],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL if not args.verbose else None
+    )
+    try:
+        wait_until_healthy(args.port, args.workers, args.timeout)
+        time.sleep(args.settle)
+
+        workers = [read_smaps_rollup(pid) for pid in child_pids(process.pid)]
+        master = read_smaps_rollup(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+    totals = {field: sum(worker.get(field, 0.0) for worker in workers) for field in SMAPS_FIELDS}
+    return {
+        'mode': mode,
+        'workers': len(workers),
+        'rss_per_worker_mib': totals['Rss'] / len(workers) if workers else 0.0,
+        'pss_per_worker_mib': totals['Pss'] / len(workers) if workers else 0.0,
+        'private_per_worker_mib': (totals['Private_Clean'] + totals['Private_Dirty']) / len(workers) if workers else 0.0,
+        'pss_total_mib': totals['Pss'] + master.get('Pss', 0.0),
+        'master_rss_mib': master.get('Rss', 0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8011)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--timeout', type=float, default=300.0, help='Seconds to wait for the server to start')
+    parser.add_argument('--settle', type=float, default=2.0, help='Seconds to wait before reading memory')
+    parser.add_argument('--verbose', action='store_true', help='Show gunicorn logs')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    rows = [measure_mode(mode, args) for mode in args.modes]
+    print_table(rows, ['mode', 'workers', 'rss_per_worker_mib', 'pss_per_worker_mib',
+                       'private_per_worker_mib', 'pss_total_mib', 'master_rss_mib'])
+    write_report('worker_memory', rows, args.output)
+
+
+if __name__ == '__main__':
+    main()
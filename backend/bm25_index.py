@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import math
+import logging
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Small stop list; the sklearn list drops words like "down" and "empty"
+# that matter for mental health queries
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'i',
+    'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'that', 'the', 'this',
+    'to', 'was', 'what', 'with', 'you', 'your', 'do', 'does', 'how', 'can', 'about'
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into BM25 terms"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class BM25Index:
+    """Sparse BM25 inverted index over knowledge base chunks.
+
+    Chunks are grouped by their source document so that a changed document
+    can be replaced without rebuilding the whole index.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[str, int] = {}
+        self.chunks: Dict[str, Dict] = {}
+        self.sources: Dict[str, Dict] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def avg_doc_length(self) -> float:
+        return self.total_length / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def add(self, chunk_id: str, text: str, metadata: Optional[Dict] = None):
+        """Index a single chunk, replacing any previous version"""
+        if chunk_id in self.doc_lengths:
+            self.remove(chunk_id)
+
+        terms = tokenize(text)
+        for term, count in Counter(terms).items():
+            self.postings[term][chunk_id] = count
+
+        self.doc_lengths[chunk_id] = len(terms)
+        self.total_length += len(terms)
+        self.chunks[chunk_id] = {'text': text, 'metadata': metadata or {}}
+
+    def remove(self, chunk_id: str):
+        """Remove a chunk from the index"""
+        if chunk_id not in self.doc_lengths:
+            return
+
+        for term in set(tokenize(self.chunks[chunk_id]['text'])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+
+        self.total_length -= self.doc_lengths.pop(chunk_id)
+        del self.chunks[chunk_id]
+
+    def upsert_source(self, source: str, chunks: List[Tuple[str, str, Dict]], content_hash: str):
+        """Replace all chunks of a source document with a new set of (id, text, metadata)"""
+        self.remove_source(source)
+        for chunk_id, text, metadata in chunks:
+            self.add(chunk_id, text, metadata)
+        self.sources[source] = {
+            'hash': content_hash,
+            'chunk_ids': [chunk_id for chunk_id, _, _ in chunks]
+        }
+
+    def remove_source(self, source: str) -> List[str]:
+        """Remove every chunk of a source document and return the removed ids"""
+        entry = self.sources.pop(source, None)
+        if not entry:
+            return []
+        for chunk_id in entry['chunk_ids']:
+            self.remove(chunk_id)
+        return entry['chunk_ids']
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float, float]]:
+        """Return (chunk_id, score, term coverage) for the top k chunks"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.doc_lengths:
+            return []
+
+        n_docs = len(self.doc_lengths)
+        avg_length = self.avg_doc_length or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        matched: Dict[str, int] = defaultdict(int)
+
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[chunk_id] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(chunk_id, score, matched[chunk_id] / len(terms)) for chunk_id, score in ranked]
+
+    def save(self, path: str):
+        """Persist the index as JSON; postings are rebuilt on load"""
+        path = Path(path)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'k1': self.k1,
+                'b': self.b,
+                'chunks': self.chunks,
+                'sources': self.sources
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load an index saved with save()"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        index = cls(k1=data.get('k1', 1.5), b=data.get('b', 0.75))
+        for chunk_id, chunk in data.get('chunks', {}).items():
+            index.add(chunk_id, chunk['text'], chunk.get('metadata'))
+        index.sources = data.get('sources', {})
+
+        logger.info(f"Loaded BM25 index with {len(index)} chunks")
+        return index
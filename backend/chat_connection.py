@@ -0,0 +1,280 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+from crisis_detection import CRISIS_RESPONSE
+from llm_scheduler import llm_scheduler
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_CONNECTIONS = registry.gauge(
+    'psychmaster_websocket_connections',
+    'Open chat WebSocket connections'
+)
+WEBSOCKET_STREAMS = registry.gauge(
+    'psychmaster_websocket_streams',
+    'Chat WebSocket replies being streamed'
+)
+WEBSOCKET_MESSAGES = registry.counter(
+    'psychmaster_websocket_messages_total',
+    'Chat WebSocket frames by direction and type',
+    ('direction', 'type')
+)
+
+# Close codes: 1000 normal, 1008 policy violation, 1013 try again later
+CLOSE_IDLE = 1000
+CLOSE_SLOW_CONSUMER = 1008
+CLOSE_OVERLOADED = 1013
+
+
+class ChatConnection:
+    """One chat WebSocket, bound to a single session for its whole lifetime.
+
+    Client frames are JSON objects: ``{"type": "message", "content": ...}``
+    or ``{"type": "ping"}``. The server answers with ``session`` once, then
+    for every message a stream of ``token`` frames, a ``done`` frame and,
+    when the live assessment changes, a ``risk`` frame.
+
+    With an admission controller, every message is rate limited like a
+    POST to /api/chat; a rejected message gets an ``error`` frame with its
+    status and ``retry_after`` instead of a reply.
+
+    Messages are handled one at a time and the next frame is only read once
+    the reply is complete, so a client can't queue up work. Tokens are
+    produced on a thread of the stream pool, which caps the replies streamed
+    at once (a message over the cap gets a 503 ``error`` frame) and keeps
+    slow readers off the shared threadpool. The producer only starts once
+    the turn holds an LLM slot, which it waits for on the event loop. It must
+    take a credit before handing a token to the event loop; credits are
+    returned as frames are sent, so a slow reader pauses the LLM stream
+    instead of buffering it. A connection that waits for nothing but the
+    client holds no thread or queue, which keeps thousands of idle
+    connections per worker cheap.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        service,
+        admission=None,
+        streams: Optional['StreamPool'] = None,
+        scheduler=None,
+        client: Optional[str] = None,
+        send_window: int = 32,
+        idle_timeout: float = 300.0,
+        send_timeout: float = 10.0,
+        max_message_chars: int = 4000
+    ):
+        self.websocket = websocket
+        self.service = service
+        self.admission = admission
+        self.streams = streams or stream_pool
+        self.scheduler = scheduler or llm_scheduler
+        self.client = client
+        self.send_window = send_window
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self.max_message_chars = max_message_chars
+        self.session_id: Optional[str] = None
+        self.session: Optional[Dict] = None
+        self.risk: Optional[Dict] = None
+
+    async def run(self, session_id: Optional[str] = None):
+        """Accept the connection, bind the session and serve messages until close"""
+        await self.websocket.accept()
+        self.session_id = self.service.open_session(session_id)
+        # Held for the connection's lifetime instead of being looked up per message
+        self.session = self.service.sessions[self.session_id]
+        await self._send({'type': 'session', 'session_id': self.session_id})
+
+        while True:
+            try:
+                frame = await asyncio.wait_for(self.websocket.receive_json(), timeout=self.idle_timeout)
+            except asyncio.TimeoutError:
+                await self.websocket.close(code=CLOSE_IDLE, reason='idle timeout')
+                return
+            except (ValueError, KeyError):
+                await self._send({'type': 'error', 'detail': 'Frames must be JSON objects'})
+                continue
+
+            kind = frame.get('type') if isinstance(frame, dict) else None
+            WEBSOCKET_MESSAGES.inc(direction='in', type=str(kind))
+            if kind == 'ping':
+                await self._send({'type': 'pong'})
+            elif kind == 'message':
+                await self._handle_message(frame.get('content'))
+            else:
+                await self._send({'type': 'error', 'detail': f"Unknown frame type {kind!r}"})
+
+    async def _handle_message(self, content):
+        if not isinstance(content, str) or not content.strip():
+            await self._send({'type': 'error', 'detail': 'Message content must be a non-empty string'})
+            return
+        if len(content) > self.max_message_chars:
+            await self._send({'type': 'error', 'detail': f"Message longer than {self.max_message_chars} characters"})
+            return
+
+        admission = self.admission.admit(content, self.session_id, self.client) if self.admission else None
+        if admission and admission.crisis:
+            # Over the limits, but a crisis is always answered, without the LLM
+            self.service.record_crisis(self.session_id)
+            await self._send({'type': 'token', 'content': CRISIS_RESPONSE})
+            done, risk = {'type': 'done', 'is_crisis': True}, None
+            await self._send(done)
+        elif admission and not admission.admitted:
+            await self._send({
+                'type': 'error',
+                'status': admission.status,
+                'reason': admission.reason,
+                'retry_after': admission.retry_after
+            })
+            return
+        elif not self.streams.try_acquire():
+            if admission:
+                self.admission.release()
+            await self._send({'type': 'error', 'status': 503, 'reason': 'streams', 'retry_after': 1})
+            return
+        else:
+            try:
+                done, risk = await self._reply(content)
+            finally:
+                self.streams.release()
+                if admission:
+                    self.admission.release()
+
+        if done.get('is_crisis'):
+            await self._push_risk({'predicted_state': 'Suicidal', 'risk_level': 'high', 'crisis': True})
+        elif not done.get('error') and risk:
+            await self._push_risk(risk)
+
+    async def _reply(self, content: str) -> Tuple[Dict, Optional[Dict]]:
+        """Answer a message; returns its done event and the live risk the service assessed for it.
+
+        Only the LLM part is streamed.
+        """
+        turn = await run_in_threadpool(self.service.begin_turn, content, self.session_id)
+        if turn.get('pending'):
+            async with self.scheduler.slot_async(turn['priority']):
+                return await self._stream_reply(turn), turn['risk']
+
+        events = self.service.result_events(turn)
+        for event in events:
+            await self._send(event)
+        return events[-1], turn.get('risk')
+
+    async def _stream_reply(self, turn: Dict) -> Dict:
+        """Send the turn's token events as the service produces them; returns the done event"""
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        credits = threading.Semaphore(self.send_window)
+        closed = threading.Event()
+
+        def produce():
+            stream = self.service.stream_turn(turn)
+            try:
+                for event in stream:
+                    while not credits.acquire(timeout=0.5):
+                        if closed.is_set():
+                            return
+                    if closed.is_set():
+                        return
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            finally:
+                stream.close()
+                loop.call_soon_threadsafe(events.put_nowait, None)
+
+        producer = self.streams.submit(produce)
+        done = {'type': 'done', 'is_crisis': False, 'error': 'Reply interrupted'}
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                await self._send(event)
+                credits.release()
+                if event['type'] == 'done':
+                    done = event
+        finally:
+            # Stops the producer (and the LLM stream) if the client went away
+            closed.set()
+            await producer
+        return done
+
+    async def _push_risk(self, risk: Dict):
+        if self.risk and all(self.risk.get(key) == risk.get(key) for key in ('predicted_state', 'risk_level')):
+            return
+        self.risk = risk
+        await self._send({'type': 'risk', **risk})
+
+    async def _send(self, payload: Dict):
+        try:
+            await asyncio.wait_for(self.websocket.send_json(payload), timeout=self.send_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Closing chat WebSocket for session {self.session_id}: client is not reading")
+            await self.websocket.close(code=CLOSE_SLOW_CONSUMER, reason='slow consumer')
+            raise WebSocketDisconnect(code=CLOSE_SLOW_CONSUMER)
+        WEBSOCKET_MESSAGES.inc(direction='out', type=payload['type'])
+
+
+class ConnectionLimiter:
+    """Caps the chat WebSockets a worker holds open"""
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.open = 0
+
+    def try_acquire(self) -> bool:
+        if self.open >= self.max_connections:
+            return False
+        self.open += 1
+        return True
+
+    def release(self):
+        self.open -= 1
+
+
+class StreamPool:
+    """Dedicated threads for reply producers, one per stream streamed at once"""
+
+    def __init__(self, max_streams: int):
+        self.max_streams = max_streams
+        self.active = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix='chat-stream')
+
+    def try_acquire(self) -> bool:
+        if self.active >= self.max_streams:
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+
+    def submit(self, func) -> asyncio.Future:
+        """Run a producer; with try_acquire in front, it never queues behind another"""
+        return asyncio.get_running_loop().run_in_executor(self._executor, func)
+
+
+# Global limiter shared by the chat WebSocket endpoint
+connection_limiter = ConnectionLimiter(int(os.environ.get('WS_MAX_CONNECTIONS', '10000')))
+WEBSOCKET_CONNECTIONS.set_function(lambda: connection_limiter.open)
+
+# Global pool for the reply streams of all chat WebSockets of this worker
+stream_pool = StreamPool(int(os.environ.get('WS_MAX_STREAMS', '64')))
+WEBSOCKET_STREAMS.set_function(lambda: stream_pool.active)
+
+
+# ChatConnection options shared by all connections of this worker
+CHAT_CONNECTION_SETTINGS = {
+    'send_window': int(os.environ.get('WS_SEND_WINDOW', '32')),
+    'idle_timeout': float(os.environ.get('WS_IDLE_TIMEOUT_SECONDS', '300')),
+    'send_timeout': float(os.environ.get('WS_SEND_TIMEOUT_SECONDS', '10')),
+    'max_message_chars': int(os.environ.get('WS_MAX_MESSAGE_CHARS', '4000')),
+}
@@ -0,0 +1,178 @@
+import os
+import re
+import logging
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from metrics import registry, CRISIS_HITS
+from psychological_analysis import psychological_analyzer
+
+logger = logging.getLogger(__name__)
+
+CRISIS_TIER_LATENCY = registry.histogram(
+    'psychmaster_crisis_tier_duration_seconds',
+    'Latency of each tier of the crisis detection cascade',
+    ('tier',),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)
+)
+CRISIS_TIER_EXITS = registry.counter(
+    'psychmaster_crisis_tier_exits_total',
+    'Messages on which the crisis cascade stopped at each tier',
+    ('tier', 'outcome')
+)
+
+CRISIS_KEYWORDS = (
+    'suicide', 'kill myself', 'end my life', 'hurt myself',
+    'want to die', 'better off dead', 'self harm'
+)
+
+# Substring match like the original keyword list, tolerating extra spaces and hyphens
+_KEYWORD_PATTERN = re.compile(
+    '|'.join(re.escape(keyword).replace(r'\ ', r'[\s-]+') for keyword in CRISIS_KEYWORDS),
+    re.IGNORECASE
+)
+
+CRISIS_EXEMPLARS = (
+    "I don't want to be alive anymore",
+    "I'm thinking about ending it all",
+    "Everyone would be better off without me",
+    "I have a plan to take my own life",
+    "I can't see any reason to keep living",
+    "I've been cutting myself again",
+    "I wish I could go to sleep and never wake up",
+    "I'm going to take all my pills tonight",
+    "There's no way out and I want it to be over",
+    "I said goodbye to my family because I won't be here much longer",
+)
+
+CRISIS_RESPONSE = """I'm very concerned about what you've shared. Your life has value, and there are people who want to help you through this difficult time.
+
+Please reach out for immediate support:
+• National Suicide Prevention Lifeline: 988 (available 24/7)
+• Crisis Text Line: Text HOME to 741741
+• Emergency Services: 911
+
+You don't have to go through this alone. Professional counselors are available right now to talk with you. Would you like me to help you find local mental health resources?"""
+
+
+class CrisisDetector:
+    """Cascade of increasingly expensive crisis checks for a single chat message.
+
+    Tiers run in order and the cascade stops at the first confident one:
+    the compiled keyword pattern, then the classifier's Suicidal
+    probability (at least ``classifier_threshold`` is a crisis, below
+    ``classifier_clear`` is confidently not one), then, if enabled, the
+    cosine similarity of the message to a set of crisis exemplars. The
+    clear exit is off by default: single messages such as "I'm thinking
+    about ending it all" get a low Suicidal probability, and those are
+    what the exemplar tier is for.
+    """
+
+    def __init__(
+        self,
+        analyzer,
+        classifier_threshold: float = 0.7,
+        classifier_clear: float = 0.0,
+        embedding_check: bool = False,
+        embedding_threshold: float = 0.75
+    ):
+        self.analyzer = analyzer
+        self.classifier_threshold = classifier_threshold
+        self.classifier_clear = classifier_clear
+        self.embedding_check = embedding_check
+        self.embedding_threshold = embedding_threshold
+        self._exemplar_vectors = None
+        self._exemplar_embeddings_id = None
+        self._lock = threading.Lock()
+
+    def detect(self, message: str, embeddings=None) -> Optional[str]:
+        """Name of the tier that flagged the message as a crisis, or None"""
+        if self._keyword_match(message):
+            return self._exit('keyword', crisis=True)
+
+        probability = self._suicidal_probability(message)
+        if probability is not None:
+            if probability >= self.classifier_threshold:
+                return self._exit('classifier', crisis=True)
+            if probability < self.classifier_clear:
+                return self._exit('classifier', crisis=False)
+
+        if self.embedding_check and embeddings is not None:
+            similarity = self._exemplar_similarity(message, embeddings)
+            if similarity is not None:
+                return self._exit('embedding', crisis=similarity >= self.embedding_threshold)
+
+        CRISIS_TIER_EXITS.inc(tier='none', outcome='clear')
+        return None
+
+    def detect_keyword(self, message: str) -> Optional[str]:
+        """Only the keyword tier: 'keyword' for a match, else None; cheap enough for the event loop"""
+        return self._exit('keyword', crisis=True) if self._keyword_match(message) else None
+
+    @staticmethod
+    def _keyword_match(message: str) -> bool:
+        with CRISIS_TIER_LATENCY.time(tier='keyword'):
+            return _KEYWORD_PATTERN.search(message) is not None
+
+    def _exit(self, tier: str, crisis: bool) -> Optional[str]:
+        CRISIS_TIER_EXITS.inc(tier=tier, outcome='crisis' if crisis else 'clear')
+        if crisis:
+            CRISIS_HITS.inc(source=tier)
+            return tier
+        return None
+
+    def _suicidal_probability(self, message: str) -> Optional[float]:
+        analyzer = self.analyzer
+        if not analyzer.model or not analyzer.vectorizer or not analyzer.label_encoder:
+            return None
+        if 'Suicidal' not in analyzer.label_encoder.classes_:
+            return None
+        try:
+            with CRISIS_TIER_LATENCY.time(tier='classifier'):
+                text = analyzer.preprocess_text(message)
+                if not text:
+                    return None
+                probabilities = analyzer.model.predict_proba(analyzer.vectorizer.transform([text]))[0]
+                suicidal = analyzer.label_encoder.transform(['Suicidal'])[0]
+                column = list(analyzer.model.classes_).index(suicidal)
+                return float(probabilities[column])
+        except Exception as e:
+            logger.error(f"Crisis classifier tier failed: {str(e)}")
+            return None
+
+    def _exemplar_similarity(self, message: str, embeddings) -> Optional[float]:
+        try:
+            with CRISIS_TIER_LATENCY.time(tier='embedding'):
+                exemplars = self._exemplars(embeddings)
+                # Documents on both sides so no query instruction skews the comparison
+                vector = self._normalize(embeddings.embed_documents([message]))[0]
+                return float((exemplars @ vector).max())
+        except Exception as e:
+            logger.error(f"Crisis embedding tier failed: {str(e)}")
+            return None
+
+    def _exemplars(self, embeddings) -> np.ndarray:
+        """Exemplar vectors for this embedding model, embedded once"""
+        with self._lock:
+            if self._exemplar_embeddings_id != id(embeddings):
+                self._exemplar_vectors = self._normalize(embeddings.embed_documents(list(CRISIS_EXEMPLARS)))
+                self._exemplar_embeddings_id = id(embeddings)
+            return self._exemplar_vectors
+
+    @staticmethod
+    def _normalize(vectors: List[List[float]]) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+# Global detector used by the chat service
+crisis_detector = CrisisDetector(
+    psychological_analyzer,
+    classifier_threshold=float(os.environ.get('CRISIS_CLASSIFIER_THRESHOLD', '0.7')),
+    classifier_clear=float(os.environ.get('CRISIS_CLASSIFIER_CLEAR', '0')),
+    embedding_check=os.environ.get('CRISIS_EMBEDDING_CHECK', 'false').lower() == 'true',
+    embedding_threshold=float(os.environ.get('CRISIS_EMBEDDING_THRESHOLD', '0.75'))
+)
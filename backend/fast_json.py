@@ -0,0 +1,64 @@
+import json
+import logging
+from typing import Any, Type
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+if orjson is None:
+    logger.warning("orjson is not installed, API responses use the standard json encoder")
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types the encoder doesn't handle natively"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, BaseModel):
+        return dict(obj)
+    return jsonable_encoder(obj)
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes, converting numpy scalars and arrays natively"""
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (or json as a fallback)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def prevalidated_response(model: Type[BaseModel], data: dict, **kwargs) -> FastJSONResponse:
+    """Response for data the service built itself, shaped by ``model`` without re-validating it.
+
+    FastAPI would validate a returned dict against the response model and
+    run it through jsonable_encoder before rendering; for the large nested
+    dicts the services produce that is pure overhead. The model is only
+    used to pick its fields and fill in defaults.
+    """
+    return FastJSONResponse(dict(model.model_construct(**data)), **kwargs)
@@ -0,0 +1,57 @@
+"""
+Gunicorn configuration for running several uvicorn workers that share the
+read-only model memory.
+
+With preload_app the master imports server.py once, which loads the sklearn
+classifier and vectorizer, the MiniLM embedder, the vector store and the
+recommendation payloads. Workers are then forked and share those pages
+copy-on-write. CPython writes reference counts and GC headers into every
+object it touches, which would gradually copy the shared pages into each
+worker, so the garbage collector is disabled while the app is preloaded
+and everything allocated up to the fork is moved to the permanent
+generation with gc.freeze(). Each worker re-enables the collector and
+recreates the clients that must not cross a fork (Motor, Chroma).
+
+Run from the backend directory:
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Settings (environment):
+    PORT                  listen port (8001)
+    WEB_CONCURRENCY       number of workers (4)
+    GUNICORN_PRELOAD      load the app in the master before forking (true)
+    GUNICORN_GC_FREEZE    freeze the preloaded heap before forking (true)
+
+Set OMP_NUM_THREADS / MKL_NUM_THREADS to a small value: thread pools that
+torch or BLAS started in the master do not survive the fork, and one pool
+per worker on every core oversubscribes the machine.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+gc_freeze = preload_app and os.environ.get('GUNICORN_GC_FREEZE', 'true').lower() == 'true'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+
+if gc_freeze:
+    # Collections during preload would touch (and later unshare) every object
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    if gc_freeze:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if gc_freeze:
+        gc.enable()
+    if preload_app:
+        import server as app_module
+        app_module.reset_after_fork()
+    server.log.info(f"Worker {worker.pid} ready ({gc.get_freeze_count()} objects frozen)")
@@ -0,0 +1,98 @@
+import logging
+from typing import Any, Dict, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from bm25_index import tokenize
+from metrics import STAGE_LATENCY
+from request_coalescing import SingleFlight, normalize_query
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODES = ('dense', 'sparse', 'hybrid')
+
+# Concurrent identical queries share one embed and search
+_retrieval_flight = SingleFlight('retrieval')
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever combining the BM25 index with the dense vector store.
+
+    In hybrid mode short queries whose terms are all found in the best
+    BM25 chunk are answered lexically and never embedded; everything else
+    is ranked by reciprocal rank fusion of both result lists. Dense is the
+    default until hybrid recall has been shown to match it.
+    """
+
+    vector_store: Any
+    bm25_index: Any
+    mode: str = 'dense'
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    dense_weight: float = 1.0
+    sparse_weight: float = 1.0
+    max_lexical_terms: int = 4
+
+    def _sparse_documents(self, results) -> List[Document]:
+        documents = []
+        for chunk_id, score, _ in results:
+            chunk = self.bm25_index.chunks[chunk_id]
+            documents.append(Document(
+                id=chunk_id,
+                page_content=chunk['text'],
+                metadata={**chunk['metadata'], 'bm25_score': score}
+            ))
+        return documents
+
+    def _is_lexical_match(self, query: str, results) -> bool:
+        """Short queries fully covered by the top BM25 hit skip the dense path"""
+        if not results:
+            return False
+        terms = set(tokenize(query))
+        return 0 < len(terms) <= self.max_lexical_terms and results[0][2] >= 1.0
+
+    def _dense_documents(self, query: str, k: int) -> List[Document]:
+        with STAGE_LATENCY.time(pipeline='chat', stage='query_embedding'):
+            embedding = self.vector_store.embeddings.embed_query(query)
+        with STAGE_LATENCY.time(pipeline='chat', stage='vector_search'):
+            return self.vector_store.similarity_search_by_vector(embedding, k=k)
+
+    def _fuse(self, dense: List[Document], sparse: List[Document]) -> List[Document]:
+        """Reciprocal rank fusion keyed on chunk text"""
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+
+        for weight, ranked in ((self.dense_weight, dense), (self.sparse_weight, sparse)):
+            for rank, document in enumerate(ranked):
+                key = document.page_content
+                scores[key] = scores.get(key, 0.0) + weight / (self.rrf_k + rank + 1)
+                documents.setdefault(key, document)
+
+        ranked_keys = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [documents[key] for key in ranked_keys]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = (id(self), normalize_query(query))
+        return list(_retrieval_flight.do(key, lambda: self._retrieve(query)))
+
+    def _retrieve(self, query: str) -> List[Document]:
+        if self.mode == 'dense' or self.bm25_index is None:
+            return self._dense_documents(query, self.k)
+
+        with STAGE_LATENCY.time(pipeline='chat', stage='keyword_search'):
+            sparse_results = self.bm25_index.search(query, k=self.fetch_k)
+
+        if self.mode == 'sparse':
+            return self._sparse_documents(sparse_results[:self.k])
+
+        if self._is_lexical_match(query, sparse_results):
+            logger.debug("Lexical match, skipping dense retrieval")
+            return self._sparse_documents(sparse_results[:self.k])
+
+        dense = self._dense_documents(query, self.fetch_k)
+        return self._fuse(dense, self._sparse_documents(sparse_results))
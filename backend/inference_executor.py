@@ -0,0 +1,190 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from metrics import registry, STAGE_LATENCY
+from psychological_analysis import psychological_analyzer
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ('thread', 'process')
+
+INFERENCE_QUEUE_DEPTH = registry.gauge(
+    'psychmaster_inference_queue_depth',
+    'Conversations waiting for classifier inference'
+)
+INFERENCE_BATCH_SIZE = registry.histogram(
+    'psychmaster_inference_batch_size',
+    'Conversations analyzed per classifier inference batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+# Analyzer of a pool process, set by the pool initializer
+_process_analyzer = None
+
+
+def _init_process():
+    global _process_analyzer
+    from psychological_analysis import psychological_analyzer as analyzer
+    _process_analyzer = analyzer
+
+
+def _analyze_in_process(conversations: List[List[Dict]], session_ids: List[Optional[str]], trajectories: List):
+    """Analyze a batch in a pool process; returns the results and the stage timings observed"""
+    # The parent's live risk checks already scored most turns of these sessions
+    _process_analyzer.import_trajectories(conversations, session_ids, trajectories)
+    try:
+        with STAGE_LATENCY.recording() as observations:
+            results = _process_analyzer.analyze_conversations(conversations, session_ids)
+    finally:
+        # The sessions are ending, so their entries would only crowd this process's cache
+        for session_id in session_ids:
+            if session_id is not None:
+                _process_analyzer.trajectory_cache.discard(session_id)
+    return results, observations
+
+
+class InferenceBatcher:
+    """Micro-batching executor for end-of-session conversation analysis.
+
+    Requests queue their conversation and wait on a future. A background
+    task takes the first waiting conversation, collects whatever else
+    arrives within ``max_wait`` seconds (up to ``max_batch_size``) and
+    analyzes the whole batch with a single vectorize and predict_proba call
+    off the event loop, either on a dedicated thread or in a process pool
+    whose processes hold their own preloaded analyzer. A pool process gets
+    the sessions' cached turn scores along with the batch, and sends its
+    stage timings back to be recorded in this process's metrics.
+    """
+
+    def __init__(
+        self,
+        analyzer,
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        executor: str = 'thread',
+        processes: int = 1
+    ):
+        if executor not in EXECUTOR_KINDS:
+            logger.warning(f"Unknown inference executor '{executor}', using a thread")
+            executor = 'thread'
+        self.analyzer = analyzer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor_kind = executor
+        self.processes = processes
+        self.queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[Executor] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+    def start(self):
+        """Start the executor and the batching task on the running event loop"""
+        if self._task:
+            return
+        if self.executor_kind == 'process':
+            self._executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_process)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Inference batcher started ({self.executor_kind}, batch <= {self.max_batch_size})")
+
+    async def analyze(self, messages: List[Dict], session_id: Optional[str] = None) -> Dict:
+        """Analyze one conversation as part of the next batch"""
+        if self._task is None:
+            return self.analyzer.analyze_conversation(messages, session_id)
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((messages, session_id, future))
+        with STAGE_LATENCY.time(pipeline='end_session', stage='inference_wait'):
+            return await future
+
+    async def _next_batch(self) -> Optional[List[Tuple[List[Dict], Optional[str], asyncio.Future]]]:
+        first = await self.queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self.queue.get_nowait()
+            if item is None:
+                # Put the stop marker back so the run loop ends after this batch
+                self.queue.put_nowait(None)
+                break
+            batch.append(item)
+        return batch
+
+    async def _analyze_batch(self, conversations: List[List[Dict]], session_ids: List[Optional[str]]) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        if self.executor_kind != 'process':
+            return await loop.run_in_executor(
+                self._executor, self.analyzer.analyze_conversations, conversations, session_ids
+            )
+
+        trajectories = self.analyzer.export_trajectories(conversations, session_ids)
+        results, observations = await loop.run_in_executor(
+            self._executor, _analyze_in_process, conversations, session_ids, trajectories
+        )
+        for value, labels in observations:
+            STAGE_LATENCY.observe(value, **labels)
+        return results
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if batch is None:
+                break
+
+            INFERENCE_BATCH_SIZE.observe(len(batch))
+            try:
+                with STAGE_LATENCY.time(pipeline='end_session', stage='inference_batch'):
+                    results = await self._analyze_batch(
+                        [messages for messages, _, _ in batch],
+                        [session_id for _, session_id, _ in batch]
+                    )
+            except Exception as e:
+                logger.error(f"Error in inference batch of {len(batch)}: {str(e)}")
+                results = [self.analyzer._get_fallback_analysis() for _ in batch]
+
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def stop(self):
+        """Finish the queued conversations and shut the executor down"""
+        if not self._task:
+            return
+        self.queue.put_nowait(None)
+        await self._task
+        self._task = None
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        logger.info("Inference batcher stopped")
+
+
+# Global batcher used by the end-session endpoint
+inference_batcher = InferenceBatcher(
+    psychological_analyzer,
+    max_batch_size=int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', '32')),
+    max_wait=float(os.environ.get('INFERENCE_BATCH_WINDOW_MS', '5')) / 1000.0,
+    executor=os.environ.get('INFERENCE_EXECUTOR', 'thread').lower(),
+    processes=int(os.environ.get('INFERENCE_PROCESSES', '1'))
+)
+INFERENCE_QUEUE_DEPTH.set_function(lambda: inference_batcher.depth)
@@ -1,6 +1,10 @@
 import os
+import copy
+import time
+import hashlib
+import threading
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterator, List
 import uuid
 from datetime import datetime
 from langchain_groq import ChatGroq
@@ -13,6 +17,14 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 import logging
 from psychological_analysis import psychological_analyzer
 from recommendation_system import recommendation_system
+from vector_store import NumpyVectorStore
+from bm25_index import BM25Index
+from hybrid_retriever import HybridRetriever, RETRIEVAL_MODES
+from request_coalescing import BatchingEmbeddings
+from onnx_embeddings import OnnxEmbeddings, DEFAULT_ONNX_PATH
+from crisis_detection import crisis_detector, CRISIS_RESPONSE
+from llm_scheduler import llm_scheduler
+from metrics import STAGE_LATENCY, FALLBACKS, ERRORS
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +33,8 @@ class MentalHealthChatService:
         self.llm = None
         self.qa_chain = None
         self.vector_db = None
+        self.bm25_index = None
+        self._refresh_lock = threading.Lock()
         self.sessions = {}  # Store session contexts
         self.initialize_service()
     
@@ -50,21 +64,75 @@ class MentalHealthChatService:
             logger.error(f"❌ Failed to initialize Groq LLM: {str(e)}")
             return False
     
+    def _create_embeddings(self):
+        """Create the sentence embedding model used for retrieval"""
+        embeddings = None
+        if os.environ.get('EMBEDDING_BACKEND', 'huggingface').lower() == 'onnx':
+            embeddings = self._create_onnx_embeddings()
+        
+        if embeddings is None:
+            embeddings = HuggingFaceBgeEmbeddings(
+                model_name='sentence-transformers/all-MiniLM-L6-v2'
+            )
+        
+        # Concurrent chat queries are embedded together in one forward pass
+        return BatchingEmbeddings(
+            embeddings,
+            max_batch_size=int(os.environ.get('EMBEDDING_MAX_BATCH_SIZE', '32')),
+            max_wait=float(os.environ.get('EMBEDDING_BATCH_WINDOW_MS', '2')) / 1000.0
+        )
+    
+    def _create_onnx_embeddings(self):
+        """Load the exported ONNX embedder, or None to fall back to PyTorch"""
+        try:
+            embeddings = OnnxEmbeddings(
+                os.environ.get('ONNX_MODEL_PATH', DEFAULT_ONNX_PATH),
+                quantized=os.environ.get('ONNX_QUANTIZED', 'true').lower() == 'true'
+            )
+            logger.info(f"✅ ONNX embeddings loaded from {embeddings.model_path} ({embeddings.num_threads} threads)")
+            return embeddings
+        except Exception as e:
+            logger.error(f"❌ Failed to load ONNX embeddings, using PyTorch model: {str(e)}")
+            return None
+    
+    def _load_document_chunks(self, docs_path: Path) -> List:
+        """Load the knowledge base documents and split them into chunks"""
+        if not docs_path.exists():
+            logger.warning("⚠️ Docs directory not found")
+            return []
+        
+        loader = DirectoryLoader(str(docs_path), glob="*.txt", loader_cls=TextLoader)
+        documents = loader.load()
+        
+        if not documents:
+            logger.warning("⚠️ No documents found in docs directory")
+            return []
+        
+        return self._create_text_splitter().split_documents(documents)
+    
+    def _create_text_splitter(self):
+        """Splitter shared by the dense and keyword indexes"""
+        return RecursiveCharacterTextSplitter(
+            chunk_size=500, 
+            chunk_overlap=50
+        )
+    
     def create_vector_db(self):
         """Create or load the vector database"""
         try:
             docs_path = Path("./docs")
+            
+            if os.environ.get('VECTOR_STORE_BACKEND', 'chroma').lower() == 'numpy':
+                return self._create_numpy_vector_db(docs_path)
+            
             db_path = os.environ.get('CHROMA_DB_PATH', './chroma_db')
             
             # Check if vector DB already exists
             if os.path.exists(db_path):
                 logger.info("📁 Loading existing vector database...")
-                embeddings = HuggingFaceBgeEmbeddings(
-                    model_name='sentence-transformers/all-MiniLM-L6-v2'
-                )
                 self.vector_db = Chroma(
                     persist_directory=db_path, 
-                    embedding_function=embeddings
+                    embedding_function=self._create_embeddings()
                 )
                 logger.info("✅ Vector database loaded successfully")
                 return True
@@ -72,50 +140,180 @@ class MentalHealthChatService:
             # Create new vector DB if it doesn't exist
             logger.info("🔧 Creating new vector database...")
             
-            # Load documents
-            if docs_path.exists():
-                loader = DirectoryLoader(str(docs_path), glob="*.txt", loader_cls=TextLoader)
-                documents = loader.load()
-                
-                if documents:
-                    # Split documents
-                    text_splitter = RecursiveCharacterTextSplitter(
-                        chunk_size=500, 
-                        chunk_overlap=50
-                    )
-                    texts = text_splitter.split_documents(documents)
-                    
-                    # Create embeddings and vector store
-                    embeddings = HuggingFaceBgeEmbeddings(
-                        model_name='sentence-transformers/all-MiniLM-L6-v2'
-                    )
-                    
-                    self.vector_db = Chroma.from_documents(
-                        texts, 
-                        embeddings, 
-                        persist_directory=db_path
-                    )
-                    self.vector_db.persist()
-                    
-                    logger.info(f"✅ Vector database created with {len(texts)} document chunks")
-                    return True
-                else:
-                    logger.warning("⚠️ No PDF documents found in docs directory")
-                    return self._create_empty_vector_db(db_path)
-            else:
-                logger.warning("⚠️ Docs directory not found, creating empty vector DB")
+            texts = self._load_document_chunks(docs_path)
+            if not texts:
+                logger.warning("⚠️ Creating empty vector DB")
                 return self._create_empty_vector_db(db_path)
+            
+            self.vector_db = Chroma.from_documents(
+                texts, 
+                self._create_embeddings(), 
+                persist_directory=db_path
+            )
+            self.vector_db.persist()
+            
+            logger.info(f"✅ Vector database created with {len(texts)} document chunks")
+            return True
                 
         except Exception as e:
             logger.error(f"❌ Failed to create vector database: {str(e)}")
             return False
     
+    def _create_numpy_vector_db(self, docs_path: Path):
+        """Create or load the memory-mapped NumPy vector store"""
+        db_path = os.environ.get('NUMPY_VECTOR_DB_PATH', './vector_index')
+        embeddings = self._create_embeddings()
+        
+        if NumpyVectorStore.exists(db_path):
+            logger.info("📁 Loading existing NumPy vector store...")
+            self.vector_db = NumpyVectorStore.load(db_path, embeddings)
+            logger.info("✅ NumPy vector store loaded successfully")
+            return True
+        
+        logger.info("🔧 Creating new NumPy vector store...")
+        texts = self._load_document_chunks(docs_path)
+        if not texts:
+            from langchain.schema import Document
+            texts = [Document(page_content="Mental health support and guidance.", metadata={"source": "default"})]
+        
+        self.vector_db = NumpyVectorStore.from_documents(
+            texts,
+            embeddings,
+            persist_directory=db_path
+        )
+        logger.info(f"✅ NumPy vector store created with {len(texts)} document chunks")
+        return True
+    
+    def initialize_keyword_index(self):
+        """Load the BM25 index, bootstrapping it from the vector store chunks if needed"""
+        try:
+            index_path = os.environ.get('BM25_INDEX_PATH', './bm25_index.json')
+            
+            if os.path.exists(index_path):
+                self.bm25_index = BM25Index.load(index_path)
+            else:
+                logger.info("🔧 Building BM25 index from vector store chunks...")
+                self.bm25_index = BM25Index()
+                stored = self.vector_db.get()
+                
+                by_source = {}
+                for chunk_id, text, metadata in zip(stored['ids'], stored['documents'], stored['metadatas']):
+                    metadata = metadata or {}
+                    by_source.setdefault(metadata.get('source', 'default'), []).append((chunk_id, text, metadata))
+                
+                for source, chunks in by_source.items():
+                    source_path = Path(source)
+                    content_hash = self._file_hash(source_path) if source_path.is_file() else ''
+                    self.bm25_index.upsert_source(source, chunks, content_hash)
+                
+                self.bm25_index.save(index_path)
+            
+            self.refresh_knowledge_base()
+            logger.info(f"✅ BM25 index ready with {len(self.bm25_index)} chunks")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize BM25 index: {str(e)}")
+            self.bm25_index = None
+            return False
+    
+    @staticmethod
+    def _file_hash(path: Path) -> str:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    
+    def refresh_knowledge_base(self) -> Dict:
+        """Re-index only the documents that were added, changed or removed.
+        
+        Runs at startup and then every KNOWLEDGE_BASE_REFRESH_SECONDS (see
+        server.py). Changes are applied to copies of the BM25 index and the
+        NumPy store, which are swapped in together with a new QA chain, so
+        in-flight retrievals never see a half-updated index.
+        """
+        docs_path = Path("./docs")
+        summary = {'updated': [], 'removed': []}
+        
+        with self._refresh_lock:
+            if self.bm25_index is None or self.vector_db is None:
+                return summary
+            
+            current = {}
+            if docs_path.exists():
+                current = {str(path): self._file_hash(path) for path in sorted(docs_path.glob("*.txt"))}
+            
+            docs_prefix = str(docs_path) + os.sep
+            changed = [
+                source for source, content_hash in current.items()
+                if (self.bm25_index.sources.get(source) or {}).get('hash') != content_hash
+            ]
+            removed = [
+                source for source in self.bm25_index.sources
+                if source.startswith(docs_prefix) and source not in current
+            ]
+            if not changed and not removed:
+                return summary
+            
+            bm25_index = copy.deepcopy(self.bm25_index)
+            # Chroma is a database and takes the changes in place
+            vector_db = self.vector_db.copy() if isinstance(self.vector_db, NumpyVectorStore) else self.vector_db
+            
+            for source in changed:
+                chunks = self._create_text_splitter().split_documents(TextLoader(source).load())
+                chunk_ids = [
+                    hashlib.sha1(f"{source}:{i}:{chunk.page_content}".encode('utf-8')).hexdigest()
+                    for i, chunk in enumerate(chunks)
+                ]
+                
+                old_ids = bm25_index.remove_source(source)
+                if old_ids:
+                    vector_db.delete(ids=old_ids)
+                if chunks:
+                    vector_db.add_documents(chunks, ids=chunk_ids)
+                
+                bm25_index.upsert_source(
+                    source,
+                    [(chunk_id, chunk.page_content, chunk.metadata) for chunk_id, chunk in zip(chunk_ids, chunks)],
+                    current[source]
+                )
+                summary['updated'].append(source)
+            
+            for source in removed:
+                old_ids = bm25_index.remove_source(source)
+                if old_ids:
+                    vector_db.delete(ids=old_ids)
+                summary['removed'].append(source)
+            
+            if isinstance(vector_db, NumpyVectorStore):
+                vector_db.persist()
+            bm25_index.save(os.environ.get('BM25_INDEX_PATH', './bm25_index.json'))
+            
+            self.vector_db = vector_db
+            self.bm25_index = bm25_index
+            if self.qa_chain is not None:
+                self.setup_qa_chain()
+            logger.info(f"🔄 Knowledge base refreshed: {summary}")
+        
+        return summary
+    
+    def _create_retriever(self):
+        """Build the retriever used by the QA chain"""
+        mode = os.environ.get('RETRIEVAL_MODE', 'dense').lower()
+        if mode not in RETRIEVAL_MODES:
+            logger.warning(f"⚠️ Unknown RETRIEVAL_MODE '{mode}', falling back to dense retrieval")
+            mode = 'dense'
+        
+        if self.bm25_index is None:
+            mode = 'dense'
+        
+        return HybridRetriever(
+            vector_store=self.vector_db,
+            bm25_index=self.bm25_index,
+            mode=mode
+        )
+    
     def _create_empty_vector_db(self, db_path: str):
         """Create an empty vector database for fallback"""
         try:
-            embeddings = HuggingFaceBgeEmbeddings(
-                model_name='sentence-transformers/all-MiniLM-L6-v2'
-            )
+            embeddings = self._create_embeddings()
             # Create with empty documents
             from langchain.schema import Document
             dummy_docs = [Document(page_content="Mental health support and guidance.", metadata={"source": "default"})]
@@ -139,7 +337,7 @@ class MentalHealthChatService:
                 logger.error("❌ Vector DB or LLM not initialized")
                 return False
             
-            retriever = self.vector_db.as_retriever()
+            retriever = self._create_retriever()
             
             prompt_template = """You are psychMASTER, a compassionate and empathetic AI mental health companion. Your role is to provide supportive, understanding, and helpful responses to users seeking mental health guidance.
 
@@ -185,6 +383,9 @@ psychMASTER Response:"""
         success = True
         success &= self.initialize_llm()
         success &= self.create_vector_db()
+        if self.vector_db:
+            # Keyword search is an optimization; the service works without it
+            self.initialize_keyword_index()
         success &= self.setup_qa_chain()
         
         if success:
@@ -192,6 +393,35 @@ psychMASTER Response:"""
         else:
             logger.error("❌ Failed to initialize Mental Health Chat Service")
     
+    def reopen_after_fork(self):
+        """Reopen the Chroma client in a worker forked from a preloading master.
+        
+        The embedding model and classifier are reused as-is so their memory
+        stays shared copy-on-write; only the SQLite-backed Chroma client,
+        which must not be used across fork, is recreated.
+        """
+        try:
+            if not isinstance(self.vector_db, Chroma):
+                return True
+            
+            try:
+                from chromadb.api.client import SharedSystemClient
+                SharedSystemClient.clear_system_cache()
+            except ImportError:
+                pass
+            
+            self.vector_db = Chroma(
+                persist_directory=self.vector_db._persist_directory,
+                embedding_function=self.vector_db.embeddings
+            )
+            if self.llm:
+                self.setup_qa_chain()
+            logger.info(f"✅ Vector database reopened in worker {os.getpid()}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to reopen vector database after fork: {str(e)}")
+            return False
+    
     def create_session(self) -> str:
         """Create a new chat session"""
         session_id = str(uuid.uuid4())
@@ -202,67 +432,205 @@ psychMASTER Response:"""
         }
         return session_id
     
-    def get_response(self, message: str, session_id: Optional[str] = None) -> dict:
-        """Get AI response for a user message"""
+    def open_session(self, session_id: Optional[str] = None) -> str:
+        """Id of an existing session, or of a new one created for it"""
+        if not session_id:
+            return self.create_session()
+        if session_id not in self.sessions:
+            self.sessions[session_id] = {'messages': [], 'created_at': str(uuid.uuid4())}
+        return session_id
+    
+    def _is_crisis(self, message: str) -> bool:
+        """Keyword, classifier and embedding tiers; the first confident one decides"""
+        with STAGE_LATENCY.time(pipeline='chat', stage='crisis_scan'):
+            return crisis_detector.detect(
+                message,
+                embeddings=self.vector_db.embeddings if self.vector_db else None
+            ) is not None
+    
+    def record_crisis(self, session_id: str):
+        """Remember that a session had a crisis; its later turns get the highest LLM priority"""
+        session_data = self.sessions[session_id]
+        session_data['crisis_count'] = session_data.get('crisis_count', 0) + 1
+    
+    def _live_risk(self, session_id: str, message: str) -> Optional[Dict]:
+        """Live assessment of the session including a new message"""
+        # Only turns not scored yet are classified, via the trajectory cache
+        return psychological_analyzer.assess_live_risk(
+            self.sessions[session_id]['messages'] + [{'role': 'user', 'content': message}],
+            session_id
+        )
+    
+    def _llm_priority(self, session_id: str, risk: Optional[Dict]) -> str:
+        """Scheduler class of a turn from the session's crisis history and live risk"""
+        if self.sessions[session_id].get('crisis_count'):
+            return 'crisis'
+        if risk and risk['risk_level'] == 'high':
+            return 'crisis'
+        if risk and risk['risk_level'] == 'medium':
+            return 'elevated'
+        return 'standard'
+    
+    def _record_turn(self, session_id: str, message: str, ai_response: str):
+        """Store a user message and its reply in the session"""
+        with STAGE_LATENCY.time(pipeline='chat', stage='session_write'):
+            session_data = self.sessions[session_id]
+            session_data['messages'].extend([
+                {'role': 'user', 'content': message},
+                {'role': 'assistant', 'content': ai_response}
+            ])
+    
+    def begin_turn(self, message: str, session_id: Optional[str] = None) -> dict:
+        """Everything of a turn before the LLM: session, crisis check, retrieval and LLM priority.
+        
+        Returns the finished result if the turn needs no LLM (a crisis, no QA
+        chain, an error), otherwise a pending turn for ``finish_turn`` or
+        ``stream_turn``, which run once the caller holds a scheduler slot of
+        the turn's ``priority``. Answered turns carry the session's live
+        ``risk`` assessment, computed once per turn.
+        """
         try:
             # Create session if not provided
-            if not session_id:
-                session_id = self.create_session()
-            elif session_id not in self.sessions:
-                self.sessions[session_id] = {'messages': [], 'created_at': str(uuid.uuid4())}
-            
-            # Check for crisis keywords
-            crisis_keywords = [
-                'suicide', 'kill myself', 'end my life', 'hurt myself', 
-                'want to die', 'better off dead', 'self harm'
-            ]
+            session_id = self.open_session(session_id)
             
-            if any(keyword in message.lower() for keyword in crisis_keywords):
-                crisis_response = """I'm very concerned about what you've shared. Your life has value, and there are people who want to help you through this difficult time.
-
-Please reach out for immediate support:
-• National Suicide Prevention Lifeline: 988 (available 24/7)
-• Crisis Text Line: Text HOME to 741741
-• Emergency Services: 911
-
-You don't have to go through this alone. Professional counselors are available right now to talk with you. Would you like me to help you find local mental health resources?"""
-                
+            if self._is_crisis(message):
+                self.record_crisis(session_id)
                 return {
-                    'response': crisis_response,
+                    'response': CRISIS_RESPONSE,
                     'session_id': session_id,
                     'is_crisis': True
                 }
             
-            # Get AI response
-            if self.qa_chain:
-                ai_response = self.qa_chain.run(message)
-            else:
+            risk = self._live_risk(session_id, message)
+            
+            if not self.qa_chain:
                 # Fallback response if QA chain fails
+                FALLBACKS.inc(reason='qa_chain_unavailable')
                 ai_response = self._get_fallback_response(message)
+                self._record_turn(session_id, message, ai_response)
+                return {
+                    'response': ai_response,
+                    'session_id': session_id,
+                    'is_crisis': False,
+                    'risk': risk
+                }
+            
+            # Retrieval and generation run separately so each stage is timed;
+            # the retriever records the embedding and search stages itself
+            return {
+                'pending': True,
+                'message': message,
+                'session_id': session_id,
+                'documents': self.qa_chain.retriever.invoke(message),
+                'risk': risk,
+                # Under saturation, turns from at-risk sessions get the LLM first
+                'priority': self._llm_priority(session_id, risk)
+            }
+            
+        except Exception as e:
+            return self._error_result(e, session_id)
+    
+    def finish_turn(self, turn: dict) -> dict:
+        """Answer a pending turn with the LLM and store it; the caller holds its scheduler slot"""
+        try:
+            with STAGE_LATENCY.time(pipeline='chat', stage='llm_completion'):
+                ai_response = self.qa_chain.combine_documents_chain.run(
+                    input_documents=turn['documents'],
+                    question=turn['message']
+                )
             
             # Store conversation in session
-            self.sessions[session_id]['messages'].extend([
-                {'role': 'user', 'content': message},
-                {'role': 'assistant', 'content': ai_response}
-            ])
+            self._record_turn(turn['session_id'], turn['message'], ai_response)
             
             return {
                 'response': ai_response,
-                'session_id': session_id,
+                'session_id': turn['session_id'],
                 'is_crisis': False
             }
             
         except Exception as e:
-            logger.error(f"❌ Error getting AI response: {str(e)}")
-            return {
-                'response': self._get_error_response(),
-                'session_id': session_id or self.create_session(),
-                'is_crisis': False,
-                'error': str(e)
-            }
+            return self._error_result(e, turn['session_id'])
+    
+    def get_response(self, message: str, session_id: Optional[str] = None) -> dict:
+        """Get AI response for a user message, blocking this thread while the turn waits for the LLM"""
+        turn = self.begin_turn(message, session_id)
+        if not turn.get('pending'):
+            return turn
+        with llm_scheduler.slot(turn['priority']):
+            return self.finish_turn(turn)
+    
+    def stream_turn(self, turn: dict) -> Iterator[Dict]:
+        """Stream a pending turn as token events followed by a done event; the caller holds its scheduler slot.
+        
+        The turn is stored in the session only once the reply is complete, so
+        closing the generator early (e.g. on disconnect) leaves no partial turn.
+        """
+        try:
+            chain = self.qa_chain.combine_documents_chain
+            prompt = chain.llm_chain.prompt.format(**chain._get_inputs(turn['documents'], question=turn['message']))
+            
+            parts = []
+            started = time.perf_counter()
+            for chunk in self.llm.stream(prompt):
+                # Chat models stream message chunks, plain LLMs stream strings
+                text = getattr(chunk, 'content', chunk)
+                if not text:
+                    continue
+                if not parts:
+                    STAGE_LATENCY.observe(time.perf_counter() - started, pipeline='chat', stage='llm_first_token')
+                parts.append(text)
+                yield {'type': 'token', 'content': text}
+            STAGE_LATENCY.observe(time.perf_counter() - started, pipeline='chat', stage='llm_stream')
+            
+            self._record_turn(turn['session_id'], turn['message'], ''.join(parts))
+            yield {'type': 'done', 'is_crisis': False}
+            
+        except Exception as e:
+            logger.error(f"❌ Error streaming AI response: {str(e)}")
+            ERRORS.inc(pipeline='chat')
+            yield {'type': 'token', 'content': self._get_error_response()}
+            yield {'type': 'done', 'is_crisis': False, 'error': str(e)}
+    
+    def stream_response(self, message: str, session_id: str) -> Iterator[Dict]:
+        """Like get_response, but yield the reply as token events followed by a done event"""
+        turn = self.begin_turn(message, session_id)
+        if not turn.get('pending'):
+            yield from self.result_events(turn)
+            return
+        with llm_scheduler.slot(turn['priority']):
+            yield from self.stream_turn(turn)
     
-    def end_session(self, session_id: str) -> Dict:
-        """End a chat session and perform psychological analysis"""
+    @staticmethod
+    def result_events(result: dict) -> List[Dict]:
+        """Token and done events of a turn that was answered without streaming"""
+        done = {'type': 'done', 'is_crisis': result['is_crisis']}
+        if 'error' in result:
+            done['error'] = result['error']
+        return [{'type': 'token', 'content': result['response']}, done]
+    
+    def _error_result(self, error: Exception, session_id: Optional[str]) -> dict:
+        logger.error(f"❌ Error getting AI response: {str(error)}")
+        ERRORS.inc(pipeline='chat')
+        return {
+            'response': self._get_error_response(),
+            'session_id': session_id or self.create_session(),
+            'is_crisis': False,
+            'error': str(error)
+        }
+    
+    def get_session_messages(self, session_id: str) -> Optional[List[Dict]]:
+        """Snapshot of a session's messages for analysis outside the service"""
+        session_data = self.sessions.get(session_id)
+        if not session_data:
+            return None
+        return list(session_data.get('messages', []))
+    
+    def end_session(self, session_id: str, analysis_result: Optional[Dict] = None) -> Dict:
+        """End a chat session and perform psychological analysis.
+        
+        An analysis computed elsewhere (e.g. by the batched inference
+        executor) can be passed in; otherwise the conversation is analyzed here.
+        """
         try:
             if session_id not in self.sessions:
                 logger.error(f"Session {session_id} not found")
@@ -282,24 +650,30 @@ You don't have to go through this alone. Professional counselors are available r
                 }
             
             # Perform psychological analysis
-            logger.info(f"Performing psychological analysis for session {session_id}")
-            analysis_result = psychological_analyzer.analyze_conversation(messages)
+            if analysis_result is None:
+                logger.info(f"Performing psychological analysis for session {session_id}")
+                analysis_result = psychological_analyzer.analyze_conversation(messages, session_id)
             
             # Generate personalized recommendations
             logger.info(f"Generating recommendations for session {session_id}")
-            recommendations = recommendation_system.get_recommendations(analysis_result)
+            with STAGE_LATENCY.time(pipeline='end_session', stage='recommend'):
+                recommendations = recommendation_system.get_recommendations(analysis_result)
+                ranked_resources = recommendation_system.rank_resources(analysis_result)
             
             # Mark session as ended
+            psychological_analyzer.trajectory_cache.discard(session_id)
             session_data['active'] = False
             session_data['ended_at'] = datetime.utcnow().isoformat()
             session_data['analysis'] = analysis_result
             session_data['recommendations'] = recommendations
+            session_data['ranked_resources'] = ranked_resources
             
             return {
                 'success': True,
                 'session_id': session_id,
                 'analysis': analysis_result,
                 'recommendations': recommendations,
+                'ranked_resources': ranked_resources,
                 'session_summary': {
                     'total_messages': len(messages),
                     'user_messages': len([m for m in messages if m.get('role') == 'user']),
@@ -310,11 +684,36 @@ You don't have to go through this alone. Professional counselors are available r
             
         except Exception as e:
             logger.error(f"Error ending session {session_id}: {str(e)}")
+            ERRORS.inc(pipeline='end_session')
             return {
                 'success': False,
                 'error': f'Failed to analyze session: {str(e)}'
             }
     
+    def get_session_record(self, session_id: str) -> Optional[Dict]:
+        """Build the document persisted to MongoDB for an ended session"""
+        session_data = self.sessions.get(session_id)
+        if not session_data or 'analysis' not in session_data:
+            return None
+        
+        messages = session_data.get('messages', [])
+        record = {
+            'session_id': session_id,
+            'created_at': session_data.get('created_at'),
+            'ended_at': datetime.fromisoformat(session_data['ended_at']),
+            'analysis': session_data['analysis'],
+            'recommendations': session_data.get('recommendations'),
+            'ranked_resources': session_data.get('ranked_resources'),
+            'message_count': len(messages),
+            'user_message_count': len([m for m in messages if m.get('role') == 'user'])
+        }
+        
+        # Transcripts are only stored when explicitly enabled, e.g. for re-scoring
+        if os.environ.get('PERSIST_TRANSCRIPTS', 'false').lower() == 'true':
+            record['messages'] = [dict(m) for m in messages]
+        
+        return record
+    
     def get_session_data(self, session_id: str) -> Dict:
         """Get session data including analysis if session has ended"""
         try:
@@ -0,0 +1,190 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first
+PRIORITY_CLASSES = ('crisis', 'elevated', 'standard')
+DEFAULT_WEIGHTS = {'crisis': 8, 'elevated': 4, 'standard': 1}
+
+LLM_QUEUE_WAIT = registry.histogram(
+    'psychmaster_llm_queue_wait_seconds',
+    'Time chat turns waited for an LLM slot, by priority class',
+    ('priority',),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+LLM_QUEUE_DEPTH = registry.gauge(
+    'psychmaster_llm_queue_depth',
+    'Chat turns waiting for an LLM slot, by priority class',
+    ('priority',)
+)
+LLM_RUNNING = registry.gauge(
+    'psychmaster_llm_running',
+    'LLM calls currently holding a scheduler slot'
+)
+
+
+def parse_weights(value: Optional[str]) -> Dict[str, int]:
+    """Weights from 'crisis=8,elevated=4,standard=1'; unknown or missing classes keep their default"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in (value or '').split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name in weights and weight.strip():
+            try:
+                weights[name] = max(1, int(weight))
+            except ValueError:
+                logger.warning(f"Ignoring invalid LLM priority weight '{item}'")
+    return weights
+
+
+class _Ticket:
+    __slots__ = ('priority', 'enqueued', 'grant')
+
+    def __init__(self, priority: str, grant: Callable[[], None]):
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        # Wakes the waiter; called with the scheduler lock held, so it must not block
+        self.grant = grant
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMScheduler:
+    """Priority scheduler for a limited number of concurrent LLM calls.
+
+    Callers wait in one queue per priority class. When a slot frees up, the
+    next class is chosen by smooth weighted round robin over the classes
+    that have waiters, so under saturation each class gets at least its
+    weight's share of slots and higher classes go first without shutting
+    lower ones out. A turn that has waited ``max_wait`` seconds or more is
+    served before anything else (oldest first), which bounds starvation
+    even if the weights are misconfigured.
+
+    Async callers wait with ``slot_async`` on the event loop and only then
+    hand the LLM call to a thread, so queued turns hold no threads. ``slot``
+    is the blocking variant for code that already runs on its own thread.
+    """
+
+    def __init__(self, max_concurrency: int = 8, weights: Optional[Dict[str, int]] = None, max_wait: float = 10.0):
+        self.max_concurrency = max_concurrency
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+        self.max_wait = max_wait
+        self.running = 0
+        self._queues = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._current = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._lock = threading.Lock()
+
+    def depth(self, priority: str) -> int:
+        return len(self._queues[priority])
+
+    @contextmanager
+    def slot(self, priority: str = 'standard'):
+        """Hold one LLM slot for the duration of the block, blocking the thread while queued"""
+        granted = threading.Event()
+        ticket = self._enqueue(priority, granted.set)
+        granted.wait()
+        LLM_QUEUE_WAIT.observe(time.monotonic() - ticket.enqueued, priority=ticket.priority)
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, priority: str = 'standard'):
+        """Hold one LLM slot for the duration of the block, waiting on the event loop while queued"""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: str = 'standard'):
+        """Wait for a slot without holding a thread; the caller must release() it"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        ticket = self._enqueue(priority, lambda: loop.call_soon_threadsafe(_resolve, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._queues[ticket.priority].remove(ticket)
+                    granted = False
+                except ValueError:
+                    granted = True
+            # Granted just as the waiter went away: hand the slot on
+            if granted:
+                self.release()
+            raise
+        LLM_QUEUE_WAIT.observe(time.monotonic() - ticket.enqueued, priority=ticket.priority)
+
+    def release(self):
+        with self._lock:
+            self.running -= 1
+            self._dispatch()
+
+    def _enqueue(self, priority: str, grant: Callable[[], None]) -> _Ticket:
+        if priority not in self._queues:
+            priority = 'standard'
+        ticket = _Ticket(priority, grant)
+        with self._lock:
+            self._queues[priority].append(ticket)
+            self._dispatch()
+        return ticket
+
+    def _dispatch(self):
+        """Grant free slots to the next tickets; called with the lock held"""
+        while self.running < self.max_concurrency:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            self.running += 1
+            ticket.grant()
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        waiting = [priority for priority in PRIORITY_CLASSES if self._queues[priority]]
+        if not waiting:
+            return None
+
+        now = time.monotonic()
+        overdue = [priority for priority in waiting if now - self._queues[priority][0].enqueued >= self.max_wait]
+        if overdue:
+            chosen = min(overdue, key=lambda priority: self._queues[priority][0].enqueued)
+        else:
+            total = 0
+            for priority in PRIORITY_CLASSES:
+                if self._queues[priority]:
+                    self._current[priority] += self.weights[priority]
+                    total += self.weights[priority]
+                else:
+                    # An idle class doesn't bank credit for later
+                    self._current[priority] = 0
+            # Ties go to the higher class, which comes first in PRIORITY_CLASSES
+            chosen = max(waiting, key=lambda priority: self._current[priority])
+            self._current[chosen] -= total
+
+        return self._queues[chosen].popleft()
+
+
+# Global scheduler in front of the chat LLM
+llm_scheduler = LLMScheduler(
+    max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '8')),
+    weights=parse_weights(os.environ.get('LLM_PRIORITY_WEIGHTS')),
+    max_wait=float(os.environ.get('LLM_MAX_QUEUE_WAIT_SECONDS', '10'))
+)
+for _priority in PRIORITY_CLASSES:
+    LLM_QUEUE_DEPTH.set_function(lambda priority=_priority: llm_scheduler.depth(priority), priority=_priority)
+LLM_RUNNING.set_function(lambda: llm_scheduler.running)
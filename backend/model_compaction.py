@@ -0,0 +1,209 @@
+"""
+Post-training compaction of the psychological state classifier.
+
+The logistic regression is trained with an L2 penalty, so its dense
+coefficient matrix over all TF-IDF features may hold weights that are
+close to zero. Compaction keeps only the features whose largest absolute
+weight over all classes is at least a threshold (0.01 by default, or the
+N most important ones), slices the vectorizer's vocabulary and idf weights
+to match, drops the stop word list kept only for introspection and stores
+the coefficients as float32 (or float16).
+
+    python model_compaction.py
+    python model_compaction.py --threshold 0.05 --dtype float16 --min-agreement 0.98
+
+Pruned features also drop out of the TF-IDF row normalization, so even
+small weights can move predictions. The compact model is compared with the
+full one on the held-out split of the training dataset, or, if the dataset
+is not available, on synthetic conversations; if the label agreement is
+below --min-agreement or any probability moves by more than
+--max-probability-change, nothing is written and the script exits with
+status 1.
+
+Writes the compact artifacts to ./models/compact and reports their size and
+the accuracy change. Load it with PSYCH_MODEL_VARIANT=compact.
+"""
+
+import copy
+import time
+import pickle
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COEFFICIENT_DTYPES = {'float32': np.float32, 'float16': np.float16}
+DEFAULT_THRESHOLD = 0.01
+
+
+def feature_importance(model) -> np.ndarray:
+    """Largest absolute coefficient of each feature over all classes"""
+    return np.abs(model.coef_).max(axis=0)
+
+
+def select_features(model, threshold: Optional[float] = None, keep_features: Optional[int] = None) -> np.ndarray:
+    """Sorted indices of the features to keep"""
+    importance = feature_importance(model)
+    if keep_features is not None:
+        keep = np.argpartition(-importance, min(keep_features, len(importance)) - 1)[:keep_features]
+    else:
+        keep = np.flatnonzero(importance >= threshold)
+    return np.sort(keep)
+
+
+def compact_model(vectorizer, model, keep: np.ndarray, dtype=np.float32) -> Tuple[object, object]:
+    """Copies of vectorizer and model restricted to the kept feature indices"""
+    new_index = {int(old): new for new, old in enumerate(keep)}
+
+    compact_vectorizer = copy.deepcopy(vectorizer)
+    compact_vectorizer.vocabulary_ = {
+        term: new_index[index]
+        for term, index in vectorizer.vocabulary_.items()
+        if index in new_index
+    }
+    compact_vectorizer.idf_ = vectorizer.idf_[keep]
+    # The inner TfidfTransformer validates the width of its input
+    if hasattr(compact_vectorizer._tfidf, 'n_features_in_'):
+        compact_vectorizer._tfidf.n_features_in_ = len(keep)
+    if hasattr(compact_vectorizer, 'stop_words_'):
+        del compact_vectorizer.stop_words_
+
+    compact = copy.deepcopy(model)
+    compact.coef_ = np.ascontiguousarray(model.coef_[:, keep], dtype=dtype)
+    compact.intercept_ = model.intercept_.astype(dtype)
+    compact.n_features_in_ = len(keep)
+    return compact_vectorizer, compact
+
+
+def _pickled_size(obj) -> int:
+    return len(pickle.dumps(obj))
+
+
+def _time_inference(vectorizer, model, texts: List[str], repeats: int = 3) -> float:
+    """Milliseconds per text for transform and predict_proba"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(vectorizer.transform(texts))
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1000.0
+
+
+def _held_out_split(analyzer) -> Optional[Tuple[List[str], np.ndarray]]:
+    """The test split used by train_model, if the dataset is available"""
+    from sklearn.model_selection import train_test_split
+
+    if not analyzer.dataset_path.exists():
+        return None
+    df = analyzer.load_and_prepare_dataset()
+    if df.empty:
+        return None
+    y = analyzer.label_encoder.transform(df['status'])
+    _, test_index = train_test_split(
+        np.arange(len(df)), test_size=0.2, random_state=42, stratify=y
+    )
+    return df['processed_statement'].iloc[test_index].tolist(), y[test_index]
+
+
+def _synthetic_texts(analyzer, count: int = 500) -> List[str]:
+    from benchmarks.synthetic import generate_conversations
+
+    texts = []
+    for conversation in generate_conversations(count, 6):
+        user_messages = [message['content'] for message in conversation if message['role'] == 'user']
+        texts.append(analyzer.preprocess_text(' '.join(user_messages)))
+    return texts
+
+
+def evaluate(analyzer, compact_vectorizer, compact) -> Dict:
+    """Accuracy (or agreement) and probability drift of the compact model"""
+    split = _held_out_split(analyzer)
+    texts, labels = split if split else (_synthetic_texts(analyzer), None)
+
+    full_proba = analyzer.model.predict_proba(analyzer.vectorizer.transform(texts))
+    compact_proba = compact.predict_proba(compact_vectorizer.transform(texts))
+    full_pred, compact_pred = full_proba.argmax(axis=1), compact_proba.argmax(axis=1)
+
+    report = {
+        'evaluation': 'held_out_split' if split else 'synthetic_agreement',
+        'samples': len(texts),
+        'agreement': float((full_pred == compact_pred).mean()),
+        'max_probability_change': float(np.abs(full_proba - compact_proba).max()),
+        'full_ms_per_text': _time_inference(analyzer.vectorizer, analyzer.model, texts),
+        'compact_ms_per_text': _time_inference(compact_vectorizer, compact, texts),
+    }
+    if labels is not None:
+        classes = analyzer.model.classes_
+        report['full_accuracy'] = float((classes[full_pred] == labels).mean())
+        report['compact_accuracy'] = float((classes[compact_pred] == labels).mean())
+        report['accuracy_delta'] = report['compact_accuracy'] - report['full_accuracy']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument('--threshold', type=float, help='Keep features whose max |coef| is at least this')
+    selection.add_argument('--keep-features', type=int, help='Keep the N most important features')
+    parser.add_argument('--dtype', choices=list(COEFFICIENT_DTYPES), default='float32')
+    parser.add_argument('--min-agreement', type=float, default=0.995,
+                        help='Lowest label agreement with the full model to accept')
+    parser.add_argument('--max-probability-change', type=float, default=0.05,
+                        help='Largest change of any class probability to accept')
+    parser.add_argument('--output', default='./models/compact')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from psychological_analysis import psychological_analyzer as analyzer
+
+    if not analyzer.model:
+        raise SystemExit("The full model could not be loaded")
+
+    threshold = DEFAULT_THRESHOLD if args.threshold is None and args.keep_features is None else args.threshold
+    keep = select_features(analyzer.model, threshold, args.keep_features)
+    compact_vectorizer, compact = compact_model(
+        analyzer.vectorizer, analyzer.model, keep, COEFFICIENT_DTYPES[args.dtype]
+    )
+
+    report = evaluate(analyzer, compact_vectorizer, compact)
+    full_size = _pickled_size(analyzer.model) + _pickled_size(analyzer.vectorizer)
+    compact_size = _pickled_size(compact) + _pickled_size(compact_vectorizer)
+
+    print(f"Features: {analyzer.model.coef_.shape[1]} -> {len(keep)} ({args.dtype} coefficients)")
+    print(f"Model + vectorizer: {full_size / 1024:.0f} KiB -> {compact_size / 1024:.0f} KiB")
+    if 'accuracy_delta' in report:
+        print(f"Accuracy on {report['samples']} held-out samples: {report['full_accuracy']:.4f} -> "
+              f"{report['compact_accuracy']:.4f} ({report['accuracy_delta']:+.4f})")
+    print(f"Agreement with full model: {report['agreement']:.4f} over {report['samples']} "
+          f"{'held-out' if 'accuracy_delta' in report else 'synthetic'} samples, "
+          f"max probability change {report['max_probability_change']:.4f}")
+    print(f"Inference: {report['full_ms_per_text']:.3f} -> {report['compact_ms_per_text']:.3f} ms per text")
+
+    if report['agreement'] < args.min_agreement or report['max_probability_change'] > args.max_probability_change:
+        print(f"Compact model drifts beyond tolerance (agreement >= {args.min_agreement}, "
+              f"max probability change <= {args.max_probability_change}); nothing written")
+        raise SystemExit(1)
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    for name, obj in (
+        ('psychological_model.pkl', compact),
+        ('vectorizer.pkl', compact_vectorizer),
+        ('label_encoder.pkl', analyzer.label_encoder),
+    ):
+        with open(output / name, 'wb') as f:
+            pickle.dump(obj, f)
+
+    # The analyzer only looks for variants directly inside ./models
+    if output.resolve().parent == Path('./models').resolve():
+        print(f"Written to {output}; load with PSYCH_MODEL_VARIANT={output.name}")
+    else:
+        print(f"Written to {output}; move it into ./models to load it with PSYCH_MODEL_VARIANT={output.name}")
+
+
+if __name__ == '__main__':
+    main()
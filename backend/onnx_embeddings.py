@@ -0,0 +1,162 @@
+"""
+Sentence embeddings on ONNX Runtime, with an int8 export of all-MiniLM-L6-v2.
+
+Export once (needs torch and transformers, installed with
+sentence-transformers, plus onnx):
+
+    python onnx_embeddings.py export --output ./models/minilm-onnx
+
+then start the server with EMBEDDING_BACKEND=onnx. Check retrieval quality
+against the PyTorch model with `python -m benchmarks.embedding_quality`.
+"""
+
+import os
+import argparse
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_community.embeddings.huggingface import DEFAULT_QUERY_BGE_INSTRUCTION_EN
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+DEFAULT_ONNX_PATH = './models/minilm-onnx'
+MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model_int8.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+
+# all-MiniLM-L6-v2 truncates input at 256 word pieces
+MAX_SEQUENCE_LENGTH = 256
+
+
+def default_num_threads() -> int:
+    """ONNX_NUM_THREADS, or up to 4 cores; more threads rarely help a 6-layer model"""
+    return int(os.environ.get('ONNX_NUM_THREADS', str(min(4, os.cpu_count() or 1))))
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings computed with ONNX Runtime on CPU.
+
+    Runs the exported transformer (int8-quantized by default) and applies
+    the same mean pooling and L2 normalization as the sentence-transformers
+    pipeline, so the vectors are interchangeable with those of
+    HuggingFaceBgeEmbeddings. Queries get the same ``query_instruction``
+    prefix as well.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = DEFAULT_ONNX_PATH,
+        quantized: bool = True,
+        num_threads: Optional[int] = None,
+        query_instruction: str = DEFAULT_QUERY_BGE_INSTRUCTION_EN,
+        batch_size: int = 32
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        self.model_path = model_dir / (QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        self.query_instruction = query_instruction
+        self.batch_size = batch_size
+        self.num_threads = num_threads or default_num_threads()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(self.model_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(MAX_SEQUENCE_LENGTH)
+        pad_id = self.tokenizer.token_to_id('[PAD]') or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token='[PAD]')
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + self.batch_size])
+            attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            feeds = {
+                'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+                'attention_mask': attention_mask,
+            }
+            if 'token_type_ids' in self.input_names:
+                feeds['token_type_ids'] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean over real tokens, then unit length
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled)
+
+        return np.vstack(vectors).tolist() if vectors else []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([text.replace('\n', ' ') for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([self.query_instruction + text.replace('\n', ' ')])[0]
+
+
+def export_model(output_dir: str = DEFAULT_ONNX_PATH, model_name: str = DEFAULT_MODEL_NAME, quantize: bool = True):
+    """Export the transformer to ONNX and write an int8 dynamically quantized copy"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(str(output))
+
+    sample = tokenizer(['How can I manage anxiety before exams?'], return_tensors='pt')
+    input_names = ['input_ids', 'attention_mask', 'token_type_ids']
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            str(output / MODEL_FILE),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    logger.info(f"Exported {model_name} to {output / MODEL_FILE}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(output / MODEL_FILE), str(output / QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+        logger.info(f"Wrote int8 model to {output / QUANTIZED_MODEL_FILE}")
+
+    for name in (MODEL_FILE, QUANTIZED_MODEL_FILE):
+        path = output / name
+        if path.exists():
+            print(f"{path}: {path.stat().st_size / 2 ** 20:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export', help='Export the embedding model to ONNX')
+    export.add_argument('--output', default=DEFAULT_ONNX_PATH)
+    export.add_argument('--model', default=DEFAULT_MODEL_NAME)
+    export.add_argument('--no-quantize', action='store_true', help='Skip the int8 copy')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'export':
+        export_model(args.output, args.model, quantize=not args.no_quantize)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,18 +11,78 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.preprocessing import LabelEncoder
 import re
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from metrics import STAGE_LATENCY, FALLBACKS
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_MODES = ('conversation', 'trajectory')
+
+
+class TrajectoryCache:
+    """LRU cache of the per-turn probabilities already computed for each session.
+    
+    An entry is reused only if the session still starts with the messages
+    it was computed from, checked through a hash of all scored messages.
+    """
+    
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _fingerprint(user_messages: List[str], count: int) -> Tuple:
+        return (count, hash(tuple(user_messages[:count])))
+    
+    def get(self, session_id: Optional[str], user_messages: List[str]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if session_id is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(session_id)
+        fingerprint, rows, valid = entry
+        count = fingerprint[0]
+        if count > len(user_messages) or fingerprint != self._fingerprint(user_messages, count):
+            return None
+        return rows, valid
+    
+    def put(self, session_id: Optional[str], user_messages: List[str], rows: np.ndarray, valid: np.ndarray):
+        if session_id is None or not user_messages:
+            return
+        with self._lock:
+            self._entries[session_id] = (self._fingerprint(user_messages, len(user_messages)), rows, valid)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def discard(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
 class PsychologicalAnalyzer:
     def __init__(self):
         self.model = None
         self.vectorizer = None
         self.label_encoder = None
-        self.model_path = Path("./models/psychological_model.pkl")
-        self.vectorizer_path = Path("./models/vectorizer.pkl")
-        self.label_encoder_path = Path("./models/label_encoder.pkl")
+        
+        # PSYCH_MODEL_VARIANT=compact loads the pruned model written by model_compaction.py
+        model_dir = Path("./models")
+        variant = os.environ.get('PSYCH_MODEL_VARIANT', '')
+        if variant:
+            if (model_dir / variant / "psychological_model.pkl").exists():
+                model_dir = model_dir / variant
+            else:
+                logger.warning(f"Model variant '{variant}' not found, using the full model")
+        
+        self.model_path = model_dir / "psychological_model.pkl"
+        self.vectorizer_path = model_dir / "vectorizer.pkl"
+        self.label_encoder_path = model_dir / "label_encoder.pkl"
         self.dataset_path = Path("./datasets/Combined Data.csv")
         
         # Create models directory
@@ -31,6 +91,16 @@ class PsychologicalAnalyzer:
         # Target psychological states
         self.target_states = ['Normal', 'Depression', 'Bipolar', 'Anxiety', 'Suicidal']
         
+        # ANALYSIS_MODE=trajectory scores each window of user messages and
+        # aggregates the per-turn probabilities with recency weighting
+        self.analysis_mode = os.environ.get('ANALYSIS_MODE', 'conversation').lower()
+        if self.analysis_mode not in ANALYSIS_MODES:
+            logger.warning(f"Unknown ANALYSIS_MODE '{self.analysis_mode}', using conversation mode")
+            self.analysis_mode = 'conversation'
+        self.trajectory_window = max(1, int(os.environ.get('TRAJECTORY_WINDOW', '1')))
+        self.trajectory_half_life = float(os.environ.get('TRAJECTORY_HALF_LIFE', '3'))
+        self.trajectory_cache = TrajectoryCache(int(os.environ.get('TRAJECTORY_CACHE_SIZE', '10000')))
+        
         # Initialize the analyzer
         self.initialize_analyzer()
     
@@ -201,40 +271,144 @@ class PsychologicalAnalyzer:
             logger.error(f"Error initializing analyzer: {str(e)}")
             return False
     
-    def analyze_conversation(self, messages: List[Dict]) -> Dict:
+    def analyze_conversation(self, messages: List[Dict], session_id: Optional[str] = None) -> Dict:
         """Analyze a conversation and predict psychological state"""
+        return self.analyze_conversations([messages], [session_id])[0]
+    
+    def analyze_conversations(
+        self,
+        conversations: List[List[Dict]],
+        session_ids: Optional[List[Optional[str]]] = None,
+        strict: bool = False,
+        pipeline: str = 'end_session'
+    ) -> List[Dict]:
+        """Analyze several conversations with one vectorize and predict_proba call.
+        
+        In trajectory mode the session ids key the per-session cache of
+        scored turns, so re-analyzing a session only scores its new turns.
+        With ``strict``, a missing model or a failed batch raises instead of
+        returning fallback analyses; conversations without user text still
+        get a fallback, marked with ``'fallback': True``. ``pipeline`` labels
+        the stage timings.
+        """
         try:
             if not self.model or not self.vectorizer or not self.label_encoder:
+                if strict:
+                    raise RuntimeError("Model not initialized")
                 logger.error("Model not initialized")
-                return self._get_fallback_analysis()
+                return [self._get_fallback_analysis() for _ in conversations]
+            
+            results = [None] * len(conversations)
+            batch = []
+            for i, messages in enumerate(conversations):
+                # Extract user messages
+                user_messages = [
+                    msg['content'] for msg in messages 
+                    if msg.get('role') == 'user' and msg.get('content')
+                ]
+                if not user_messages:
+                    continue
+                
+                # Combine and preprocess all user messages
+                full_conversation = ' '.join(user_messages)
+                processed_text = self.preprocess_text(full_conversation)
+                if processed_text:
+                    batch.append((i, user_messages, full_conversation, processed_text))
+            
+            if batch and self.analysis_mode == 'trajectory':
+                session_ids = session_ids or [None] * len(conversations)
+                trajectories = self._score_trajectories(
+                    [(session_ids[item[0]], item[1]) for item in batch], pipeline=pipeline
+                )
+                for (i, user_messages, full_conversation, _), (rows, weights) in zip(batch, trajectories):
+                    results[i] = self._build_trajectory_analysis(
+                        user_messages, full_conversation, rows, weights, pipeline=pipeline
+                    )
+            
+            elif batch:
+                # Vectorize the text
+                with STAGE_LATENCY.time(pipeline=pipeline, stage='vectorize'):
+                    text_vectorized = self.vectorizer.transform([item[3] for item in batch])
+                
+                # Get predictions with probabilities; the most probable class is what predict() returns
+                with STAGE_LATENCY.time(pipeline=pipeline, stage='predict'):
+                    probabilities = self.model.predict_proba(text_vectorized)
+                    predicted_classes = self.model.classes_[probabilities.argmax(axis=1)]
+                
+                predicted_states = self.label_encoder.inverse_transform(predicted_classes)
+                for (i, user_messages, full_conversation, _), prediction_proba, predicted_state in zip(
+                    batch, probabilities, predicted_states
+                ):
+                    results[i] = self._build_analysis(
+                        user_messages, full_conversation, predicted_state, prediction_proba, pipeline=pipeline
+                    )
+            
+            return [result if result is not None else self._get_fallback_analysis() for result in results]
             
-            # Extract user messages
+        except Exception as e:
+            if strict:
+                raise
+            logger.error(f"Error analyzing conversation: {str(e)}")
+            return [self._get_fallback_analysis() for _ in conversations]
+    
+    @staticmethod
+    def _user_messages(messages: List[Dict]) -> List[str]:
+        return [msg['content'] for msg in messages if msg.get('role') == 'user' and msg.get('content')]
+    
+    def export_trajectories(self, conversations: List[List[Dict]],
+                            session_ids: List[Optional[str]]) -> List[Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """Cached per-turn scores of each conversation, for seeding another process's cache"""
+        if self.analysis_mode != 'trajectory':
+            return [None] * len(conversations)
+        return [
+            self.trajectory_cache.get(session_id, self._user_messages(messages))
+            for messages, session_id in zip(conversations, session_ids)
+        ]
+    
+    def import_trajectories(self, conversations: List[List[Dict]], session_ids: List[Optional[str]],
+                            trajectories: List[Optional[Tuple[np.ndarray, np.ndarray]]]):
+        """Seed the cache with per-turn scores exported by another process"""
+        for messages, session_id, trajectory in zip(conversations, session_ids, trajectories):
+            if trajectory is not None:
+                rows, valid = trajectory
+                user_messages = self._user_messages(messages)[:len(rows)]
+                self.trajectory_cache.put(session_id, user_messages, rows, valid)
+    
+    def assess_live_risk(self, messages: List[Dict], session_id: str) -> Optional[Dict]:
+        """Current state and risk of a live session from its cached turn trajectory.
+
+        Scores only the turns added since the last call, whatever the
+        configured analysis mode, so it is cheap enough to run every turn.
+        """
+        try:
+            if not self.model or not self.vectorizer or not self.label_encoder:
+                return None
             user_messages = [
-                msg['content'] for msg in messages 
+                msg['content'] for msg in messages
                 if msg.get('role') == 'user' and msg.get('content')
             ]
-            
             if not user_messages:
-                return self._get_fallback_analysis()
-            
-            # Combine all user messages
-            full_conversation = ' '.join(user_messages)
-            
-            # Preprocess the conversation
-            processed_text = self.preprocess_text(full_conversation)
-            
-            if not processed_text:
-                return self._get_fallback_analysis()
-            
-            # Vectorize the text
-            text_vectorized = self.vectorizer.transform([processed_text])
-            
-            # Get predictions with probabilities
-            prediction_proba = self.model.predict_proba(text_vectorized)[0]
-            predicted_class = self.model.predict(text_vectorized)[0]
-            
-            # Get the predicted state
-            predicted_state = self.label_encoder.inverse_transform([predicted_class])[0]
+                return None
+
+            rows, valid = self._score_trajectories([(session_id, user_messages)], pipeline='chat')[0]
+            analysis = self._build_trajectory_analysis(
+                user_messages, ' '.join(user_messages), rows, valid, pipeline='chat'
+            )
+            return {
+                'predicted_state': str(analysis['predicted_state']),
+                'confidence': analysis['confidence'],
+                'risk_level': analysis['risk_level'],
+                'total_messages': analysis['total_messages']
+            }
+
+        except Exception as e:
+            logger.error(f"Error assessing live risk: {str(e)}")
+            return None
+
+    def _build_analysis(self, user_messages: List[str], full_conversation: str,
+                        predicted_state: str, prediction_proba: np.ndarray, pipeline: str = 'end_session') -> Dict:
+        """Assemble the analysis of one conversation from its class probabilities"""
+        try:
             confidence = float(prediction_proba.max())
             
             # Get probabilities for all states
@@ -243,7 +417,8 @@ class PsychologicalAnalyzer:
                 state_probabilities[state] = float(prediction_proba[i])
             
             # Analyze conversation patterns
-            conversation_insights = self._analyze_conversation_patterns(user_messages)
+            with STAGE_LATENCY.time(pipeline=pipeline, stage='patterns'):
+                conversation_insights = self._analyze_conversation_patterns(user_messages)
             
             # Generate risk assessment
             risk_level = self._assess_risk_level(predicted_state, confidence, conversation_insights)
@@ -263,6 +438,78 @@ class PsychologicalAnalyzer:
             logger.error(f"Error analyzing conversation: {str(e)}")
             return self._get_fallback_analysis()
     
+    def _trajectory_windows(self, user_messages: List[str], start: int) -> List[str]:
+        """Preprocessed text of the window ending at each turn from start on"""
+        size = self.trajectory_window
+        return [
+            self.preprocess_text(' '.join(user_messages[max(0, turn - size + 1):turn + 1]))
+            for turn in range(start, len(user_messages))
+        ]
+    
+    def _score_trajectories(self, items: List[Tuple[Optional[str], List[str]]],
+                            pipeline: str = 'end_session') -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Per-turn class probabilities of each conversation, scoring only turns not cached yet.
+        
+        ``pipeline`` labels the stage timings: 'end_session', or 'chat' for live risk checks.
+        """
+        plans = []
+        texts = []
+        for session_id, user_messages in items:
+            cached = self.trajectory_cache.get(session_id, user_messages)
+            start = len(cached[0]) if cached else 0
+            windows = self._trajectory_windows(user_messages, start)
+            plans.append((session_id, user_messages, cached, len(texts), windows))
+            texts.extend(windows)
+        
+        if texts:
+            with STAGE_LATENCY.time(pipeline=pipeline, stage='vectorize'):
+                text_vectorized = self.vectorizer.transform(texts)
+            with STAGE_LATENCY.time(pipeline=pipeline, stage='predict'):
+                probabilities = self.model.predict_proba(text_vectorized)
+        else:
+            probabilities = np.empty((0, len(self.model.classes_)))
+        
+        trajectories = []
+        for session_id, user_messages, cached, offset, windows in plans:
+            new_rows = probabilities[offset:offset + len(windows)]
+            # Windows left empty by preprocessing carry no signal
+            new_weights = np.array([1.0 if window else 0.0 for window in windows])
+            if cached:
+                rows = np.vstack([cached[0], new_rows])
+                valid = np.concatenate([cached[1], new_weights])
+            else:
+                rows, valid = new_rows, new_weights
+            self.trajectory_cache.put(session_id, user_messages, rows, valid)
+            trajectories.append((rows, valid))
+        return trajectories
+    
+    def _build_trajectory_analysis(self, user_messages: List[str], full_conversation: str,
+                                   rows: np.ndarray, valid: np.ndarray, pipeline: str = 'end_session') -> Dict:
+        """Recency-weighted aggregate of the per-turn probabilities plus the trajectory itself"""
+        # Each turn counts half as much as a turn half_life turns later
+        ages = np.arange(len(rows) - 1, -1, -1, dtype=np.float64)
+        weights = valid * np.power(0.5, ages / self.trajectory_half_life)
+        if weights.sum() == 0:
+            return self._get_fallback_analysis()
+        
+        prediction_proba = (rows * weights[:, None]).sum(axis=0) / weights.sum()
+        predicted_class = self.model.classes_[prediction_proba.argmax()]
+        predicted_state = self.label_encoder.inverse_transform([predicted_class])[0]
+        
+        analysis = self._build_analysis(user_messages, full_conversation, predicted_state, prediction_proba, pipeline)
+        states = [str(state) for state in self.label_encoder.inverse_transform(self.model.classes_)]
+        analysis['analysis_mode'] = 'trajectory'
+        analysis['trajectory'] = {
+            'window': self.trajectory_window,
+            'half_life': self.trajectory_half_life,
+            # Turns whose window had no usable text are reported as None
+            'turns': [
+                {state: float(p) for state, p in zip(states, row)} if scored else None
+                for row, scored in zip(rows, valid)
+            ]
+        }
+        return analysis
+    
     def _analyze_conversation_patterns(self, messages: List[str]) -> Dict:
         """Analyze patterns in the conversation"""
         try:
@@ -294,7 +541,7 @@ class PsychologicalAnalyzer:
                 'crisis_indicators': crisis_count,
                 'depression_indicators': depression_count,
                 'anxiety_indicators': anxiety_count,
-                'avg_message_length': np.mean([len(msg) for msg in messages]) if messages else 0,
+                'avg_message_length': float(np.mean([len(msg) for msg in messages])) if messages else 0.0,
                 'total_words': len(full_text.split()),
                 'unique_concerns': len(set(messages)) / len(messages) if messages else 0
             }
@@ -332,6 +579,7 @@ class PsychologicalAnalyzer:
     
     def _get_fallback_analysis(self) -> Dict:
         """Return fallback analysis when model fails"""
+        FALLBACKS.inc(reason='analysis')
         return {
             'predicted_state': 'Normal',
             'confidence': 0.5,
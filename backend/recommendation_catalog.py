@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_TYPES = ('youtube_videos', 'articles', 'professional_resources')
+PUBLIC_FIELDS = ('title', 'url', 'description')
+REQUIRED_FIELDS = ('id', 'type', 'states') + PUBLIC_FIELDS
+
+
+class CatalogSnapshot:
+    """Immutable view of one catalog version with its lookup indexes"""
+
+    def __init__(self, data: Dict):
+        self.version = data.get('version')
+        self.resources: List[Dict] = data.get('resources', [])
+        self.crisis_items: List[Dict] = data.get('crisis_resources', [])
+        self.crisis_resources: List[Dict] = [self.public(item) for item in self.crisis_items]
+
+        self.by_id: Dict[str, Dict] = {}
+        self.by_state: Dict[str, List[Dict]] = {}
+        self.by_type: Dict[str, List[Dict]] = {}
+        self.by_tag: Dict[str, List[Dict]] = {}
+        self.by_state_type: Dict[str, Dict[str, List[Dict]]] = {}
+
+        # Catalog order is preserved inside every index bucket
+        for item in self.resources:
+            self.by_id[item['id']] = item
+            self.by_type.setdefault(item['type'], []).append(item)
+            for tag in item.get('tags', []):
+                self.by_tag.setdefault(tag, []).append(item)
+            for state in item['states']:
+                self.by_state.setdefault(state, []).append(item)
+                self.by_state_type.setdefault(state, {}).setdefault(item['type'], []).append(item)
+
+    @staticmethod
+    def public(item: Dict) -> Dict:
+        """Fields of a catalog item that are returned to clients"""
+        return {field: item[field] for field in PUBLIC_FIELDS}
+
+    def state_recommendations(self) -> Dict[str, Dict[str, List[Dict]]]:
+        """Per-state resources grouped by type, in the shape RecommendationSystem uses"""
+        return {
+            state: {
+                resource_type: [self.public(item) for item in by_type.get(resource_type, [])]
+                for resource_type in RESOURCE_TYPES
+            }
+            for state, by_type in self.by_state_type.items()
+        }
+
+    def find(self, state: Optional[str] = None, resource_type: Optional[str] = None,
+             tag: Optional[str] = None) -> List[Dict]:
+        """Return catalog items matching every given filter, in catalog order"""
+        candidates = None
+        for bucket in (
+            self.by_state.get(state, []) if state else None,
+            self.by_type.get(resource_type, []) if resource_type else None,
+            self.by_tag.get(tag, []) if tag else None,
+        ):
+            if bucket is None:
+                continue
+            ids = {item['id'] for item in bucket}
+            candidates = ids if candidates is None else candidates & ids
+
+        if candidates is None:
+            return list(self.resources)
+        return [item for item in self.resources if item['id'] in candidates]
+
+
+class RecommendationCatalog:
+    """Recommendation catalog loaded from a versioned JSON file.
+
+    The file is re-read when its modification time changes; the check is a
+    single stat() call at most every ``reload_interval`` seconds. A file
+    that fails validation is ignored and the previous version stays active.
+    """
+
+    def __init__(self, path: Optional[str] = None, reload_interval: Optional[float] = None):
+        self.path = Path(path or os.environ.get(
+            'RECOMMENDATION_CATALOG_PATH', Path(__file__).parent / 'data' / 'recommendation_catalog.json'
+        ))
+        self.reload_interval = reload_interval if reload_interval is not None else float(
+            os.environ.get('RECOMMENDATION_CATALOG_RELOAD_SECONDS', '5')
+        )
+        self.snapshot = CatalogSnapshot({})
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    def add_listener(self, callback: Callable[[CatalogSnapshot], None]):
+        """Register a callback invoked with the new snapshot after every reload"""
+        self._listeners.append(callback)
+
+    def _validate(self, data: Dict):
+        if 'version' not in data:
+            raise ValueError("Catalog is missing 'version'")
+
+        seen = set()
+        sections = (
+            (data.get('resources', []), REQUIRED_FIELDS),
+            (data.get('crisis_resources', []), ('id',) + PUBLIC_FIELDS),
+        )
+        for items, required in sections:
+            for item in items:
+                missing = [field for field in required if field not in item]
+                if missing:
+                    raise ValueError(f"Catalog item {item.get('id')} is missing {missing}")
+                if item['id'] in seen:
+                    raise ValueError(f"Duplicate catalog id {item['id']}")
+                seen.add(item['id'])
+
+        for item in data.get('resources', []):
+            if item['type'] not in RESOURCE_TYPES:
+                raise ValueError(f"Catalog item {item['id']} has unknown type {item['type']}")
+
+    def load(self) -> bool:
+        """Read, validate and activate the catalog file"""
+        with self._lock:
+            mtime = None
+            try:
+                mtime = self.path.stat().st_mtime_ns
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._validate(data)
+                snapshot = CatalogSnapshot(data)
+            except Exception as e:
+                logger.error(f"Error loading recommendation catalog {self.path}: {str(e)}")
+                # Don't retry the same broken file on every check
+                self._mtime = mtime
+                return False
+
+            self.snapshot = snapshot
+            self._mtime = mtime
+            logger.info(f"Loaded recommendation catalog version {snapshot.version} with {len(snapshot.resources)} resources")
+
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"Error applying recommendation catalog: {str(e)}")
+        return True
+
+    def reload_if_changed(self) -> bool:
+        """Reload the catalog if the file changed since the last load"""
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            return False
+
+        if mtime == self._mtime:
+            return False
+        return self.load()
@@ -0,0 +1,155 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Extra score given to crisis resources at each risk level
+RISK_BOOSTS = {
+    'low': 0.0,
+    'medium': 0.15,
+    'high': 1.0
+}
+
+CRISIS_TAGS = ('crisis', 'hotline')
+# Items pinned to the top at high risk, along with the catalog's global crisis section
+PINNED_TAGS = ('hotline',)
+
+# Risk levels at which pinned items are listed before everything else
+PINNED_RISK_LEVELS = ('high',)
+# Added to the sort key of pinned items; far above any relevance score
+PINNED_OFFSET = 1e6
+
+
+class RecommendationRanker:
+    """Scores every catalog item against the full state probability vector.
+
+    Each item has a row in an item-by-state weight matrix (1.0 for every
+    state it is listed under, or the catalog's ``state_weights``), so the
+    relevance of the whole catalog is one matrix-vector product. Crisis
+    resources, including the catalog's global crisis section, get an
+    additional boost that grows with the risk level. At high risk, hotlines
+    and the global crisis section are pinned above everything else. Equal
+    scores keep catalog order.
+    """
+
+    def __init__(self, states: Optional[List[str]] = None):
+        self.states: List[str] = list(states or [])
+        # (states, items, weights, crisis mask, pinned mask, types), replaced as a whole on rebuild
+        self._model = (self.states, [], np.zeros((0, len(self.states)), dtype=np.float32),
+                       np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32), [])
+
+    def build(self, snapshot):
+        """Rebuild the weight matrices from a catalog snapshot"""
+        states = list(self.states)
+        for item in snapshot.resources:
+            for state in item['states']:
+                if state not in states:
+                    states.append(state)
+        state_index = {state: i for i, state in enumerate(states)}
+
+        # Global crisis resources aren't tied to a state; only the risk boost ranks them
+        items = list(snapshot.resources) + [
+            {**item, 'type': 'professional_resources', 'states': [], 'crisis': True}
+            for item in snapshot.crisis_items
+        ]
+        weights = np.zeros((len(items), len(states)), dtype=np.float32)
+        crisis_mask = np.zeros(len(items), dtype=np.float32)
+        pinned_mask = np.zeros(len(items), dtype=np.float32)
+
+        for row, item in enumerate(items):
+            item_weights = item.get('state_weights') or {state: 1.0 for state in item['states']}
+            for state, weight in item_weights.items():
+                if state in state_index:
+                    weights[row, state_index[state]] = weight
+            tags = item.get('tags', [])
+            if item.get('crisis') or any(tag in CRISIS_TAGS for tag in tags):
+                crisis_mask[row] = 1.0
+            if item.get('crisis') or any(tag in PINNED_TAGS for tag in tags):
+                pinned_mask[row] = 1.0
+
+        # A single assignment keeps concurrent readers on a consistent model
+        self.states = states
+        self._model = (states, items, weights, crisis_mask, pinned_mask, [item['type'] for item in items])
+        logger.info(f"Recommendation ranker built for {len(items)} items x {len(states)} states")
+
+    def score(self, state_probabilities: Dict[str, float], risk_level: str, model=None) -> np.ndarray:
+        """Relevance score of every catalog item"""
+        states, _, weights, crisis_mask, _, _ = model or self._model
+        probabilities = np.fromiter(
+            (state_probabilities.get(state, 0.0) for state in states),
+            dtype=np.float32,
+            count=len(states)
+        )
+        scores = weights @ probabilities
+        boost = RISK_BOOSTS.get(risk_level, 0.0)
+        if boost:
+            scores = scores + boost * crisis_mask
+        return scores
+
+    def rank(
+        self,
+        state_probabilities: Dict[str, float],
+        risk_level: str = 'low',
+        top_n: int = 8,
+        max_per_type: int = 3
+    ) -> List[Dict]:
+        """Return the top_n items, at most max_per_type of each type and one per URL"""
+        model = self._model
+        _, items, _, _, pinned_mask, types = model
+        if not items or top_n <= 0:
+            return []
+
+        scores = self.score(state_probabilities, risk_level, model)
+        keys = scores.astype(np.float64)
+        if risk_level in PINNED_RISK_LEVELS:
+            keys = keys + PINNED_OFFSET * pinned_mask
+
+        # Diversity filtering rarely needs more than a few times top_n candidates
+        pool = min(len(items), top_n * 4)
+        while True:
+            candidates = self._top_candidates(keys, pool)
+
+            ranked, per_type, urls = [], {}, set()
+            for index in candidates:
+                if scores[index] <= 0:
+                    break
+                item = items[index]
+                if per_type.get(types[index], 0) >= max_per_type or item['url'] in urls:
+                    continue
+                per_type[types[index]] = per_type.get(types[index], 0) + 1
+                urls.add(item['url'])
+                ranked.append((index, item))
+                if len(ranked) == top_n:
+                    break
+
+            if len(ranked) == top_n or pool >= len(items):
+                break
+            pool = min(len(items), pool * 4)
+
+        return [
+            {
+                'id': item['id'],
+                'type': item['type'],
+                'title': item['title'],
+                'url': item['url'],
+                'description': item['description'],
+                'score': round(float(scores[index]), 4)
+            }
+            for index, item in ranked
+        ]
+
+    @staticmethod
+    def _top_candidates(keys: np.ndarray, pool: int) -> np.ndarray:
+        """Indices of the ``pool`` highest keys, plus anything tied with the last, best first.
+
+        Ties are broken by catalog position, so the order never depends on
+        how argpartition happened to arrange equal keys.
+        """
+        if pool < len(keys):
+            cutoff = np.partition(keys, len(keys) - pool)[len(keys) - pool]
+            candidates = np.flatnonzero(keys >= cutoff)
+        else:
+            candidates = np.arange(len(keys))
+        return candidates[np.lexsort((candidates, -keys[candidates]))]
@@ -1,297 +1,131 @@
 import logging
 from typing import Dict, List
 import random
+from recommendation_catalog import RecommendationCatalog, CatalogSnapshot
+from recommendation_ranking import RecommendationRanker
+from metrics import FALLBACKS
 
 logger = logging.getLogger(__name__)
 
+RISK_LEVELS = ('low', 'medium', 'high')
+
+# One representative confidence per band; payloads only depend on the band
+CONFIDENCE_BANDS = {
+    'High confidence': 0.9,
+    'Moderate confidence': 0.7,
+    'Low confidence': 0.5
+}
+
+
+class FrozenDict(dict):
+    """Read-only dict shared between requests for precomputed payloads"""
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict is read-only")
+    
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value):
+    """Recursively convert dicts to FrozenDict and lists to tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
 class RecommendationSystem:
     def __init__(self):
-        # Define comprehensive recommendations for each psychological state
-        self.recommendations = {
-            'Normal': {
-                'youtube_videos': [
-                    {
-                        'title': '10 Daily Habits for Mental Wellness',
-                        'url': 'https://www.youtube.com/watch?v=3QIfkeA6HBY',
-                        'description': 'Simple daily practices to maintain good mental health'
-                    },
-                    {
-                        'title': 'Mindfulness Meditation for Beginners',
-                        'url': 'https://www.youtube.com/watch?v=ZToicYcHIOU',
-                        'description': '10-minute guided meditation for stress relief'
-                    },
-                    {
-                        'title': 'Building Emotional Resilience',
-                        'url': 'https://www.youtube.com/watch?v=NUHsEmlIoE4',
-                        'description': 'Techniques to build emotional strength and resilience'
-                    }
-                ],
-                'articles': [
-                    {
-                        'title': 'The Science of Well-Being',
-                        'url': 'https://www.helpguide.org/articles/mental-health/building-better-mental-health.htm',
-                        'description': 'Evidence-based strategies for maintaining mental wellness'
-                    },
-                    {
-                        'title': 'Positive Psychology Practices',
-                        'url': 'https://positivepsychology.com/positive-psychology-exercises/',
-                        'description': 'Research-backed exercises to boost happiness and life satisfaction'
-                    }
-                ],
-                'professional_resources': [
-                    {
-                        'title': 'Psychology Today - Find a Therapist',
-                        'url': 'https://www.psychologytoday.com/us/therapists',
-                        'description': 'Find mental health professionals in your area'
-                    }
-                ]
-            },
+        self.recommendations: Dict[str, Dict[str, List[Dict]]] = {}
+        self.crisis_resources: List[Dict] = []
+        self._payloads = {}
+        self.ranker = RecommendationRanker(['Normal', 'Depression', 'Bipolar', 'Anxiety', 'Suicidal'])
+        
+        # Videos, articles and professional resources live in a versioned catalog
+        # file that is hot-reloaded when content changes
+        self.catalog = RecommendationCatalog()
+        self.catalog.add_listener(self._apply_catalog)
+        self.catalog.load()
+    
+    def _apply_catalog(self, snapshot: CatalogSnapshot):
+        """Rebuild state recommendations and payloads from a catalog snapshot"""
+        self.recommendations = snapshot.state_recommendations()
+        # General crisis resources that are always included for high-risk states
+        self.crisis_resources = snapshot.crisis_resources
+        self._build_payload_cache()
+        self.ranker.build(snapshot)
+    
+    def _build_payload_cache(self):
+        """Precompute every (state, risk level, confidence band) payload"""
+        payloads = {}
+        for state in self.recommendations:
+            for risk_level in RISK_LEVELS:
+                for band, confidence in CONFIDENCE_BANDS.items():
+                    payloads[(state, risk_level, band)] = freeze(
+                        self._build_recommendations(state, risk_level, confidence)
+                    )
+        self._payloads = payloads
+        logger.info(f"Precomputed {len(payloads)} recommendation payloads")
+    
+    def _lookup_payload(self, analysis_result: Dict):
+        key = (
+            analysis_result.get('predicted_state', 'Normal'),
+            analysis_result.get('risk_level', 'low'),
+            self._get_confidence_description(analysis_result.get('confidence', 0.5))
+        )
+        return self._payloads.get(key)
+    
+    def get_recommendations(self, analysis_result: Dict) -> Dict:
+        """Generate personalized recommendations based on psychological analysis
+        
+        Known (state, risk level, confidence band) combinations return a shared,
+        read-only payload; anything else is built on demand.
+        """
+        try:
+            self.catalog.reload_if_changed()
             
-            'Depression': {
-                'youtube_videos': [
-                    {
-                        'title': 'Understanding Depression - Mayo Clinic',
-                        'url': 'https://www.youtube.com/watch?v=z-IR48Mb3W0',
-                        'description': 'Comprehensive overview of depression symptoms and treatment'
-                    },
-                    {
-                        'title': 'Cognitive Behavioral Therapy for Depression',
-                        'url': 'https://www.youtube.com/watch?v=0ViaCs0k2jQ',
-                        'description': 'CBT techniques to manage depressive thoughts'
-                    },
-                    {
-                        'title': 'Depression Recovery: Daily Routine That Helps',
-                        'url': 'https://www.youtube.com/watch?v=OG6HZMMDEYA',
-                        'description': 'Practical daily routines for managing depression'
-                    },
-                    {
-                        'title': 'Guided Meditation for Depression and Anxiety',
-                        'url': 'https://www.youtube.com/watch?v=ZToicYcHIOU',
-                        'description': 'Calming meditation specifically for depression relief'
-                    }
-                ],
-                'articles': [
-                    {
-                        'title': 'Depression Treatment and Management',
-                        'url': 'https://www.nami.org/About-Mental-Illness/Mental-Health-Conditions/Depression',
-                        'description': 'Comprehensive guide to understanding and treating depression'
-                    },
-                    {
-                        'title': 'Coping with Depression - Harvard Health',
-                        'url': 'https://www.health.harvard.edu/mind-and-mood/what-causes-depression',
-                        'description': 'Evidence-based strategies for managing depression'
-                    },
-                    {
-                        'title': 'Self-Help Strategies for Depression',
-                        'url': 'https://www.helpguide.org/articles/depression/coping-with-depression.htm',
-                        'description': 'Practical self-help techniques for depression recovery'
-                    }
-                ],
-                'professional_resources': [
-                    {
-                        'title': 'National Suicide Prevention Lifeline',
-                        'url': 'https://suicidepreventionlifeline.org/',
-                        'description': 'Crisis support: Call 988 for immediate help'
-                    },
-                    {
-                        'title': 'Depression and Bipolar Support Alliance',
-                        'url': 'https://www.dbsalliance.org/',
-                        'description': 'Support groups and resources for depression'
-                    },
-                    {
-                        'title': 'SAMHSA National Helpline',
-                        'url': 'https://www.samhsa.gov/find-help/national-helpline',
-                        'description': '1-800-662-4357 - Free, confidential treatment referral service'
-                    }
-                ]
-            },
+            payload = self._lookup_payload(analysis_result)
+            if payload is not None:
+                return payload
             
-            'Anxiety': {
-                'youtube_videos': [
-                    {
-                        'title': 'Anxiety Explained - Understanding Your Anxious Mind',
-                        'url': 'https://www.youtube.com/watch?v=WWloIAQpMcQ',
-                        'description': 'Understanding the science behind anxiety and panic'
-                    },
-                    {
-                        'title': '5-4-3-2-1 Grounding Technique for Anxiety',
-                        'url': 'https://www.youtube.com/watch?v=30VMIEmA114',
-                        'description': 'Quick technique to manage anxiety attacks'
-                    },
-                    {
-                        'title': 'Breathing Exercises for Anxiety Relief',
-                        'url': 'https://www.youtube.com/watch?v=DbDoBzGY3vo',
-                        'description': 'Effective breathing techniques to calm anxiety'
-                    },
-                    {
-                        'title': 'Progressive Muscle Relaxation for Anxiety',
-                        'url': 'https://www.youtube.com/watch?v=ihO02wUzgkc',
-                        'description': 'Guided muscle relaxation to reduce physical anxiety symptoms'
-                    }
-                ],
-                'articles': [
-                    {
-                        'title': 'Anxiety Disorders - Mayo Clinic',
-                        'url': 'https://www.mayoclinic.org/diseases-conditions/anxiety/symptoms-causes/syc-20350961',
-                        'description': 'Comprehensive guide to anxiety disorders and treatment'
-                    },
-                    {
-                        'title': 'Managing Anxiety - Practical Tips',
-                        'url': 'https://www.anxietyanddepressionassociation.org/tips-managing-anxiety-and-stress',
-                        'description': 'Evidence-based tips for managing anxiety in daily life'
-                    },
-                    {
-                        'title': 'Cognitive Techniques for Anxiety',
-                        'url': 'https://www.helpguide.org/articles/anxiety/anxiety-disorders-and-anxiety-attacks.htm',
-                        'description': 'Cognitive strategies to overcome anxious thoughts'
-                    }
-                ],
-                'professional_resources': [
-                    {
-                        'title': 'Anxiety and Depression Association of America',
-                        'url': 'https://adaa.org/',
-                        'description': 'Resources, support groups, and professional help for anxiety'
-                    },
-                    {
-                        'title': 'Crisis Text Line',
-                        'url': 'https://www.crisistextline.org/',
-                        'description': 'Text HOME to 741741 for free crisis counseling'
-                    }
-                ]
-            },
+            return self._build_recommendations(
+                analysis_result.get('predicted_state', 'Normal'),
+                analysis_result.get('risk_level', 'low'),
+                analysis_result.get('confidence', 0.5)
+            )
             
-            'Bipolar': {
-                'youtube_videos': [
-                    {
-                        'title': 'Understanding Bipolar Disorder - Mayo Clinic',
-                        'url': 'https://www.youtube.com/watch?v=RrWfDgqIbcg',
-                        'description': 'Comprehensive overview of bipolar disorder'
-                    },
-                    {
-                        'title': 'Living with Bipolar Disorder - Personal Stories',
-                        'url': 'https://www.youtube.com/watch?v=apLGdKKjFNA',
-                        'description': 'Real experiences and coping strategies from bipolar individuals'
-                    },
-                    {
-                        'title': 'Mood Tracking for Bipolar Disorder',
-                        'url': 'https://www.youtube.com/watch?v=FvnnyY_h0GI',
-                        'description': 'How to track mood changes and identify triggers'
-                    }
-                ],
-                'articles': [
-                    {
-                        'title': 'Bipolar Disorder Guide - NAMI',
-                        'url': 'https://www.nami.org/About-Mental-Illness/Mental-Health-Conditions/Bipolar-Disorder',
-                        'description': 'Complete guide to understanding bipolar disorder'
-                    },
-                    {
-                        'title': 'Managing Bipolar Disorder',
-                        'url': 'https://www.webmd.com/bipolar-disorder/guide/bipolar-disorder-overview',
-                        'description': 'Treatment options and management strategies'
-                    },
-                    {
-                        'title': 'Bipolar Self-Care Strategies',
-                        'url': 'https://www.helpguide.org/articles/bipolar-disorder/living-with-bipolar-disorder.htm',
-                        'description': 'Self-care techniques for managing bipolar symptoms'
-                    }
-                ],
-                'professional_resources': [
-                    {
-                        'title': 'Depression and Bipolar Support Alliance',
-                        'url': 'https://www.dbsalliance.org/',
-                        'description': 'Specialized support for bipolar disorder'
-                    },
-                    {
-                        'title': 'International Bipolar Foundation',
-                        'url': 'https://ibpf.org/',
-                        'description': 'Education and support for bipolar individuals and families'
-                    }
-                ]
-            },
+        except Exception as e:
+            logger.error(f"Error generating recommendations: {str(e)}")
+            return self._get_fallback_recommendations()
+    
+    def rank_resources(self, analysis_result: Dict, top_n: int = 8, max_per_type: int = 3) -> List[Dict]:
+        """Rank catalog items against all state probabilities, not just the top state"""
+        try:
+            self.catalog.reload_if_changed()
             
-            'Suicidal': {
-                'youtube_videos': [
-                    {
-                        'title': 'Suicide Prevention - Warning Signs and How to Help',
-                        'url': 'https://www.youtube.com/watch?v=WcSUs9iZv-g',
-                        'description': 'Understanding suicidal thoughts and getting help'
-                    },
-                    {
-                        'title': 'Crisis Survival Skills - DBT',
-                        'url': 'https://www.youtube.com/watch?v=x3adCjQ_Bfg',
-                        'description': 'Dialectical behavior therapy techniques for crisis situations'
-                    },
-                    {
-                        'title': 'Hope and Recovery from Suicidal Thoughts',
-                        'url': 'https://www.youtube.com/watch?v=WrqjmxPG1rM',
-                        'description': 'Personal stories of recovery and finding hope'
-                    }
-                ],
-                'articles': [
-                    {
-                        'title': 'Suicide Prevention Resources - CDC',
-                        'url': 'https://www.cdc.gov/suicide/resources/index.html',
-                        'description': 'Comprehensive suicide prevention resources and strategies'
-                    },
-                    {
-                        'title': 'Coping with Suicidal Thoughts',
-                        'url': 'https://www.suicidepreventionlifeline.org/help-yourself/attempt-survivors/',
-                        'description': 'Strategies for managing suicidal ideation'
-                    }
-                ],
-                'professional_resources': [
-                    {
-                        'title': '🚨 IMMEDIATE CRISIS SUPPORT 🚨',
-                        'url': 'tel:988',
-                        'description': 'Call 988 - National Suicide Prevention Lifeline (Available 24/7)'
-                    },
-                    {
-                        'title': 'Crisis Text Line',
-                        'url': 'https://www.crisistextline.org/',
-                        'description': 'Text HOME to 741741 for immediate crisis support'
-                    },
-                    {
-                        'title': 'Emergency Services',
-                        'url': 'tel:911',
-                        'description': 'Call 911 for immediate emergency assistance'
-                    },
-                    {
-                        'title': 'National Suicide Prevention Lifeline',
-                        'url': 'https://suicidepreventionlifeline.org/',
-                        'description': 'Comprehensive crisis support and resources'
-                    }
-                ]
-            }
-        }
-        
-        # General crisis resources that are always included for high-risk states
-        self.crisis_resources = [
-            {
-                'title': '🚨 National Suicide Prevention Lifeline: 988',
-                'url': 'tel:988',
-                'description': 'Free, confidential crisis support available 24/7/365'
-            },
-            {
-                'title': 'Crisis Text Line',
-                'url': 'https://www.crisistextline.org/',
-                'description': 'Text HOME to 741741 for free, 24/7 crisis counseling'
-            },
-            {
-                'title': 'Emergency Services',
-                'url': 'tel:911',
-                'description': 'Call 911 for immediate medical emergency assistance'
+            state_probabilities = analysis_result.get('state_probabilities') or {
+                analysis_result.get('predicted_state', 'Normal'): 1.0
             }
-        ]
+            return self.ranker.rank(
+                state_probabilities,
+                analysis_result.get('risk_level', 'low'),
+                top_n=top_n,
+                max_per_type=max_per_type
+            )
+            
+        except Exception as e:
+            logger.error(f"Error ranking recommendations: {str(e)}")
+            return []
     
-    def get_recommendations(self, analysis_result: Dict) -> Dict:
-        """Generate personalized recommendations based on psychological analysis"""
+    def _build_recommendations(self, predicted_state: str, risk_level: str, confidence: float) -> Dict:
+        """Build the recommendation payload for a state, risk level and confidence"""
         try:
-            predicted_state = analysis_result.get('predicted_state', 'Normal')
-            risk_level = analysis_result.get('risk_level', 'low')
-            confidence = analysis_result.get('confidence', 0.5)
-            
             # Get base recommendations for the predicted state
-            base_recommendations = self.recommendations.get(predicted_state, self.recommendations['Normal'])
+            base_recommendations = self.recommendations.get(predicted_state) or self.recommendations.get('Normal', {})
             
             # Customize recommendations based on risk level and confidence
             recommendations = {
@@ -436,12 +270,13 @@ class RecommendationSystem:
     
     def _get_fallback_recommendations(self) -> Dict:
         """Return fallback recommendations when system fails"""
+        FALLBACKS.inc(reason='recommendations')
         return {
             'primary_concern': 'General Support',
             'risk_level': 'low',
             'confidence_level': 'Low confidence',
-            'youtube_videos': self.recommendations['Normal']['youtube_videos'][:2],
-            'articles': self.recommendations['Normal']['articles'][:2],
+            'youtube_videos': self.recommendations.get('Normal', {}).get('youtube_videos', [])[:2],
+            'articles': self.recommendations.get('Normal', {}).get('articles', [])[:2],
             'professional_resources': [
                 {
                     'title': 'National Suicide Prevention Lifeline',
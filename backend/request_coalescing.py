@@ -0,0 +1,156 @@
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+COALESCED_REQUESTS = registry.counter(
+    'psychmaster_coalesced_requests_total',
+    'Requests answered by sharing work already in flight for another request',
+    ('kind',)
+)
+EMBEDDING_BATCH_SIZE = registry.histogram(
+    'psychmaster_embedding_batch_size',
+    'Queries embedded per batched forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+
+def normalize_query(text: str) -> str:
+    """Key for identical queries: the embedder is uncased and BM25 lowercases, so case and spacing don't matter"""
+    return ' '.join(text.lower().split())
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Share the result of a call among all threads asking for the same key at once.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and return the same result (or exception). Nothing
+    is cached once the call has finished.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, _Call] = {}
+
+    def do(self, key, fn: Callable[[], Any]):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED_REQUESTS.inc(kind=self.kind)
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+class BatchingEmbeddings(Embeddings):
+    """Embeddings wrapper that micro-batches concurrent embed_query calls.
+
+    Queries wait up to ``max_wait`` seconds for others to arrive and a
+    background thread embeds them with a single embed_documents call, adding
+    the wrapped model's query instruction so the vectors match what
+    embed_query would have returned. Identical texts in a batch are embedded
+    once. Document embedding is passed straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch_size: int = 32, max_wait: float = 0.005):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.query_instruction = getattr(embeddings, 'query_instruction', '')
+        # Only batch when embed_documents adds nothing that embed_query would not
+        self.enabled = max_batch_size > 1 and not getattr(embeddings, 'embed_instruction', '')
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        if not self.enabled:
+            return self.embeddings.embed_query(text)
+
+        self._ensure_worker()
+        call = _Call()
+        self._queue.put((self.query_instruction + text.replace('\n', ' '), call))
+        call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _ensure_worker(self):
+        # A worker forked from a preloading master inherits no running thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self, work: queue.Queue) -> List:
+        batch = [work.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(work.get(timeout=timeout) if timeout > 0 else work.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        work = self._queue
+        while True:
+            batch = self._next_batch(work)
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            EMBEDDING_BATCH_SIZE.observe(len(texts))
+            if len(texts) < len(batch):
+                COALESCED_REQUESTS.inc(len(batch) - len(texts), kind='embedding')
+            try:
+                vectors = dict(zip(texts, self.embeddings.embed_documents(texts)))
+                for text, call in batch:
+                    call.result = vectors[text]
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(texts)} queries: {str(e)}")
+                for _, call in batch:
+                    call.error = e
+            for _, call in batch:
+                call.event.set()
+
@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import logging
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Profiler of the request running in this context; copied into threadpool calls
+_active_profiler: ContextVar = ContextVar('active_profiler', default=None)
+
+# Leaf functions of threads that are parked rather than doing work
+IDLE_FUNCTIONS = frozenset(['select', 'poll', 'wait', 'accept', '_wait_for_tstate_lock'])
+
+
+class SamplingProfiler:
+    """Low-overhead statistical profiler.
+
+    A background thread snapshots Python stacks every ``interval``
+    seconds and counts identical stacks. Only the work of one request is
+    sampled: the event loop thread while the request's task is the one
+    running, and worker threads while they run code attached with
+    ``attach_thread()``. Idle threads are skipped. The result can be
+    written in the collapsed stack format read by flamegraph.pl,
+    speedscope and inferno.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop_thread: Optional[int] = None
+        self._threads = set()
+
+    def follow_task(self, task: asyncio.Task):
+        """Sample the event loop thread while ``task`` is running; call from that loop"""
+        self._task = task
+        self._loop_thread = threading.get_ident()
+
+    @contextmanager
+    def attach_thread(self):
+        """Sample the calling thread until the block exits"""
+        ident = threading.get_ident()
+        self._threads.add(ident)
+        try:
+            yield
+        finally:
+            self._threads.discard(ident)
+
+    def _is_sampled(self, thread_id: int) -> bool:
+        if thread_id in self._threads:
+            return True
+        if thread_id == self._loop_thread:
+            # Other requests share the loop thread; only our task's turns count
+            return asyncio.current_task(self._task.get_loop()) is self._task
+        return False
+
+    @staticmethod
+    def _collapse(frame) -> list:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or not self._is_sampled(thread_id) or frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            stack = self._collapse(frame)
+            self.stacks[';'.join([names.get(thread_id, str(thread_id))] + stack)] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread; blocks, so keep it off the event loop"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write_collapsed(self, path: Path):
+        """Write one 'frame;frame;frame count' line per distinct stack"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfilingMiddleware:
+    """Profile a sample of requests to selected paths.
+
+    Profiling is enabled with PROFILING_ENABLED=true, which samples
+    PROFILING_SAMPLE_RATE of the requests to PROFILING_PATHS. With
+    PROFILING_ALLOW_HEADER=true a request can also ask to be profiled by
+    sending ``X-Profile-Request: 1``. Only one request is profiled at a
+    time. Profiles are written to PROFILING_OUTPUT_DIR as collapsed stack
+    files, and the file name is returned in the X-Profile-Id header.
+
+    A profile holds the request's own task plus the threadpool calls wrapped
+    with ``profiled()``; batched classifier inference, which serves several
+    requests at once, isn't attributed to any of them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+        self.allow_header = os.environ.get('PROFILING_ALLOW_HEADER', 'false').lower() == 'true'
+        self.sample_rate = float(os.environ.get('PROFILING_SAMPLE_RATE', '0.01'))
+        self.interval = float(os.environ.get('PROFILING_INTERVAL_MS', '5')) / 1000.0
+        self.paths = frozenset(
+            path.strip() for path in os.environ.get('PROFILING_PATHS', '/api/chat,/api/chat/end-session').split(',')
+            if path.strip()
+        )
+        self.output_dir = Path(os.environ.get('PROFILING_OUTPUT_DIR', './profiles'))
+        self._busy = threading.Lock()
+
+    def _should_profile(self, scope) -> bool:
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            return False
+        if self.allow_header:
+            for name, value in scope.get('headers', []):
+                if name == b'x-profile-request' and value in (b'1', b'true'):
+                    return True
+        return self.enabled and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if not (self.enabled or self.allow_header) or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['path'].strip('/').replace('/', '_')}-{uuid.uuid4().hex[:8]}"
+        profiler = SamplingProfiler(self.interval)
+
+        async def send_with_header(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [(b'x-profile-id', profile_id.encode('ascii'))]
+            await send(message)
+
+        start = time.perf_counter()
+        profiler.follow_task(asyncio.current_task())
+        token = _active_profiler.set(profiler)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _active_profiler.reset(token)
+            elapsed = time.perf_counter() - start
+            try:
+                # Joining the sampler and writing the file both block
+                await run_in_threadpool(self._finish, profiler, profile_id)
+                logger.info(
+                    f"Profiled {scope['path']} in {elapsed * 1000:.1f} ms "
+                    f"({profiler.samples} samples) -> {profile_id}.folded"
+                )
+            except Exception as e:
+                logger.error(f"Failed to write request profile: {str(e)}")
+            finally:
+                self._busy.release()
+
+    def _finish(self, profiler: SamplingProfiler, profile_id: str):
+        profiler.stop()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        profiler.write_collapsed(self.output_dir / f"{profile_id}.folded")
+
+
+def profiled(func):
+    """Wrap a function passed to run_in_threadpool so a profiled request also samples its worker thread"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active_profiler.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        with profiler.attach_thread():
+            return func(*args, **kwargs)
+    return wrapper
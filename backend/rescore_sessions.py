@@ -0,0 +1,380 @@
+"""
+Re-score stored sessions with the current psychological state classifier.
+
+Streams session transcripts from MongoDB or from a JSONL export with one
+{"session_id": ..., "messages": [...]} object per line. Sessions are
+analyzed in vectorized batches across a process pool and the results are
+written back in bulk, to MongoDB or to a JSONL file.
+
+MongoDB only has transcripts for sessions that ended while the server ran
+with PERSIST_TRANSCRIPTS=true, which is off by default; the job stops with
+an error if no stored session has one.
+
+Progress is checkpointed after every batch that completes the contiguous
+prefix of the input, so a rerun with the same checkpoint file resumes where
+the last run stopped. Only --max-in-flight batches are read ahead, so
+memory stays bounded however many sessions there are.
+
+A batch that fails is retried up to --max-retries times, then scored one
+session at a time so that only the sessions that still fail are skipped.
+Skipped sessions, and sessions the classifier can't analyze (no user
+text), are never written as results; they are listed in the skip file
+with the reason instead.
+
+    python rescore_sessions.py --source jsonl --input sessions.jsonl --output rescored.jsonl
+    python rescore_sessions.py --source mongo --workers 8 --field rescored_analysis
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (position after the batch, [(session_id, messages), ...])
+Batch = Tuple[object, List[Tuple[str, List[Dict]]]]
+
+# Sessions whose messages are stored; see PERSIST_TRANSCRIPTS in langchain_service.py
+TRANSCRIPT_QUERY = {'messages': {'$exists': True}}
+
+_worker_analyzer = None
+
+
+def _init_worker():
+    global _worker_analyzer
+    logging.getLogger().setLevel(logging.WARNING)
+    from psychological_analysis import psychological_analyzer
+    _worker_analyzer = psychological_analyzer
+
+
+def _score_batch(sessions: List[Tuple[str, List[Dict]]]) -> List[Tuple[str, Dict]]:
+    # Strict, so a failed batch raises here instead of coming back as fallback analyses
+    analyses = _worker_analyzer.analyze_conversations([messages for _, messages in sessions], strict=True)
+    return [(session_id, analysis) for (session_id, _), analysis in zip(sessions, analyses)]
+
+
+def _score_each(sessions: List[Tuple[str, List[Dict]]]) -> List[Tuple[str, Dict]]:
+    """Score a failed batch one session at a time, so one bad session doesn't sink the rest"""
+    scored = []
+    for session in sessions:
+        try:
+            scored.extend(_score_batch([session]))
+        except Exception as e:
+            scored.append((session[0], {'fallback': True, 'error': str(e)}))
+    return scored
+
+
+class Checkpoint:
+    """Resume position of a job, replaced atomically on every save"""
+
+    def __init__(self, path: Path, source: str):
+        self.path = path
+        self.source = source
+        self.position = None
+        self.processed = 0
+        self.skipped = 0
+        self.output_size = 0
+        self.skip_size = 0
+
+    def load(self, restart: bool = False):
+        if restart or not self.path.exists():
+            return
+        state = json.loads(self.path.read_text())
+        if state.get('source') != self.source:
+            raise SystemExit(f"Checkpoint {self.path} belongs to {state.get('source')}, not {self.source}; "
+                             f"use --restart or another --checkpoint")
+        self.position = state.get('position')
+        self.processed = state.get('processed', 0)
+        self.skipped = state.get('skipped', 0)
+        self.output_size = state.get('output_size', 0)
+        self.skip_size = state.get('skip_size', 0)
+
+    def save(self):
+        tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+        tmp.write_text(json.dumps({
+            'source': self.source,
+            'position': self.position,
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'output_size': self.output_size,
+            'skip_size': self.skip_size,
+            'updated_at': datetime.utcnow().isoformat(),
+        }))
+        os.replace(tmp, self.path)
+
+
+def read_jsonl(path: str, start: Optional[int], batch_size: int) -> Iterator[Batch]:
+    """Batches of sessions from a JSONL export; positions are byte offsets"""
+    with open(path, 'rb') as f:
+        f.seek(start or 0)
+        batch = []
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                record = json.loads(line)
+                batch.append((record['session_id'], record.get('messages') or []))
+            if len(batch) >= batch_size:
+                yield f.tell(), batch
+                batch = []
+        if batch:
+            yield f.tell(), batch
+
+
+def read_mongo(collection, start: Optional[str], batch_size: int) -> Iterator[Batch]:
+    """Batches of sessions with stored transcripts in _id order; positions are _id strings"""
+    from bson import ObjectId
+
+    query = dict(TRANSCRIPT_QUERY)
+    if start:
+        query['_id'] = {'$gt': ObjectId(start)}
+    cursor = collection.find(query, {'session_id': 1, 'messages': 1}).sort('_id', 1).batch_size(batch_size)
+
+    batch, last_id = [], None
+    for document in cursor:
+        batch.append((document['session_id'], document.get('messages') or []))
+        last_id = document['_id']
+        if len(batch) >= batch_size:
+            yield str(last_id), batch
+            batch = []
+    if batch:
+        yield str(last_id), batch
+
+
+class JsonlWriter:
+    """Appends results; truncates to the checkpointed size so a resumed run never duplicates"""
+
+    def __init__(self, path: str, size: int):
+        self.file = open(path, 'ab')
+        self.file.truncate(size)
+        self.file.seek(size)
+
+    def write(self, results: List[Tuple[str, Dict]], model_version: str) -> int:
+        for session_id, analysis in results:
+            self.file.write(json.dumps(
+                {'session_id': session_id, 'model_version': model_version, 'analysis': analysis},
+                default=str
+            ).encode('utf-8') + b'\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class SkipLog:
+    """JSONL list of sessions left unscored and why; truncated to the checkpointed size like JsonlWriter"""
+
+    def __init__(self, path: str, size: int):
+        self.file = open(path, 'ab')
+        self.file.truncate(size)
+        self.file.seek(size)
+
+    def write(self, skipped: List[Tuple[str, str]]) -> int:
+        for session_id, reason in skipped:
+            self.file.write(json.dumps({'session_id': session_id, 'reason': reason}).encode('utf-8') + b'\n')
+        if skipped:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class MongoWriter:
+    """Sets the re-scored analysis on each session document with one bulk write per batch"""
+
+    def __init__(self, collection, field: str):
+        self.collection = collection
+        self.field = field
+
+    def write(self, results: List[Tuple[str, Dict]], model_version: str) -> int:
+        from pymongo import UpdateOne
+
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({'session_id': session_id}, {'$set': {
+                self.field: analysis,
+                f'{self.field}_model': model_version,
+                f'{self.field}_at': now,
+            }})
+            for session_id, analysis in results
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        return 0
+
+    def close(self):
+        pass
+
+
+def run(reader: Iterator[Batch], writer, skip_log: SkipLog, checkpoint: Checkpoint, workers: int,
+        max_in_flight: int, model_version: str, max_retries: int = 2, report_every: float = 10.0,
+        limit: Optional[int] = None) -> int:
+    """Score batches in the pool and commit results strictly in input order"""
+    started = time.perf_counter()
+    last_report = started
+    processed = submitted = 0
+    next_submit = next_commit = 0
+    # future -> (sequence, position, batch, attempt)
+    in_flight = {}
+    # sequence -> (position, results, skipped)
+    completed = {}
+    exhausted = False
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        while True:
+            while not exhausted and len(in_flight) + len(completed) < max_in_flight:
+                if limit is not None and submitted >= limit:
+                    exhausted = True
+                    break
+                try:
+                    position, batch = next(reader)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future = pool.submit(_score_batch, batch)
+                in_flight[future] = (next_submit, position, batch, 1)
+                next_submit += 1
+                submitted += len(batch)
+
+            if not in_flight and not completed:
+                break
+
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                sequence, position, batch, attempt = in_flight.pop(future)
+                error = future.exception()
+                if error is None:
+                    scored = future.result()
+                    results = [(session_id, analysis) for session_id, analysis in scored if not analysis.get('fallback')]
+                    skipped = [
+                        (session_id, f"error: {analysis['error']}" if 'error' in analysis else 'no_analysis')
+                        for session_id, analysis in scored if analysis.get('fallback')
+                    ]
+                    completed[sequence] = (position, results, skipped)
+                elif isinstance(error, BrokenProcessPool):
+                    # Nothing can be retried on a dead pool; the checkpoint lets a rerun resume
+                    raise error
+                elif attempt <= max_retries:
+                    logger.warning(f"Batch {sequence} failed (attempt {attempt}), retrying: {error}")
+                    in_flight[pool.submit(_score_batch, batch)] = (sequence, position, batch, attempt + 1)
+                elif attempt == max_retries + 1 and len(batch) > 1:
+                    logger.warning(f"Batch {sequence} failed {attempt} times, scoring its sessions one by one: {error}")
+                    in_flight[pool.submit(_score_each, batch)] = (sequence, position, batch, attempt + 1)
+                else:
+                    logger.error(f"Skipping batch {sequence} of {len(batch)} sessions after {attempt} attempts: {error}")
+                    completed[sequence] = (position, [], [(session_id, f"error: {error}") for session_id, _ in batch])
+
+            # Commit the contiguous prefix so the checkpoint never skips a batch
+            while next_commit in completed:
+                position, results, skipped = completed.pop(next_commit)
+                output_size = writer.write(results, model_version)
+                skip_size = skip_log.write(skipped)
+                checkpoint.position = position
+                checkpoint.processed += len(results)
+                checkpoint.skipped += len(skipped)
+                checkpoint.output_size = output_size
+                checkpoint.skip_size = skip_size
+                checkpoint.save()
+                processed += len(results)
+                next_commit += 1
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                logger.info(f"{checkpoint.processed} sessions scored, {checkpoint.skipped} skipped, "
+                            f"{processed / (now - started):.0f} sessions/s, {len(in_flight)} batches in flight")
+                last_report = now
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Done: {processed} sessions in {elapsed:.1f}s "
+                f"({processed / elapsed if elapsed else 0.0:.0f} sessions/s), {checkpoint.processed} in total, "
+                f"{checkpoint.skipped} skipped")
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', choices=['jsonl', 'mongo'], required=True,
+                        help='mongo reads only sessions stored with PERSIST_TRANSCRIPTS=true (off by default)')
+    parser.add_argument('--input', help='JSONL export to read (--source jsonl)')
+    parser.add_argument('--output', help='JSONL file to write; defaults to updating MongoDB for --source mongo')
+    parser.add_argument('--collection', default='session_analyses')
+    parser.add_argument('--field', default='rescored_analysis', help='Field set on MongoDB documents')
+    parser.add_argument('--model-version', default=os.environ.get('PSYCH_MODEL_VARIANT') or 'full')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: derived from the source)')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+    parser.add_argument('--skip-log', help='JSONL list of skipped sessions (default: next to the checkpoint)')
+    parser.add_argument('--max-retries', type=int, default=2, help='Retries of a failed batch before skipping it')
+    parser.add_argument('--batch-size', type=int, default=512, help='Sessions per predict_proba batch')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-in-flight', type=int, help='Batches read ahead (default 2 per worker)')
+    parser.add_argument('--limit', type=int, help='Stop after about this many sessions')
+    parser.add_argument('--report-every', type=float, default=10.0, help='Seconds between progress lines')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    collection = None
+    if args.source == 'mongo' or not args.output:
+        from dotenv import load_dotenv
+        from pymongo import MongoClient
+
+        load_dotenv(Path(__file__).parent / '.env')
+        collection = MongoClient(os.environ['MONGO_URL'])[os.environ['DB_NAME']][args.collection]
+
+    if args.source == 'jsonl':
+        if not args.input:
+            parser.error('--input is required with --source jsonl')
+        source_id = f"jsonl:{Path(args.input).resolve()}"
+    else:
+        source_id = f"mongo:{os.environ['DB_NAME']}.{args.collection}"
+
+    name = args.collection if args.source == 'mongo' else Path(args.input).stem
+    checkpoint_path = Path(args.checkpoint or f"rescore-{args.source}-{name}.checkpoint.json")
+    checkpoint = Checkpoint(checkpoint_path, source_id)
+    checkpoint.load(restart=args.restart)
+    if checkpoint.processed:
+        logger.info(f"Resuming after {checkpoint.processed} sessions from {checkpoint_path}")
+
+    if args.source == 'jsonl':
+        reader = read_jsonl(args.input, checkpoint.position, args.batch_size)
+    else:
+        if collection.count_documents(TRANSCRIPT_QUERY, limit=1) == 0:
+            raise SystemExit(f"No session in {args.collection} has a stored transcript. Transcripts are only "
+                             f"persisted when the server runs with PERSIST_TRANSCRIPTS=true (off by default).")
+        reader = read_mongo(collection, checkpoint.position, args.batch_size)
+
+    skip_log_path = args.skip_log or checkpoint_path.with_suffix('.skipped.jsonl')
+    skip_log = SkipLog(skip_log_path, checkpoint.skip_size)
+    writer = JsonlWriter(args.output, checkpoint.output_size) if args.output else MongoWriter(collection, args.field)
+    try:
+        run(
+            reader,
+            writer,
+            skip_log,
+            checkpoint,
+            workers=args.workers,
+            max_in_flight=args.max_in_flight or 2 * args.workers,
+            model_version=args.model_version,
+            max_retries=args.max_retries,
+            report_every=args.report_every,
+            limit=args.limit
+        )
+    finally:
+        writer.close()
+        skip_log.close()
+
+
+if __name__ == '__main__':
+    main()
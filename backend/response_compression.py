@@ -0,0 +1,173 @@
+import os
+import zlib
+import logging
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is always available
+    brotli = None
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/plain', 'text/html', 'text/css', 'image/svg+xml'
+)
+
+RESPONSE_BYTES = registry.counter(
+    'psychmaster_response_bytes_total',
+    'Response body bytes before and after compression',
+    ('encoding', 'stage')
+)
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b'') -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding the client accepts: br if available, then gzip"""
+    accepted = set()
+    for item in accept_encoding.split(','):
+        token, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+class CompressionMiddleware:
+    """Compress response bodies with brotli or gzip.
+
+    Bodies of a compressible content type and at least
+    COMPRESSION_MINIMUM_SIZE bytes are compressed with the encoding
+    negotiated from Accept-Encoding (COMPRESSION_ENABLED=false turns this
+    off, e.g. behind a proxy that compresses). Streaming responses are
+    compressed chunk by chunk and flushed after each one so clients see data
+    as it is produced. Strong ETags are weakened on compressed responses,
+    since the bytes no longer match the identity body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+        self.minimum_size = int(os.environ.get('COMPRESSION_MINIMUM_SIZE', '1000'))
+        self.gzip_level = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+        self.brotli_quality = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+        if self.enabled and brotli is None:
+            logger.info("brotli is not installed, responses are compressed with gzip only")
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        await self.app(scope, receive, _CompressingSender(self, send, encoding))
+
+    def encoder(self, encoding: str):
+        if encoding == 'br':
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+
+class _CompressingSender:
+    """ASGI send wrapper holding back the response start until the first body chunk"""
+
+    def __init__(self, middleware: CompressionMiddleware, send, encoding: Optional[str]):
+        self.middleware = middleware
+        self.send = send
+        self.encoding = encoding
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message['type'] == 'http.response.start':
+            self.start_message = message
+            return
+        if message['type'] != 'http.response.body' or self.passthrough:
+            await self.send(message)
+            return
+        if self.encoder is None:
+            await self._start(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        compressed = self.encoder.chunk(body) if more_body else self.encoder.finish(body)
+        self._count(len(body), len(compressed))
+        await self.send({'type': 'http.response.body', 'body': compressed, 'more_body': more_body})
+
+    async def _start(self, message):
+        headers = MutableHeaders(scope=self.start_message)
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        compressible = (
+            self.start_message['status'] not in (204, 304)
+            and 'content-encoding' not in headers
+            and headers.get('content-type', '').split(';')[0].strip() in COMPRESSIBLE_TYPES
+        )
+        if compressible:
+            # Also on identity responses, so caches keep the variants apart
+            headers.add_vary_header('Accept-Encoding')
+        if not compressible or self.encoding is None or (not more_body and len(body) < self.middleware.minimum_size):
+            self.passthrough = True
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        self.encoder = self.middleware.encoder(self.encoding)
+        headers['Content-Encoding'] = self.encoding
+        etag = headers.get('etag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = f"W/{etag}"
+
+        if more_body:
+            del headers['Content-Length']
+            compressed = self.encoder.chunk(body)
+        else:
+            compressed = self.encoder.finish(body)
+            headers['Content-Length'] = str(len(compressed))
+        self._count(len(body), len(compressed))
+
+        await self.send(self.start_message)
+        await self.send({'type': 'http.response.body', 'body': compressed, 'more_body': more_body})
+
+    def _count(self, identity: int, compressed: int):
+        RESPONSE_BYTES.inc(identity, encoding=self.encoding, stage='identity')
+        RESPONSE_BYTES.inc(compressed, encoding=self.encoding, stage='compressed')
+
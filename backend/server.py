@@ -1,4 +1,7 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -8,8 +11,25 @@ from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
+import json
+import base64
+import hashlib
+import asyncio
+import binascii
 from datetime import datetime
 from langchain_service import mental_health_service
+from recommendation_system import recommendation_system
+from session_store import SessionWriteBehindQueue
+from inference_executor import inference_batcher
+from session_analytics import SessionRollups
+from metrics import registry as metrics_registry, PROMETHEUS_CONTENT_TYPE
+from request_profiling import RequestProfilingMiddleware, profiled
+from fast_json import FastJSONResponse, prevalidated_response
+from response_compression import CompressionMiddleware
+from chat_connection import ChatConnection, connection_limiter, CHAT_CONNECTION_SETTINGS, CLOSE_OVERLOADED
+from llm_scheduler import llm_scheduler
+from admission_control import admission_controller, client_identity, parse_trusted_proxies
+from crisis_detection import CRISIS_RESPONSE
 
 
 ROOT_DIR = Path(__file__).parent
@@ -20,8 +40,33 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
-# Create the main app without a prefix
-app = FastAPI()
+# Ended sessions are persisted in batches off the request path
+session_writer = SessionWriteBehindQueue(
+    db.session_analyses,
+    batch_size=int(os.environ.get('SESSION_WRITE_BATCH_SIZE', '100')),
+    flush_interval=float(os.environ.get('SESSION_WRITE_FLUSH_SECONDS', '0.5')),
+    spill_path=os.environ.get('SESSION_WRITE_SPILL_PATH', str(ROOT_DIR / 'session_spill.jsonl')) or None
+)
+
+# Hourly and daily analytics rollups, updated as sessions are persisted
+session_rollups = SessionRollups(db)
+session_writer.add_listener(session_rollups.record_sessions)
+
+# Seconds between checks of docs/ for changed knowledge base documents; 0 disables
+KNOWLEDGE_BASE_REFRESH_SECONDS = float(os.environ.get('KNOWLEDGE_BASE_REFRESH_SECONDS', '300'))
+knowledge_base_refresher = None
+
+def reset_after_fork():
+    """Recreate per-process clients in a worker forked from a preloading master (see gunicorn.conf.py)"""
+    global client, db
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ['DB_NAME']]
+    session_writer.collection = db.session_analyses
+    session_rollups.db = db
+    mental_health_service.reopen_after_fork()
+
+# Create the main app without a prefix; responses are rendered with orjson
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -70,6 +115,7 @@ class SessionEndResponse(BaseModel):
     session_id: str
     analysis: Optional[dict] = None
     recommendations: Optional[dict] = None
+    ranked_resources: Optional[List[dict]] = None
     session_summary: Optional[dict] = None
     error: Optional[str] = None
 
@@ -85,20 +131,118 @@ async def create_status_check(input: StatusCheckCreate):
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
+STATUS_PAGE_SIZE = 100
+STATUS_SORT = [('timestamp', 1), ('id', 1)]
+
+def _encode_status_cursor(status_check: dict) -> str:
+    """Opaque keyset cursor pointing just past a status check"""
+    key = [status_check['timestamp'].isoformat(), status_check['id']]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+def _status_query(cursor: Optional[str]) -> dict:
+    if not cursor:
+        return {}
+    try:
+        timestamp, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        timestamp = datetime.fromisoformat(timestamp)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {'$or': [
+        {'timestamp': {'$gt': timestamp}},
+        {'timestamp': timestamp, 'id': {'$gt': last_id}}
+    ]}
+
+def _status_projection(fields: Optional[str]) -> Optional[dict]:
+    if not fields:
+        return {'_id': 0}
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested - set(StatusCheck.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # The cursor needs the sort key, so id and timestamp are always returned
+    return {'_id': 0, 'id': 1, 'timestamp': 1, **{field: 1 for field in requested}}
+
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+async def get_status_checks(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = Query('json', pattern='^(json|ndjson)$')
+):
+    """List status checks oldest first, one keyset-paginated page at a time
+
+    The next page's cursor is returned in the X-Next-Cursor header. With
+    format=ndjson every remaining status check is streamed instead.
+    """
+    query = _status_query(cursor)
+    projection = _status_projection(fields)
+    
+    if format == 'ndjson':
+        status_cursor = db.status_checks.find(query, projection).sort(STATUS_SORT)
+        if limit:
+            status_cursor = status_cursor.limit(limit)
+        
+        async def export():
+            async for status_check in status_cursor:
+                yield json.dumps(jsonable_encoder(status_check)) + '\n'
+        
+        return StreamingResponse(export(), media_type='application/x-ndjson')
+    
+    page_size = limit or STATUS_PAGE_SIZE
+    status_checks = await db.status_checks.find(query, projection).sort(STATUS_SORT).limit(page_size + 1).to_list(page_size + 1)
+    
+    headers = {}
+    if len(status_checks) > page_size:
+        status_checks = status_checks[:page_size]
+        headers['X-Next-Cursor'] = _encode_status_cursor(status_checks[-1])
+    
+    if fields:
+        return JSONResponse(jsonable_encoder(status_checks), headers=headers)
+    
+    response.headers.update(headers)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+# Rate limiting and admission control (see admission_control.py)
+# Proxies (IPs or CIDRs) whose X-Forwarded-For hops are believed, e.g. the ingress network
+TRUSTED_PROXIES = parse_trusted_proxies(os.environ.get('TRUSTED_PROXIES'))
+
+def _client_key(connection) -> Optional[str]:
+    """Client identity for rate limiting, or None when a trusted proxy didn't say who the client is"""
+    return client_identity(
+        connection.client.host if connection.client else None,
+        connection.headers.get('x-forwarded-for'),
+        TRUSTED_PROXIES
+    )
+
+def _rejection(admission) -> HTTPException:
+    detail = "Too many messages, please slow down" if admission.status == 429 else "The service is busy, please retry shortly"
+    return HTTPException(status_code=admission.status, detail=detail, headers={'Retry-After': admission.retry_after_header})
+
 # Chat endpoints
 @api_router.post("/chat", response_model=ChatResponse)
-async def chat_with_ai(request: ChatRequest):
+async def chat_with_ai(request: ChatRequest, http_request: Request):
     """Send a message to the AI and get a response"""
+    admission = admission_controller.admit(request.message, request.session_id, _client_key(http_request))
+    if admission.crisis:
+        # Over the limits, but a crisis is always answered, without the LLM
+        session_id = mental_health_service.open_session(request.session_id)
+        mental_health_service.record_crisis(session_id)
+        return ChatResponse(response=CRISIS_RESPONSE, session_id=session_id, is_crisis=True)
+    if not admission.admitted:
+        raise _rejection(admission)
+    
     try:
-        result = mental_health_service.get_response(
+        # Retrieval and the LLM call block, so run them off the event loop;
+        # the wait for an LLM slot in between holds no thread
+        result = await run_in_threadpool(
+            profiled(mental_health_service.begin_turn),
             message=request.message,
             session_id=request.session_id
         )
+        if result.get('pending'):
+            async with llm_scheduler.slot_async(result['priority']):
+                result = await run_in_threadpool(profiled(mental_health_service.finish_turn), result)
         
         return ChatResponse(
             response=result['response'],
@@ -108,10 +252,38 @@ async def chat_with_ai(request: ChatRequest):
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error during chat processing")
+    finally:
+        admission_controller.release()
+
+@api_router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """Chat over a WebSocket bound to one session, with streamed tokens and live risk updates"""
+    if not connection_limiter.try_acquire():
+        await websocket.close(code=CLOSE_OVERLOADED)
+        return
+    try:
+        connection = ChatConnection(
+            websocket,
+            mental_health_service,
+            admission=admission_controller,
+            client=_client_key(websocket),
+            **CHAT_CONNECTION_SETTINGS
+        )
+        await connection.run(session_id)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Chat WebSocket error: {str(e)}")
+    finally:
+        connection_limiter.release()
 
 @api_router.post("/chat/session", response_model=SessionResponse)
-async def manage_session(request: SessionRequest):
+async def manage_session(request: SessionRequest, http_request: Request):
     """Create or manage chat sessions"""
+    admission = admission_controller.allow_client(_client_key(http_request))
+    if not admission.admitted:
+        raise _rejection(admission)
+    
     try:
         if request.action == "create":
             session_id = mental_health_service.create_session()
@@ -126,12 +298,20 @@ async def manage_session(request: SessionRequest):
 async def end_chat_session(request: EndSessionRequest):
     """End a chat session and perform psychological analysis"""
     try:
-        result = mental_health_service.end_session(request.session_id)
+        # Concurrent end-session requests share one batched classifier call
+        messages = mental_health_service.get_session_messages(request.session_id)
+        analysis_result = await inference_batcher.analyze(messages, request.session_id) if messages else None
+        result = mental_health_service.end_session(request.session_id, analysis_result=analysis_result)
         
         if not result.get('success'):
             raise HTTPException(status_code=400, detail=result.get('error', 'Failed to end session'))
         
-        return SessionEndResponse(**result)
+        record = mental_health_service.get_session_record(request.session_id)
+        if record:
+            session_writer.enqueue(record)
+        
+        # The service built this payload, so skip response validation and jsonable_encoder
+        return prevalidated_response(SessionEndResponse, result)
         
     except HTTPException:
         raise
@@ -140,15 +320,33 @@ async def end_chat_session(request: EndSessionRequest):
         raise HTTPException(status_code=500, detail="Internal server error during session analysis")
 
 @api_router.get("/chat/session/{session_id}")
-async def get_session_info(session_id: str):
-    """Get session information and analysis if available"""
+async def get_session_info(session_id: str, if_none_match: Optional[str] = Header(None)):
+    """Get session information and analysis if available
+
+    Responses carry an ETag hashed from the response body, so polling
+    clients get 304 Not Modified until the session changes, whichever
+    worker answers and across restarts.
+    """
     try:
         session_data = mental_health_service.get_session_data(session_id)
         
         if 'error' in session_data:
-            raise HTTPException(status_code=404, detail=session_data['error'])
+            # Sessions from before a restart are served from MongoDB
+            record = session_writer.get_pending(session_id) or await db.session_analyses.find_one(
+                {'session_id': session_id},
+                {'_id': 0, 'messages': 0}
+            )
+            if not record:
+                raise HTTPException(status_code=404, detail=session_data['error'])
+            session_data = _stored_session_data(record)
+        
+        response = FastJSONResponse(session_data)
+        headers = _session_cache_headers(response.body)
+        if _etag_matches(if_none_match, headers['ETag']):
+            return Response(status_code=304, headers=headers)
         
-        return session_data
+        response.headers.update(headers)
+        return response
         
     except HTTPException:
         raise
@@ -156,18 +354,116 @@ async def get_session_info(session_id: str):
         logger.error(f"Get session error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error retrieving session data")
 
+def _session_cache_headers(body: bytes) -> dict:
+    """ETag and Cache-Control for a session; session data is per user, so never shared caches.
+    
+    Always revalidated: an ended session still takes new messages, so its body can change.
+    """
+    return {
+        'ETag': f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+        'Cache-Control': 'private, no-cache'
+    }
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in tags)
+
+def _stored_session_data(record: dict) -> dict:
+    """Shape a persisted session like MentalHealthChatService.get_session_data"""
+    ended_at = record.get('ended_at')
+    return {
+        'created_at': record.get('created_at'),
+        'active': False,
+        'ended_at': ended_at.isoformat() if isinstance(ended_at, datetime) else ended_at,
+        'analysis': record.get('analysis'),
+        'recommendations': record.get('recommendations'),
+        'ranked_resources': record.get('ranked_resources'),
+        'message_count': record.get('message_count', 0)
+    }
+
+# Analytics endpoints, served from pre-aggregated rollups
+GRANULARITY_PATTERN = '^(hour|day)$'
+
+@api_router.get("/analytics/state-distribution")
+async def get_state_distribution(
+    granularity: str = Query('day', pattern=GRANULARITY_PATTERN),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Distribution of predicted states per bucket and over the whole window"""
+    buckets = await session_rollups.get_buckets(granularity, start, end)
+    return {
+        'granularity': granularity,
+        'totals': SessionRollups.merge_counts(buckets, 'states'),
+        'buckets': [
+            {'bucket': bucket['bucket'], 'sessions': bucket.get('sessions', 0), 'states': bucket.get('states', {})}
+            for bucket in buckets
+        ]
+    }
+
+@api_router.get("/analytics/risk-levels")
+async def get_risk_levels(
+    granularity: str = Query('hour', pattern=GRANULARITY_PATTERN),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Risk level counts over time"""
+    buckets = await session_rollups.get_buckets(granularity, start, end)
+    return {
+        'granularity': granularity,
+        'totals': SessionRollups.merge_counts(buckets, 'risk_levels'),
+        'buckets': [
+            {'bucket': bucket['bucket'], 'sessions': bucket.get('sessions', 0), 'risk_levels': bucket.get('risk_levels', {})}
+            for bucket in buckets
+        ]
+    }
+
+@api_router.get("/analytics/messages")
+async def get_message_statistics(
+    granularity: str = Query('day', pattern=GRANULARITY_PATTERN),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Average total_messages per session, per bucket and over the whole window"""
+    buckets = await session_rollups.get_buckets(granularity, start, end)
+    sessions = sum(bucket.get('sessions', 0) for bucket in buckets)
+    total_messages = sum(bucket.get('total_messages', 0) for bucket in buckets)
+    return {
+        'granularity': granularity,
+        'sessions': sessions,
+        'avg_total_messages': total_messages / sessions if sessions else 0,
+        'buckets': [
+            {
+                'bucket': bucket['bucket'],
+                'sessions': bucket.get('sessions', 0),
+                'avg_total_messages': bucket.get('total_messages', 0) / bucket['sessions'] if bucket.get('sessions') else 0,
+                'avg_user_messages': bucket.get('user_messages', 0) / bucket['sessions'] if bucket.get('sessions') else 0
+            }
+            for bucket in buckets
+        ]
+    }
+
 @api_router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "service": "psychMASTER API",
-        "langchain_initialized": mental_health_service.qa_chain is not None
+        "langchain_initialized": mental_health_service.qa_chain is not None,
+        "recommendation_catalog_version": recommendation_system.catalog.version
     }
 
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics for the chat and end-session pipelines"""
+    return PlainTextResponse(metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -176,6 +472,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large JSON bodies such as session recommendations
+app.add_middleware(CompressionMiddleware)
+
+# Opt-in sampling profiler for hot-path analysis (see request_profiling.py)
+app.add_middleware(RequestProfilingMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -183,6 +485,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_session_writer():
+    try:
+        await db.session_analyses.create_index('session_id', unique=True)
+        await db.status_checks.create_index(STATUS_SORT)
+        await session_rollups.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Failed to create indexes: {str(e)}")
+    session_writer.start()
+    inference_batcher.start()
+    global knowledge_base_refresher
+    if KNOWLEDGE_BASE_REFRESH_SECONDS > 0:
+        knowledge_base_refresher = asyncio.create_task(refresh_knowledge_base_periodically())
+
+async def refresh_knowledge_base_periodically():
+    """Pick up added, changed or removed documents in docs/ without a restart"""
+    while True:
+        await asyncio.sleep(KNOWLEDGE_BASE_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(mental_health_service.refresh_knowledge_base)
+        except Exception as e:
+            logger.error(f"Knowledge base refresh failed: {str(e)}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if knowledge_base_refresher:
+        knowledge_base_refresher.cancel()
+    await inference_batcher.stop()
+    await session_writer.stop()
     client.close()
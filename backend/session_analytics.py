@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {
+    'hour': 'session_rollups_hourly',
+    'day': 'session_rollups_daily'
+}
+
+DEFAULT_WINDOWS = {
+    'hour': timedelta(hours=24),
+    'day': timedelta(days=30)
+}
+
+MAX_BUCKETS = 2000
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its hour or day"""
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class SessionRollups:
+    """Per-hour and per-day session counters maintained as sessions are persisted.
+
+    Every rollup document holds the number of sessions in its bucket, the
+    message totals and a count per predicted state and risk level, so
+    dashboards read at most one small document per bucket instead of
+    scanning raw sessions.
+
+    A failed update is retried up to ``max_retries`` times; increments that
+    still fail are kept and folded into the next batch rather than lost.
+    """
+
+    def __init__(self, db, max_retries: int = 3):
+        self.db = db
+        self.max_retries = max_retries
+        self._unapplied: Dict[str, Dict[datetime, Dict[str, int]]] = {
+            collection: {} for collection in GRANULARITIES.values()
+        }
+
+    async def ensure_indexes(self):
+        for collection in GRANULARITIES.values():
+            await self.db[collection].create_index([('bucket', ASCENDING)], unique=True)
+
+    @staticmethod
+    def _increments(records: List[Dict], granularity: str) -> Dict[datetime, Dict[str, int]]:
+        """Sum the counters of a batch per bucket so each bucket gets one update"""
+        buckets: Dict[datetime, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for record in records:
+            ended_at = record.get('ended_at')
+            if not isinstance(ended_at, datetime):
+                continue
+            analysis = record.get('analysis') or {}
+            counters = buckets[bucket_start(ended_at, granularity)]
+            counters['sessions'] += 1
+            counters['total_messages'] += record.get('message_count', 0)
+            counters['user_messages'] += record.get('user_message_count', 0)
+            counters[f"states.{analysis.get('predicted_state', 'Unknown')}"] += 1
+            counters[f"risk_levels.{analysis.get('risk_level', 'unknown')}"] += 1
+        return buckets
+
+    @staticmethod
+    def _merge(buckets: Dict[datetime, Dict[str, int]], bucket: datetime, counters: Dict[str, int]):
+        merged = buckets.setdefault(bucket, defaultdict(int))
+        for field, count in counters.items():
+            merged[field] += count
+
+    async def record_sessions(self, records: List[Dict]):
+        """Fold newly persisted sessions into the hourly and daily rollups"""
+        for granularity, collection in GRANULARITIES.items():
+            buckets, self._unapplied[collection] = self._unapplied[collection], {}
+            for bucket, counters in self._increments(records, granularity).items():
+                self._merge(buckets, bucket, counters)
+            if buckets:
+                await self._apply(collection, buckets)
+
+    async def _apply(self, collection: str, buckets: Dict[datetime, Dict[str, int]]):
+        # $inc isn't idempotent, so only updates reported as failed are retried
+        remaining = list(buckets.items())
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await self.db[collection].bulk_write([
+                    UpdateOne({'bucket': bucket}, {'$inc': dict(counters)}, upsert=True)
+                    for bucket, counters in remaining
+                ], ordered=False)
+                return
+            except BulkWriteError as e:
+                # Includes duplicate keys from two workers upserting a new bucket at once
+                failed = {error['index'] for error in e.details.get('writeErrors', [])}
+                remaining = [item for i, item in enumerate(remaining) if i in failed]
+                if not remaining:
+                    return
+                logger.error(f"Failed to update {len(remaining)} {collection} buckets "
+                             f"(attempt {attempt}/{self.max_retries}): {e.details['writeErrors'][0].get('errmsg')}")
+            except Exception as e:
+                logger.error(f"Error updating {collection} (attempt {attempt}/{self.max_retries}): {str(e)}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(0.5 * attempt)
+
+        logger.error(f"Keeping {len(remaining)} {collection} bucket increments for the next batch")
+        for bucket, counters in remaining:
+            self._merge(self._unapplied[collection], bucket, counters)
+
+    async def get_buckets(
+        self,
+        granularity: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[Dict]:
+        """Return rollup documents in [start, end), oldest first"""
+        end = end or datetime.utcnow()
+        start = start or end - DEFAULT_WINDOWS[granularity]
+        cursor = self.db[GRANULARITIES[granularity]].find(
+            {'bucket': {'$gte': bucket_start(start, granularity), '$lt': end}},
+            {'_id': 0}
+        ).sort('bucket', ASCENDING).limit(MAX_BUCKETS)
+        return await cursor.to_list(MAX_BUCKETS)
+
+    @staticmethod
+    def merge_counts(buckets: List[Dict], field: str) -> Dict[str, int]:
+        """Total a nested counter such as states or risk_levels over buckets"""
+        totals: Dict[str, int] = defaultdict(int)
+        for bucket in buckets:
+            for key, count in (bucket.get(field) or {}).items():
+                totals[key] += count
+        return dict(totals)
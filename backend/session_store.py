@@ -0,0 +1,239 @@
+import os
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+SESSION_WRITES = registry.counter(
+    'psychmaster_session_writes_total',
+    'Ended sessions inserted, spilled to the local spill file, or dropped by the write-behind queue',
+    ('outcome',)
+)
+
+
+class SessionWriteBehindQueue:
+    """Write-behind queue that persists ended sessions with batched insert_many.
+
+    Requests only enqueue a document; a background task drains the queue in
+    batches of up to ``batch_size`` documents, waiting at most
+    ``flush_interval`` seconds for a batch to fill. Documents stay readable
+    through ``get_pending`` until their batch has been written.
+
+    Documents that can't be written after ``max_retries`` attempts, or that
+    the queue has no room for, are appended to ``spill_path`` as extended
+    JSON and replayed when the queue next starts. Spills run on the default
+    executor so the fsync never blocks the event loop. Only a document that
+    can't be spilled either is dropped, and counted as such.
+    """
+
+    def __init__(
+        self,
+        collection,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_queue_size: int = 10000,
+        max_retries: int = 3,
+        spill_path: Optional[str] = None
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: Dict[str, Dict] = {}
+        self._listeners: List[Callable[[List[Dict]], Awaitable[None]]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._spills: Set[asyncio.Future] = set()
+        # Spills from different executor threads append to the same file
+        self._spill_lock = threading.Lock()
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue else 0
+
+    def add_listener(self, callback: Callable[[List[Dict]], Awaitable[None]]):
+        """Register a coroutine called with every batch of newly inserted documents"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self._task:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, document: Dict) -> bool:
+        """Queue a document for persistence without waiting for the database"""
+        if self.queue is None:
+            logger.error("Session write queue is not running, spilling session %s", document.get('session_id'))
+            self._spill_in_background([document])
+            return False
+        try:
+            self.queue.put_nowait(document)
+        except asyncio.QueueFull:
+            logger.error("Session write queue full, spilling session %s", document.get('session_id'))
+            self._spill_in_background([document])
+            return False
+        self.pending[document['session_id']] = document
+        return True
+
+    def _spill_in_background(self, documents: List[Dict]):
+        """Spill documents on the default executor, or inline when no event loop is running"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._spill(documents)
+            return
+        future = loop.run_in_executor(None, self._spill, documents)
+        self._spills.add(future)
+        future.add_done_callback(self._spills.discard)
+
+    def _spill(self, documents: List[Dict]):
+        """Append documents that couldn't be written to the spill file"""
+        if not documents:
+            return
+        if self.spill_path is None:
+            logger.error(f"No session spill file configured, dropping {len(documents)} sessions")
+            SESSION_WRITES.inc(len(documents), outcome='dropped')
+            return
+        try:
+            with self._spill_lock, open(self.spill_path, 'a', encoding='utf-8') as f:
+                for document in documents:
+                    f.write(json_util.dumps(document) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            SESSION_WRITES.inc(len(documents), outcome='spilled')
+        except Exception as e:
+            logger.error(f"Failed to spill {len(documents)} sessions to {self.spill_path}: {str(e)}")
+            SESSION_WRITES.inc(len(documents), outcome='dropped')
+
+    def _take_spilled(self) -> List[Dict]:
+        """Read and remove the spill file left by an earlier run"""
+        if self.spill_path is None or not self.spill_path.exists():
+            return []
+        replay_path = self.spill_path.with_suffix(self.spill_path.suffix + '.replay')
+        # Renamed first, so documents spilled during the replay go to a fresh file
+        try:
+            os.replace(self.spill_path, replay_path)
+        except FileNotFoundError:
+            # Another worker sharing the file got to it first
+            return []
+        documents = []
+        with open(replay_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    documents.append(json_util.loads(line))
+        replay_path.unlink()
+        return documents
+
+    async def _replay_spilled(self):
+        try:
+            documents = await asyncio.get_running_loop().run_in_executor(None, self._take_spilled)
+        except Exception as e:
+            logger.error(f"Failed to read session spill file {self.spill_path}: {str(e)}")
+            return
+        if documents:
+            logger.info(f"Replaying {len(documents)} spilled sessions")
+        for start in range(0, len(documents), self.batch_size):
+            await self._write(documents[start:start + self.batch_size])
+
+    def get_pending(self, session_id: str) -> Optional[Dict]:
+        """Return a queued document that has not been written yet"""
+        return self.pending.get(session_id)
+
+    async def _next_batch(self) -> List[Dict]:
+        try:
+            first = await asyncio.wait_for(self.queue.get(), timeout=self.flush_interval)
+        except asyncio.TimeoutError:
+            return []
+
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0 or self._stopping:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, batch: List[Dict]):
+        inserted = []
+        # Only documents still in this list are spilled when the attempts run out
+        remaining = batch
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                # Insert copies so the pending documents never gain an _id
+                await self.collection.insert_many([dict(document) for document in remaining], ordered=False)
+                inserted.extend(remaining)
+                remaining = []
+                break
+            except BulkWriteError as e:
+                write_errors = e.details.get('writeErrors', [])
+                # A session ended twice is already stored; anything else is a real failure
+                failed = {error['index'] for error in write_errors if error.get('code') != DUPLICATE_KEY_ERROR}
+                duplicates = {error['index'] for error in write_errors} - failed
+                inserted.extend(document for i, document in enumerate(remaining) if i not in failed | duplicates)
+                if failed:
+                    logger.error(f"Failed to persist {len(failed)} sessions "
+                                 f"(attempt {attempt}/{self.max_retries}): {write_errors[0].get('errmsg')}")
+                remaining = [document for i, document in enumerate(remaining) if i in failed]
+                if not remaining:
+                    break
+            except Exception as e:
+                logger.error(f"Error persisting session batch (attempt {attempt}/{self.max_retries}): {str(e)}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(0.5 * attempt)
+
+        if inserted:
+            SESSION_WRITES.inc(len(inserted), outcome='inserted')
+        if remaining:
+            await asyncio.get_running_loop().run_in_executor(None, self._spill, remaining)
+
+        if inserted:
+            for callback in self._listeners:
+                try:
+                    await callback(inserted)
+                except Exception as e:
+                    logger.error(f"Error in session write listener: {str(e)}")
+
+        for document in batch:
+            if self.pending.get(document['session_id']) is document:
+                del self.pending[document['session_id']]
+
+    async def _run(self):
+        await self._replay_spilled()
+        while not (self._stopping and self.queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    async def stop(self):
+        """Flush every queued document, wait for pending spills and stop the background task"""
+        if self._task:
+            self._stopping = True
+            await self._task
+            self._task = None
+        if self._spills:
+            await asyncio.gather(*self._spills)
+        logger.info("Session write queue flushed")
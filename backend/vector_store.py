@@ -0,0 +1,297 @@
+import os
+import copy
+import json
+import uuid
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+DOCUMENTS_FILE = "documents.json"
+
+
+class ExactIndex:
+    """Brute-force cosine search with a single matrix-vector product"""
+
+    def __init__(self):
+        self.matrix = None
+
+    def build(self, matrix: np.ndarray):
+        self.matrix = matrix
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.matrix is None or len(self.matrix) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+
+        # argpartition keeps this O(n) instead of a full sort of the corpus
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+
+class HnswIndex:
+    """Approximate search backed by hnswlib (installed alongside chromadb)"""
+
+    def __init__(self, ef_construction: int = 200, m: int = 16, ef_search: int = 50):
+        self.ef_construction = ef_construction
+        self.m = m
+        self.ef_search = ef_search
+        self.index = None
+
+    def build(self, matrix: np.ndarray):
+        import hnswlib
+
+        if len(matrix) == 0:
+            self.index = None
+            return
+
+        self.index = hnswlib.Index(space='ip', dim=matrix.shape[1])
+        self.index.init_index(max_elements=len(matrix), ef_construction=self.ef_construction, M=self.m)
+        self.index.add_items(np.asarray(matrix), np.arange(len(matrix)))
+        self.index.set_ef(max(self.ef_search, 1))
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.index is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        k = min(k, self.index.get_current_count())
+        labels, distances = self.index.knn_query(query, k=k)
+        # hnswlib 'ip' space reports 1 - dot product
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+
+VECTOR_INDEXES = {
+    'exact': ExactIndex,
+    'hnsw': HnswIndex,
+}
+
+
+def get_vector_index(name: Optional[str] = None):
+    """Create the vector index configured by VECTOR_INDEX (exact or hnsw)"""
+    name = (name or os.environ.get('VECTOR_INDEX', 'exact')).lower()
+    if name not in VECTOR_INDEXES:
+        raise ValueError(f"Unknown vector index '{name}', expected one of {sorted(VECTOR_INDEXES)}")
+    return VECTOR_INDEXES[name]()
+
+
+class NumpyVectorStore(VectorStore):
+    """In-memory vector store for small corpora.
+
+    All chunk embeddings live in one contiguous, L2-normalized float32 matrix
+    that is memory-mapped from ``embeddings.npy``; chunk text and metadata are
+    kept in ``documents.json`` next to it. Queries are answered by the
+    configured index (exact dot product by default).
+    """
+
+    def __init__(
+        self,
+        embedding_function: Embeddings,
+        persist_directory: Optional[str] = None,
+        index=None,
+    ):
+        self.embedding_function = embedding_function
+        self.persist_directory = Path(persist_directory) if persist_directory else None
+        self.index = index or get_vector_index()
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    def copy(self) -> "NumpyVectorStore":
+        """Independent store over the same vectors; changes to it leave this one untouched"""
+        store = NumpyVectorStore(
+            self.embedding_function,
+            persist_directory=str(self.persist_directory) if self.persist_directory else None,
+            index=copy.copy(self.index)
+        )
+        store.matrix = self.matrix
+        store.ids = list(self.ids)
+        store.texts = list(self.texts)
+        store.metadatas = list(self.metadatas)
+        store.index.build(store.matrix)
+        return store
+
+    @staticmethod
+    def exists(persist_directory: str) -> bool:
+        """Check whether a persisted store exists in the directory"""
+        path = Path(persist_directory)
+        return (path / EMBEDDINGS_FILE).exists() and (path / DOCUMENTS_FILE).exists()
+
+    @classmethod
+    def load(cls, persist_directory: str, embedding_function: Embeddings, index=None) -> "NumpyVectorStore":
+        """Open a persisted store, memory-mapping the embedding matrix"""
+        store = cls(embedding_function, persist_directory=persist_directory, index=index)
+        store._load()
+        return store
+
+    def _load(self):
+        with open(self.persist_directory / DOCUMENTS_FILE, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+
+        self.ids = [record['id'] for record in records]
+        self.texts = [record['page_content'] for record in records]
+        self.metadatas = [record.get('metadata', {}) for record in records]
+        self.matrix = np.load(self.persist_directory / EMBEDDINGS_FILE, mmap_mode='r')
+        self.index.build(self.matrix)
+
+        logger.info(f"Loaded {len(self.ids)} vectors from {self.persist_directory}")
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: Iterable[List[float]],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Add precomputed embeddings without calling the embedding model"""
+        vectors = self._normalize(np.asarray(list(embeddings), dtype=np.float32))
+        if len(vectors) != len(texts):
+            raise ValueError("Number of embeddings does not match number of texts")
+
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+
+        if len(self.matrix) == 0:
+            self.matrix = vectors
+        else:
+            self.matrix = np.ascontiguousarray(np.vstack([self.matrix, vectors]))
+
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self.index.build(self.matrix)
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        embeddings = self.embedding_function.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+
+        to_delete = set(ids)
+        keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in to_delete]
+        if len(keep) == len(self.ids):
+            return False
+
+        self.matrix = np.ascontiguousarray(self.matrix[keep], dtype=np.float32)
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self.index.build(self.matrix)
+        return True
+
+    def get(self) -> Dict[str, List]:
+        """Return all stored chunks in the same shape as Chroma.get()"""
+        return {
+            'ids': list(self.ids),
+            'documents': list(self.texts),
+            'metadatas': list(self.metadatas),
+        }
+
+    def persist(self):
+        """Write the matrix and documents to disk and re-open the matrix as a memory map"""
+        if not self.persist_directory:
+            return
+
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        matrix_path = self.persist_directory / EMBEDDINGS_FILE
+        documents_path = self.persist_directory / DOCUMENTS_FILE
+
+        # Write to temporary files first so a crash never leaves a torn store;
+        # per-process names keep workers refreshing at the same time apart
+        tmp_matrix = matrix_path.with_suffix(f'.{os.getpid()}.tmp.npy')
+        np.save(tmp_matrix, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        tmp_documents = documents_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_documents, 'w', encoding='utf-8') as f:
+            json.dump([
+                {'id': doc_id, 'page_content': text, 'metadata': metadata}
+                for doc_id, text, metadata in zip(self.ids, self.texts, self.metadatas)
+            ], f)
+
+        os.replace(tmp_matrix, matrix_path)
+        os.replace(tmp_documents, documents_path)
+
+        self.matrix = np.load(matrix_path, mmap_mode='r')
+        self.index.build(self.matrix)
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return the k most similar chunks with their cosine similarity"""
+        query = self._normalize(embedding)[0]
+        indices, scores = self.index.search(query, k)
+        return [
+            (
+                Document(id=self.ids[i], page_content=self.texts[i], metadata=self.metadatas[i]),
+                float(score)
+            )
+            for i, score in zip(indices, scores)
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are already cosine similarities in [-1, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        persist_directory: Optional[str] = None,
+        index=None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding, persist_directory=persist_directory, index=index)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        if persist_directory:
+            store.persist()
+        return store
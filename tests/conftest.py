@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other as top-level modules
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope='session')
+def analyzer():
+    """A fresh analyzer with the trained classifier from backend/models, in trajectory mode"""
+    cwd = os.getcwd()
+    # The analyzer finds its model files relative to the working directory
+    os.chdir(BACKEND_DIR)
+    try:
+        from psychological_analysis import PsychologicalAnalyzer
+        analyzer = PsychologicalAnalyzer()
+    finally:
+        os.chdir(cwd)
+    if not analyzer.model:
+        pytest.skip("Trained classifier not available")
+    analyzer.analysis_mode = 'trajectory'
+    return analyzer
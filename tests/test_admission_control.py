@@ -0,0 +1,76 @@
+from admission_control import AdmissionController, client_identity, parse_trusted_proxies
+
+PROXIES = parse_trusted_proxies('10.0.0.0/8,127.0.0.1')
+
+
+class StubDetector:
+    """Keyword tier flags messages containing 'crisis'; the full cascade must not run"""
+
+    def detect_keyword(self, message):
+        return 'keyword' if 'crisis' in message else None
+
+    def detect(self, message, embeddings=None):
+        raise AssertionError('admission must not run the classifier tiers')
+
+
+def _controller(**kwargs):
+    settings = dict(session_rate=0.001, session_burst=100, client_rate=0.001, client_burst=100,
+                    max_in_flight=100, detector=StubDetector())
+    settings.update(kwargs)
+    return AdmissionController(**settings)
+
+
+def test_client_identity_takes_right_most_untrusted_hop():
+    # The client wrote the first hop itself; the ingress appended the real address
+    assert client_identity('10.0.0.5', '6.6.6.6, 203.0.113.7, 10.0.0.9', PROXIES) == '203.0.113.7'
+    assert client_identity('198.51.100.4', '6.6.6.6', PROXIES) == '198.51.100.4'
+    # A trusted peer that doesn't name a client has no identity
+    assert client_identity('10.0.0.5', None, PROXIES) is None
+    assert client_identity('10.0.0.5', '10.0.0.9', PROXIES) is None
+    assert client_identity('10.0.0.5', 'not-an-ip', PROXIES) is None
+    assert parse_trusted_proxies('10.0.0.0/8, bogus,') == parse_trusted_proxies('10.0.0.0/8')
+
+
+def test_forwarded_clients_are_limited_independently():
+    controller = _controller(client_burst=2)
+    first = client_identity('127.0.0.1', '203.0.113.1', PROXIES)
+    second = client_identity('127.0.0.1', '203.0.113.2', PROXIES)
+
+    assert [controller.admit('hi', None, first).admitted for _ in range(3)] == [True, True, False]
+    assert [controller.admit('hi', None, second).admitted for _ in range(2)] == [True, True]
+    rejected = controller.admit('hi', None, first)
+    assert (rejected.status, rejected.reason) == (429, 'rate_limited_client')
+    assert rejected.retry_after > 0
+
+
+def test_requests_without_identity_skip_the_client_bucket():
+    controller = _controller(client_burst=1)
+    assert all(controller.admit('hi', None, None).admitted for _ in range(5))
+    assert controller.allow_client(None).admitted
+
+
+def test_session_limit_and_overload_refund_the_other_buckets():
+    controller = _controller(session_burst=1, max_in_flight=1)
+    assert controller.admit('hi', 'a', 'client').admitted
+
+    limited = controller.admit('hi', 'a', 'client')
+    assert (limited.status, limited.reason) == (429, 'rate_limited_session')
+
+    overloaded = controller.admit('hi', 'b', 'client')
+    assert (overloaded.status, overloaded.reason) == (503, 'overloaded')
+    assert overloaded.retry_after_header == '2'
+
+    # The overloaded turn took no tokens, so session b goes through once a slot frees up
+    controller.release()
+    assert controller.in_flight == 0
+    assert controller.admit('hi', 'b', 'client').admitted
+    assert controller.in_flight == 1
+
+
+def test_crisis_is_answered_when_over_the_limits():
+    controller = _controller(max_in_flight=0)
+    decision = controller.admit('this is a crisis', 'a', 'client')
+    assert decision.crisis and not decision.admitted
+    assert decision.reason == 'crisis_bypass'
+    assert controller.in_flight == 0
+    assert not controller.admit('just chatting', 'a', 'client').crisis
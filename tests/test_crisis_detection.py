@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from crisis_detection import CRISIS_EXEMPLARS, CrisisDetector
+
+
+class StubLabelEncoder:
+    classes_ = np.array(['Anxiety', 'Normal', 'Suicidal'])
+
+    def transform(self, labels):
+        return np.array([list(self.classes_).index(label) for label in labels])
+
+
+class StubModel:
+    """Gives every message the same Suicidal probability"""
+
+    classes_ = np.array([0, 1, 2])
+
+    def __init__(self, suicidal):
+        self.suicidal = suicidal
+        self.calls = 0
+
+    def predict_proba(self, rows):
+        self.calls += 1
+        rest = (1.0 - self.suicidal) / 2
+        return np.array([[rest, rest, self.suicidal]] * len(rows))
+
+
+class StubVectorizer:
+    def transform(self, texts):
+        return texts
+
+
+class StubAnalyzer:
+    def __init__(self, suicidal):
+        self.model = StubModel(suicidal)
+        self.vectorizer = StubVectorizer()
+        self.label_encoder = StubLabelEncoder()
+
+    @staticmethod
+    def preprocess_text(text):
+        return text.lower().strip()
+
+
+class StubEmbeddings:
+    """Exemplars embed to one axis; other messages to a vector with the given cosine to it"""
+
+    def __init__(self, similarity):
+        self.similarity = similarity
+
+    def embed_documents(self, texts):
+        return [
+            [1.0, 0.0] if text in CRISIS_EXEMPLARS else [self.similarity, np.sqrt(1 - self.similarity ** 2)]
+            for text in texts
+        ]
+
+
+@pytest.mark.parametrize('message', [
+    'I want to kill myself',
+    'sometimes I think about SUICIDE',
+    'I want  to-die',
+    'everyone would be better off dead without me',
+])
+def test_keyword_hits_skip_the_classifier(message):
+    analyzer = StubAnalyzer(suicidal=0.0)
+    assert CrisisDetector(analyzer).detect(message) == 'keyword'
+    assert analyzer.model.calls == 0
+
+
+@pytest.mark.parametrize('suicidal, expected', [(0.7, 'classifier'), (0.95, 'classifier'), (0.6999, None)])
+def test_classifier_flags_at_the_threshold(suicidal, expected):
+    detector = CrisisDetector(StubAnalyzer(suicidal), classifier_threshold=0.7)
+    assert detector.detect('nothing matters and I am so tired of everything') == expected
+
+
+def test_classifier_clear_exit_skips_the_exemplars():
+    detector = CrisisDetector(StubAnalyzer(0.05), classifier_clear=0.1, embedding_check=True)
+    assert detector.detect("I'm thinking about ending it all", embeddings=StubEmbeddings(0.99)) is None
+
+
+@pytest.mark.parametrize('similarity, expected', [(0.9, 'embedding'), (0.5, None)])
+def test_exemplar_tier_decides_what_the_classifier_left_open(similarity, expected):
+    detector = CrisisDetector(StubAnalyzer(0.2), embedding_check=True, embedding_threshold=0.75)
+    assert detector.detect("I keep thinking about how to make it stop", embeddings=StubEmbeddings(similarity)) == expected
+    # Without embeddings the exemplar tier is skipped
+    assert detector.detect("I keep thinking about how to make it stop") is None
+
+
+def test_classifier_without_model_falls_through():
+    analyzer = StubAnalyzer(0.99)
+    analyzer.model = None
+    assert CrisisDetector(analyzer).detect('nothing matters anymore') is None
+
+
+@pytest.mark.parametrize('message', [
+    'I had a great day at the park with my friends',
+    'work has been stressful but I am managing',
+    'can you recommend a good book about mindfulness?',
+    'this deadline is killing me, haha',
+])
+def test_benign_text_does_not_escalate(analyzer, message):
+    assert CrisisDetector(analyzer).detect(message) is None
+
+
+def test_keyword_only_check_never_runs_the_model():
+    analyzer = StubAnalyzer(suicidal=0.99)
+    detector = CrisisDetector(analyzer)
+    assert detector.detect_keyword('I want to end my life') == 'keyword'
+    assert detector.detect_keyword('nothing matters anymore') is None
+    assert analyzer.model.calls == 0
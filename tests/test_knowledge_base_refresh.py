@@ -0,0 +1,99 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import langchain_service
+from bm25_index import BM25Index
+from vector_store import NumpyVectorStore
+
+DOCS = {
+    'breathing.txt': "Box breathing calms panic: inhale four counts, hold four, exhale four.",
+    'sleep.txt': "Insomnia improves with a fixed wake time and no screens before bed.",
+}
+
+
+def _chunk_texts(index, query):
+    return [index.chunks[chunk_id]['text'] for chunk_id, _, _ in index.search(query)]
+
+
+def test_removed_source_stops_ranking():
+    index = BM25Index()
+    index.upsert_source('breathing', [('b1', DOCS['breathing.txt'], {})], 'h1')
+    index.upsert_source('sleep', [('s1', DOCS['sleep.txt'], {}), ('s2', 'Insomnia and worry', {})], 'h2')
+    assert {chunk_id for chunk_id, _, _ in index.search('insomnia')} == {'s1', 's2'}
+
+    assert index.remove_source('sleep') == ['s1', 's2']
+    assert index.search('insomnia') == []
+    assert 'insomnia' not in index.postings
+    assert len(index) == 1 and index.total_length == index.doc_lengths['b1']
+    assert index.remove_source('sleep') == []
+
+
+def test_upserted_source_replaces_its_old_chunks():
+    index = BM25Index()
+    index.upsert_source('breathing', [('b1', DOCS['breathing.txt'], {})], 'h1')
+    index.upsert_source('breathing', [('b2', 'Grounding: name five things you can see.', {})], 'h2')
+
+    assert index.search('panic') == []
+    assert [chunk_id for chunk_id, _, _ in index.search('grounding')] == ['b2']
+    assert index.sources['breathing'] == {'hash': 'h2', 'chunk_ids': ['b2']}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """The chat service over an empty BM25 index and NumPy store, refreshing from tmp_path/docs"""
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    for name, text in DOCS.items():
+        (docs / name).write_text(text)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('BM25_INDEX_PATH', str(tmp_path / 'bm25_index.json'))
+
+    service = langchain_service.mental_health_service
+    monkeypatch.setattr(service, 'bm25_index', BM25Index())
+    monkeypatch.setattr(service, 'vector_db', NumpyVectorStore(DeterministicFakeEmbedding(size=16)))
+    monkeypatch.setattr(service, 'qa_chain', None)
+    service.refresh_knowledge_base()
+    return service, docs
+
+
+def test_refresh_drops_removed_documents(service):
+    service, docs = service
+    assert _chunk_texts(service.bm25_index, 'insomnia') == [DOCS['sleep.txt']]
+
+    (docs / 'sleep.txt').unlink()
+    summary = service.refresh_knowledge_base()
+
+    assert summary == {'updated': [], 'removed': ['docs/sleep.txt']}
+    assert service.bm25_index.search('insomnia') == []
+    assert service.vector_db.get()['documents'] == [DOCS['breathing.txt']]
+    assert service.refresh_knowledge_base() == {'updated': [], 'removed': []}
+
+
+def test_failed_refresh_keeps_serving_the_old_index(service, monkeypatch):
+    service, docs = service
+    old_index, old_store = service.bm25_index, service.vector_db
+    old_ids = list(old_store.ids)
+
+    (docs / 'breathing.txt').write_text("Progressive muscle relaxation eases tension.")
+    (docs / 'sleep.txt').write_text("Sleep hygiene, revised.")
+    loader = langchain_service.TextLoader
+
+    def failing_loader(path, *args, **kwargs):
+        # breathing.txt is applied to the copies, then sleep.txt fails
+        if path.endswith('sleep.txt'):
+            raise OSError('disk went away')
+        return loader(path, *args, **kwargs)
+
+    monkeypatch.setattr(langchain_service, 'TextLoader', failing_loader)
+    with pytest.raises(OSError):
+        service.refresh_knowledge_base()
+
+    assert service.bm25_index is old_index and service.vector_db is old_store
+    assert _chunk_texts(old_index, 'panic') == [DOCS['breathing.txt']]
+    assert old_index.search('relaxation') == []
+    assert old_store.ids == old_ids
+
+    # The next refresh picks up both changes
+    monkeypatch.setattr(langchain_service, 'TextLoader', loader)
+    assert sorted(service.refresh_knowledge_base()['updated']) == ['docs/breathing.txt', 'docs/sleep.txt']
+    assert _chunk_texts(service.bm25_index, 'relaxation') == ["Progressive muscle relaxation eases tension."]
@@ -0,0 +1,74 @@
+import asyncio
+
+from llm_scheduler import LLMScheduler
+
+
+def _grant_order(scheduler, priorities, delay_first=0.0):
+    """Queue one turn per priority behind a held slot and return the order they are served in"""
+    order = []
+
+    async def turn(priority):
+        async with scheduler.slot_async(priority):
+            order.append(priority)
+
+    async def scenario():
+        await scheduler.acquire('standard')
+        tasks = [asyncio.create_task(turn(priorities[0]))]
+        await asyncio.sleep(delay_first)
+        tasks += [asyncio.create_task(turn(priority)) for priority in priorities[1:]]
+        # Let every turn join the queue before the slot frees up
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    return order
+
+
+def test_higher_classes_go_first_under_saturation():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = _grant_order(scheduler, ['standard', 'elevated', 'crisis'])
+    assert order == ['crisis', 'elevated', 'standard']
+    assert scheduler.running == 0
+
+
+def test_each_class_gets_its_weighted_share():
+    scheduler = LLMScheduler(max_concurrency=1, weights={'crisis': 3, 'elevated': 2, 'standard': 1})
+    order = _grant_order(scheduler, ['standard'] * 8 + ['crisis'] * 8)
+    # Three crisis turns for every standard one, interleaved rather than all crisis first
+    assert order[:8].count('crisis') == 6
+    assert order[:4].count('standard') == 1
+
+
+def test_overdue_turn_is_served_before_the_weights():
+    scheduler = LLMScheduler(max_concurrency=1, weights={'crisis': 1000, 'elevated': 4, 'standard': 1}, max_wait=0.05)
+    order = _grant_order(scheduler, ['standard'] + ['crisis'] * 5, delay_first=0.06)
+    assert order[0] == 'standard'
+
+
+def test_cancelled_waiter_leaves_the_queue_without_leaking_a_slot():
+    scheduler = LLMScheduler(max_concurrency=1)
+
+    async def scenario():
+        await scheduler.acquire('standard')
+        waiter = asyncio.create_task(scheduler.acquire('crisis'))
+        await asyncio.sleep(0)
+        assert scheduler.depth('crisis') == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.depth('crisis') == 0
+
+        scheduler.release()
+        assert scheduler.running == 0
+        async with scheduler.slot_async('elevated'):
+            assert scheduler.running == 1
+
+    asyncio.run(scenario())
+    assert scheduler.running == 0
+
+
+def test_blocking_slot_still_serves_threads():
+    scheduler = LLMScheduler(max_concurrency=2)
+    with scheduler.slot('unknown-class'):
+        assert scheduler.running == 1
+    assert scheduler.running == 0
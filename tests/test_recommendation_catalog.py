@@ -0,0 +1,93 @@
+import json
+import os
+
+from recommendation_catalog import RecommendationCatalog
+
+
+def _catalog_data(version, titles=('Breathing basics',)):
+    return {
+        'version': version,
+        'resources': [
+            {
+                'id': f"anxiety-article-{i}",
+                'type': 'articles',
+                'states': ['Anxiety'],
+                'tags': [],
+                'title': title,
+                'url': f"https://example.org/{i}",
+                'description': title
+            }
+            for i, title in enumerate(titles)
+        ],
+        'crisis_resources': [
+            {'id': 'crisis-988', 'title': '988', 'url': 'tel:988', 'description': 'Crisis line'}
+        ]
+    }
+
+
+def _write(path, data, mtime_ns):
+    path.write_text(json.dumps(data))
+    # Explicit mtimes so reloads don't depend on the filesystem's timestamp resolution
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_load_builds_indexes(tmp_path):
+    path = tmp_path / 'catalog.json'
+    _write(path, _catalog_data(1, ('First', 'Second')), 1_000_000_000)
+    catalog = RecommendationCatalog(str(path), reload_interval=0)
+
+    assert catalog.load()
+    assert catalog.version == 1
+    assert [item['title'] for item in catalog.snapshot.find(state='Anxiety', resource_type='articles')] == ['First', 'Second']
+    assert catalog.snapshot.crisis_resources == [{'title': '988', 'url': 'tel:988', 'description': 'Crisis line'}]
+
+
+def test_reload_picks_up_changes_and_notifies_listeners(tmp_path):
+    path = tmp_path / 'catalog.json'
+    _write(path, _catalog_data(1), 1_000_000_000)
+    catalog = RecommendationCatalog(str(path), reload_interval=0)
+    catalog.load()
+    seen = []
+    catalog.add_listener(lambda snapshot: seen.append(snapshot.version))
+
+    assert not catalog.reload_if_changed()
+
+    _write(path, _catalog_data(2, ('Updated',)), 2_000_000_000)
+    assert catalog.reload_if_changed()
+    assert catalog.version == 2
+    assert seen == [2]
+
+
+def test_invalid_catalog_keeps_previous_version(tmp_path):
+    path = tmp_path / 'catalog.json'
+    _write(path, _catalog_data(1), 1_000_000_000)
+    catalog = RecommendationCatalog(str(path), reload_interval=0)
+    catalog.load()
+
+    broken = _catalog_data(2)
+    del broken['resources'][0]['url']
+    _write(path, broken, 2_000_000_000)
+
+    assert not catalog.reload_if_changed()
+    assert catalog.version == 1
+    # The broken file is not re-read on every check
+    assert not catalog.reload_if_changed()
+
+
+def test_validation_rejects_duplicates_and_unknown_types(tmp_path):
+    path = tmp_path / 'catalog.json'
+    catalog = RecommendationCatalog(str(path), reload_interval=0)
+
+    duplicate = _catalog_data(1, ('One', 'Two'))
+    duplicate['resources'][1]['id'] = duplicate['resources'][0]['id']
+    _write(path, duplicate, 1_000_000_000)
+    assert not catalog.load()
+
+    unknown_type = _catalog_data(1)
+    unknown_type['resources'][0]['type'] = 'podcasts'
+    _write(path, unknown_type, 2_000_000_000)
+    assert not catalog.load()
+
+    _write(path, {'resources': []}, 3_000_000_000)
+    assert not catalog.load()
+    assert catalog.version is None
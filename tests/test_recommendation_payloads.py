@@ -0,0 +1,37 @@
+import json
+import os
+
+import pytest
+
+from recommendation_system import CONFIDENCE_BANDS, RISK_LEVELS, RecommendationSystem
+
+# get_recommendations() of the builder before payloads were precomputed,
+# for every (state, risk level, confidence band)
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'recommendation_payloads.json')
+
+with open(FIXTURE) as fixture:
+    BASELINE = json.load(fixture)
+
+
+@pytest.fixture(scope='module')
+def system():
+    return RecommendationSystem()
+
+
+def test_baseline_covers_every_cached_payload(system):
+    keys = {(case['predicted_state'], case['risk_level'], case['confidence']) for case in BASELINE}
+    assert keys == {
+        (state, risk_level, confidence)
+        for state in system.recommendations
+        for risk_level in RISK_LEVELS
+        for confidence in CONFIDENCE_BANDS.values()
+    }
+
+
+@pytest.mark.parametrize('case', BASELINE, ids=lambda case: '-'.join(
+    [case['predicted_state'], case['risk_level'], str(case['confidence'])]
+))
+def test_payload_matches_baseline(system, case):
+    analysis = {key: case[key] for key in ('predicted_state', 'risk_level', 'confidence')}
+    # Round-trip through JSON, as the response does, so tuples compare equal to lists
+    assert json.loads(json.dumps(system.get_recommendations(analysis))) == case['payload']
@@ -0,0 +1,75 @@
+from recommendation_catalog import CatalogSnapshot
+from recommendation_ranking import RecommendationRanker
+
+
+def _item(item_id, resource_type='articles', states=('Anxiety',), tags=()):
+    return {
+        'id': item_id,
+        'type': resource_type,
+        'states': list(states),
+        'tags': list(tags),
+        'title': item_id,
+        'url': f"https://example.org/{item_id}",
+        'description': item_id
+    }
+
+
+def _ranker(resources, crisis_resources=()):
+    ranker = RecommendationRanker(['Normal', 'Anxiety', 'Depression', 'Suicidal'])
+    ranker.build(CatalogSnapshot({
+        'version': 1,
+        'resources': list(resources),
+        'crisis_resources': list(crisis_resources)
+    }))
+    return ranker
+
+
+CRISIS_LINE = {
+    'id': 'crisis-988',
+    'title': 'National Suicide Prevention Lifeline: 988',
+    'url': 'tel:988',
+    'description': 'Free, confidential crisis support'
+}
+
+
+def test_equal_scores_keep_catalog_order():
+    # Two score levels with many ties, and a candidate pool smaller than the catalog
+    resources = [_item(f"item-{i:03d}", states=('Anxiety', 'Depression') if i % 7 < 3 else ('Anxiety',))
+                 for i in range(100)]
+    ranker = _ranker(resources)
+
+    ranked = ranker.rank({'Anxiety': 0.5, 'Depression': 0.5}, top_n=20, max_per_type=20)
+
+    both = [item['id'] for item in resources if 'Depression' in item['states']]
+    anxiety_only = [item['id'] for item in resources if 'Depression' not in item['states']]
+    assert [item['id'] for item in ranked] == (both + anxiety_only)[:20]
+
+
+def test_ranking_is_deterministic_across_rebuilds():
+    resources = [_item(f"item-{i:02d}", states=('Anxiety', 'Depression') if i % 3 else ('Anxiety',))
+                 for i in range(60)]
+    probabilities = {'Anxiety': 0.5, 'Depression': 0.5}
+
+    first = _ranker(resources).rank(probabilities, top_n=3, max_per_type=3)
+    for _ in range(5):
+        assert _ranker(resources).rank(probabilities, top_n=3, max_per_type=3) == first
+
+
+def test_global_crisis_resources_lead_at_high_risk():
+    # Crisis-tagged articles get the same risk boost but come first in the catalog
+    resources = [_item(f"article-{i}", states=('Suicidal',), tags=('crisis',)) for i in range(10)]
+    resources.append(_item('helpline', resource_type='professional_resources', states=('Suicidal',)))
+    ranker = _ranker(resources, [CRISIS_LINE])
+
+    ranked = ranker.rank({'Suicidal': 1.0}, risk_level='high', top_n=5)
+
+    assert ranked[0]['id'] == 'crisis-988'
+    assert ranked[0]['type'] == 'professional_resources'
+
+
+def test_global_crisis_resources_left_out_at_low_risk():
+    ranker = _ranker([_item('article', states=('Anxiety',))], [CRISIS_LINE])
+
+    ranked = ranker.rank({'Anxiety': 1.0}, risk_level='low', top_n=5)
+
+    assert [item['id'] for item in ranked] == ['article']
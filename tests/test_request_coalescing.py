@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from request_coalescing import COALESCED_REQUESTS, BatchingEmbeddings, SingleFlight
+
+CALLERS = 8
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _concurrent(flight, fn):
+    """Run CALLERS callers of one key, releasing the leader's call once all the others wait on it"""
+    release = threading.Event()
+    calls = []
+    joined = COALESCED_REQUESTS.value(kind=flight.kind)
+
+    def leader_call():
+        calls.append(1)
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        futures = [pool.submit(flight.do, 'same query', leader_call) for _ in range(CALLERS)]
+        _wait_for(lambda: COALESCED_REQUESTS.value(kind=flight.kind) - joined == CALLERS - 1)
+        release.set()
+    return calls, futures
+
+
+def test_concurrent_callers_share_one_call():
+    calls, futures = _concurrent(SingleFlight('test_share'), lambda: ['result'])
+    results = [future.result() for future in futures]
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight('test_error')
+    calls, futures = _concurrent(flight, lambda: 1 / 0)
+    assert len(calls) == 1
+    for future in futures:
+        with pytest.raises(ZeroDivisionError):
+            future.result()
+    # The failed call is forgotten, so the next caller tries again
+    assert flight.do('same query', lambda: 'retried') == 'retried'
+
+
+class RecordingEmbeddings:
+    query_instruction = 'query: '
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        if self.error:
+            raise self.error
+        return [[float(len(text)), float(i)] for i, text in enumerate(texts)]
+
+    def embed_query(self, text):
+        return self.embed_documents([self.query_instruction + text])[0]
+
+
+def _embed_concurrently(embeddings, texts):
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        return [pool.submit(embeddings.embed_query, text) for text in texts]
+
+
+def test_concurrent_queries_are_embedded_in_one_batch():
+    model = RecordingEmbeddings()
+    batching = BatchingEmbeddings(model, max_batch_size=32, max_wait=0.5)
+    texts = ['how do I sleep', 'panic attack help', 'how do I sleep', 'panic attack help']
+    vectors = [future.result(5) for future in _embed_concurrently(batching, texts)]
+
+    # One forward pass, with each distinct text embedded once
+    assert len(model.batches) == 1
+    assert sorted(model.batches[0]) == ['query: how do I sleep', 'query: panic attack help']
+    assert vectors[0] == vectors[2] and vectors[1] == vectors[3]
+    assert vectors[0][0] == len('query: how do I sleep')
+
+
+def test_batch_error_reaches_every_waiting_query():
+    model = RecordingEmbeddings(error=RuntimeError('model crashed'))
+    batching = BatchingEmbeddings(model, max_batch_size=32, max_wait=0.5)
+    futures = _embed_concurrently(batching, ['one', 'two', 'three'])
+    for future in futures:
+        with pytest.raises(RuntimeError, match='model crashed'):
+            future.result(5)
+    assert len(model.batches) == 1
+
+
+def test_batching_is_off_when_documents_get_their_own_instruction():
+    model = RecordingEmbeddings()
+    model.embed_instruction = 'passage: '
+    batching = BatchingEmbeddings(model)
+    assert not batching.enabled
+    assert batching.embed_query('hi') == [float(len('query: hi')), 0.0]
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError
+
+from session_analytics import GRANULARITIES, SessionRollups
+
+HOUR = datetime(2026, 3, 2, 14, 0)
+
+
+class FakeRollupCollection:
+    """bulk_write that applies $inc upserts, failing the first ``failures`` calls with ``error``"""
+
+    def __init__(self, failures=0, error=None):
+        self.failures = failures
+        self.error = error or ConnectionError('database unavailable')
+        self.calls = 0
+        self.buckets = {}
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls += 1
+        failing = self.calls <= self.failures
+        error = self.error(operations) if failing and callable(self.error) else self.error
+        failed = {e['index'] for e in error.details['writeErrors']} if failing and isinstance(error, BulkWriteError) else set()
+        if failing and not failed:
+            raise error
+        for i, operation in enumerate(operations):
+            if i in failed:
+                continue
+            counters = self.buckets.setdefault(operation._filter['bucket'], {})
+            for field, count in operation._doc['$inc'].items():
+                counters[field] = counters.get(field, 0) + count
+        if failed:
+            raise error
+
+
+def _rollups(**kwargs):
+    db = {collection: FakeRollupCollection(**kwargs) for collection in GRANULARITIES.values()}
+    return SessionRollups(db, max_retries=2), db['session_rollups_hourly']
+
+
+def _record(minute, state='Anxiety', hour=HOUR):
+    return {'ended_at': hour.replace(minute=minute), 'message_count': 4, 'user_message_count': 2,
+            'analysis': {'predicted_state': state, 'risk_level': 'low'}}
+
+
+def test_transient_failure_is_retried_and_counted_once():
+    rollups, hourly = _rollups(failures=1)
+    asyncio.run(rollups.record_sessions([_record(5), _record(40, 'Normal')]))
+
+    assert hourly.calls == 2
+    assert hourly.buckets[HOUR] == {'sessions': 2, 'total_messages': 8, 'user_messages': 4,
+                                    'states.Anxiety': 1, 'states.Normal': 1, 'risk_levels.low': 2}
+
+
+def test_only_failed_buckets_are_retried():
+    def second_bucket_fails(operations):
+        return BulkWriteError({'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'duplicate key'}]})
+
+    rollups, hourly = _rollups(failures=1, error=second_bucket_fails)
+    later = HOUR.replace(hour=15)
+    asyncio.run(rollups.record_sessions([_record(5), _record(5, hour=later)]))
+
+    assert hourly.buckets[HOUR]['sessions'] == 1
+    assert hourly.buckets[later]['sessions'] == 1
+
+
+def test_exhausted_retries_carry_increments_into_the_next_batch():
+    rollups, hourly = _rollups(failures=2)
+    asyncio.run(rollups.record_sessions([_record(5)]))
+    assert hourly.buckets == {}
+
+    asyncio.run(rollups.record_sessions([_record(10)]))
+    assert hourly.buckets[HOUR]['sessions'] == 2
+    assert rollups._unapplied['session_rollups_hourly'] == {}
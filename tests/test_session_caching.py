@@ -0,0 +1,121 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from response_compression import CompressionMiddleware, negotiate_encoding
+
+# server.py reads these at import; no database is contacted by the tests below
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'test')
+
+
+@pytest.fixture(scope='module')
+def server():
+    import server
+    return server
+
+
+@pytest.fixture
+def session(server):
+    service = server.mental_health_service
+    session_id = service.open_session(None)
+    service.sessions[session_id]['messages'].append({'role': 'user', 'content': 'hello'})
+    yield service, session_id
+    service.sessions.pop(session_id, None)
+
+
+def test_session_etag_revalidates_until_the_session_changes(server, session):
+    service, session_id = session
+    client = TestClient(server.app)
+    path = f'/api/chat/session/{session_id}'
+
+    first = client.get(path)
+    etag = first.headers['etag']
+    assert first.status_code == 200 and etag.startswith('W/"')
+    assert first.headers['cache-control'] == 'private, no-cache'
+
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+    # Weak comparison, lists and the wildcard match too
+    assert client.get(path, headers={'If-None-Match': f'"other", {etag[2:]}'}).status_code == 304
+    assert client.get(path, headers={'If-None-Match': '*'}).status_code == 304
+
+    # Ended sessions still take messages, so they are revalidated too
+    service.sessions[session_id].update({'active': False, 'ended_at': '2026-01-01T00:00:00'})
+    ended = client.get(path, headers={'If-None-Match': etag})
+    assert ended.status_code == 200 and ended.headers['etag'] != etag
+    assert ended.headers['cache-control'] == 'private, no-cache'
+
+    service.sessions[session_id]['messages'].append({'role': 'user', 'content': 'still here'})
+    changed = client.get(path, headers={'If-None-Match': ended.headers['etag']})
+    assert changed.status_code == 200 and changed.json()['message_count'] == 2
+
+
+def _app(monkeypatch, minimum_size=100):
+    monkeypatch.setenv('COMPRESSION_MINIMUM_SIZE', str(minimum_size))
+    large = {'items': ['calm breathing exercise'] * 50}
+
+    async def stream():
+        for _ in range(3):
+            yield b'{"chunk": "' + b'x' * 200 + b'"}\n'
+
+    app = Starlette(routes=[
+        Route('/small', lambda request: JSONResponse({'ok': True})),
+        Route('/large', lambda request: JSONResponse(large, headers={'ETag': '"abc"'})),
+        Route('/binary', lambda request: Response(b'\0' * 500, media_type='application/octet-stream')),
+        Route('/text', lambda request: PlainTextResponse('y' * 500)),
+        Route('/stream', lambda request: StreamingResponse(stream(), media_type='application/x-ndjson')),
+    ])
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app), large
+
+
+def test_large_bodies_are_compressed_for_accepting_clients(monkeypatch):
+    client, large = _app(monkeypatch)
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['etag'] == 'W/"abc"'
+    assert 'Accept-Encoding' in response.headers['vary']
+    assert response.json() == large
+
+    streamed = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert streamed.headers['content-encoding'] == 'gzip'
+    assert streamed.text.count('chunk') == 3
+
+
+def test_small_unaccepted_or_binary_bodies_are_left_alone(monkeypatch):
+    client, _ = _app(monkeypatch)
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in small.headers
+    assert 'Accept-Encoding' in small.headers['vary']
+
+    identity = client.get('/large', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in identity.headers
+    assert identity.headers['etag'] == '"abc"'
+
+    binary = client.get('/binary', headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in binary.headers and 'vary' not in binary.headers
+
+    raw = client.get('/text', headers={'Accept-Encoding': 'gzip'})
+    assert raw.headers['content-encoding'] == 'gzip'
+    assert int(raw.headers['content-length']) < 500
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate', 'gzip'),
+    ('gzip;q=0, deflate', None),
+    ('GZIP;q=0.5', 'gzip'),
+    ('identity', None),
+    ('', None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_brotli_is_preferred_when_installed():
+    pytest.importorskip('brotli')
+    assert negotiate_encoding('gzip, br') == 'br'
+    assert negotiate_encoding('gzip, br;q=0') == 'gzip'
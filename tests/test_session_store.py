@@ -0,0 +1,131 @@
+import asyncio
+import threading
+
+from pymongo.errors import BulkWriteError
+
+from session_store import DUPLICATE_KEY_ERROR, SESSION_WRITES, SessionWriteBehindQueue
+
+
+class FakeCollection:
+    """insert_many that fails the first ``failures`` calls with ``error``"""
+
+    def __init__(self, failures=0, error=None):
+        self.failures = failures
+        self.error = error or ConnectionError('database unavailable')
+        self.calls = 0
+        self.documents = []
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error(documents) if callable(self.error) else self.error
+        self.documents.extend(documents)
+
+
+def _session(session_id):
+    return {'session_id': session_id, 'analysis': {'predicted_state': 'Anxiety'}}
+
+
+def _run(writer, documents):
+    async def scenario():
+        writer.start()
+        for document in documents:
+            writer.enqueue(document)
+        await writer.stop()
+    asyncio.run(scenario())
+
+
+def _queue(collection, tmp_path, **kwargs):
+    return SessionWriteBehindQueue(collection, flush_interval=0.01, spill_path=str(tmp_path / 'spill.jsonl'), **kwargs)
+
+
+def test_transient_failures_are_retried(tmp_path):
+    collection = FakeCollection(failures=2)
+    writer = _queue(collection, tmp_path, max_retries=3)
+
+    _run(writer, [_session('a'), _session('b')])
+
+    assert [document['session_id'] for document in collection.documents] == ['a', 'b']
+    assert not (tmp_path / 'spill.jsonl').exists()
+    assert writer.get_pending('a') is None
+
+
+def test_exhausted_retries_spill_and_replay_on_next_start(tmp_path):
+    spilled_before = SESSION_WRITES.value(outcome='spilled')
+    collection = FakeCollection(failures=10)
+    writer = _queue(collection, tmp_path, max_retries=2)
+
+    _run(writer, [_session('a'), _session('b')])
+
+    assert collection.documents == []
+    assert len((tmp_path / 'spill.jsonl').read_text().splitlines()) == 2
+    assert SESSION_WRITES.value(outcome='spilled') - spilled_before == 2
+
+    # The database is back; the next run writes the spilled sessions first
+    recovered = FakeCollection()
+    writer = _queue(recovered, tmp_path)
+    _run(writer, [_session('c')])
+
+    assert [document['session_id'] for document in recovered.documents] == ['a', 'b', 'c']
+    assert recovered.documents[0]['analysis'] == {'predicted_state': 'Anxiety'}
+    assert not (tmp_path / 'spill.jsonl').exists()
+
+
+def test_bulk_errors_spill_only_failed_documents(tmp_path):
+    def partial_failure(documents):
+        return BulkWriteError({'writeErrors': [
+            {'index': 0, 'code': DUPLICATE_KEY_ERROR, 'errmsg': 'duplicate'},
+            {'index': 2, 'code': 121, 'errmsg': 'document failed validation'},
+        ]})
+
+    collection = FakeCollection(failures=10, error=partial_failure)
+    inserted = []
+    writer = _queue(collection, tmp_path, max_retries=1)
+
+    async def listener(documents):
+        inserted.extend(document['session_id'] for document in documents)
+    writer.add_listener(listener)
+
+    _run(writer, [_session('dup'), _session('ok'), _session('bad')])
+
+    assert inserted == ['ok']
+    assert 'bad' in (tmp_path / 'spill.jsonl').read_text()
+    assert 'dup' not in (tmp_path / 'spill.jsonl').read_text()
+
+
+def test_documents_dropped_without_spill_file_are_counted():
+    dropped_before = SESSION_WRITES.value(outcome='dropped')
+    writer = SessionWriteBehindQueue(FakeCollection(failures=10), flush_interval=0.01, max_retries=1)
+
+    _run(writer, [_session('a')])
+
+    assert SESSION_WRITES.value(outcome='dropped') - dropped_before == 1
+
+
+def test_overflow_spills_off_the_event_loop(tmp_path, monkeypatch):
+    collection = FakeCollection()
+    writer = _queue(collection, tmp_path, max_queue_size=1)
+    spill = writer._spill
+    spill_threads = []
+
+    def recording_spill(documents):
+        spill_threads.append(threading.get_ident())
+        spill(documents)
+    monkeypatch.setattr(writer, '_spill', recording_spill)
+
+    async def scenario():
+        writer.start()
+        assert writer.enqueue(_session('a'))
+        # The queue is full until the background task runs
+        assert not writer.enqueue(_session('b'))
+        await writer.stop()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+
+    assert spill_threads and loop_thread not in spill_threads
+    # The start-up replay may already have picked the spilled session up
+    spill_file = tmp_path / 'spill.jsonl'
+    spilled = spill_file.read_text() if spill_file.exists() else ''
+    stored = [document['session_id'] for document in collection.documents]
+    assert 'a' in stored and ('b' in stored or '"b"' in spilled)
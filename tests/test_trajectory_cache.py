@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from psychological_analysis import TrajectoryCache
+
+MESSAGES = [
+    "I have been feeling a bit off lately",
+    "work keeps piling up and I can't sleep",
+    "my heart races whenever I open my inbox",
+    "I worry all the time that I will fail",
+    "some days I don't want to get out of bed",
+]
+
+
+def _conversation(user_messages):
+    conversation = []
+    for content in user_messages:
+        conversation.append({'role': 'user', 'content': content})
+        conversation.append({'role': 'assistant', 'content': 'I hear you.'})
+    return conversation
+
+
+@pytest.fixture
+def scoring(analyzer, monkeypatch):
+    """The analyzer with an empty cache, a two-turn window and a count of texts vectorized"""
+    monkeypatch.setattr(analyzer, 'trajectory_cache', TrajectoryCache())
+    monkeypatch.setattr(analyzer, 'trajectory_window', 2)
+    vectorized = []
+    transform = analyzer.vectorizer.transform
+    monkeypatch.setattr(analyzer.vectorizer, 'transform', lambda texts: (vectorized.append(len(texts)), transform(texts))[1])
+    return analyzer, vectorized
+
+
+def _turns(analyzer, user_messages, session_id):
+    analysis = analyzer.analyze_conversations([_conversation(user_messages)], [session_id])[0]
+    return analysis, np.array([[turn[state] for state in sorted(turn)] for turn in analysis['trajectory']['turns']])
+
+
+def test_cache_hit_scores_only_new_turns_and_matches_a_cold_run(scoring):
+    analyzer, vectorized = scoring
+    assert analyzer.assess_live_risk(_conversation(MESSAGES[:3]), 'warm')
+    analysis, warm = _turns(analyzer, MESSAGES, 'warm')
+    assert vectorized == [3, 2]
+
+    cold_analysis, cold = _turns(analyzer, MESSAGES, 'cold')
+    assert vectorized[-1] == len(MESSAGES)
+    np.testing.assert_allclose(warm, cold)
+    assert analysis['state_probabilities'] == pytest.approx(cold_analysis['state_probabilities'])
+
+
+def test_edited_or_truncated_history_is_rescored(scoring):
+    analyzer, vectorized = scoring
+    _turns(analyzer, MESSAGES, 'session')
+
+    edited = list(MESSAGES)
+    edited[2] = "honestly things have been fine, I just needed to vent"
+    _, rescored = _turns(analyzer, edited, 'session')
+    assert vectorized[-1] == len(edited)
+    _, cold = _turns(analyzer, edited, 'cold')
+    np.testing.assert_allclose(rescored, cold)
+
+    truncated = MESSAGES[:2] + ["a different third message"]
+    _turns(analyzer, truncated, 'session')
+    assert vectorized[-1] == len(truncated)
+
+
+def test_fingerprint_covers_every_scored_message():
+    cache = TrajectoryCache()
+    rows, valid = np.ones((3, 2)), np.ones(3)
+    cache.put('s', MESSAGES[:3], rows, valid)
+
+    assert cache.get('s', MESSAGES[:3])[0] is rows
+    assert cache.get('s', MESSAGES[:4])[0] is rows
+    assert cache.get('s', MESSAGES[:2]) is None
+    assert cache.get('s', [MESSAGES[0], 'edited', MESSAGES[2]]) is None
+    assert cache.get(None, MESSAGES[:3]) is None
+
+    cache.discard('s')
+    assert cache.get('s', MESSAGES[:3]) is None
+
+
+def test_cache_evicts_least_recently_used_sessions():
+    cache = TrajectoryCache(max_size=2)
+    for session_id in ('a', 'b'):
+        cache.put(session_id, MESSAGES[:1], np.ones((1, 2)), np.ones(1))
+    cache.get('a', MESSAGES[:1])
+    cache.put('c', MESSAGES[:1], np.ones((1, 2)), np.ones(1))
+    assert cache.get('b', MESSAGES[:1]) is None
+    assert cache.get('a', MESSAGES[:1]) is not None